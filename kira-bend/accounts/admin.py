@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import DealerProfile
+from .models import DealerProfile, RevokedToken
 
 @admin.register(DealerProfile)
 class DealerProfileAdmin(admin.ModelAdmin):
     list_display = ("id", "dealership_name", "user", "region", "city", "is_verified", "created_at")
     search_fields = ("dealership_name", "user__username", "user__email")
     list_filter = ("country", "region", "is_verified")
+
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ("id", "jti", "user", "issued_before", "expires_at", "revoked_at")
+    search_fields = ("jti", "user__username")
+    raw_id_fields = ("user",)
@@ -21,3 +21,26 @@ class DealerProfile(models.Model):
 
     def __str__(self):
         return f"{self.dealership_name} ({self.user_id})"
+
+
+class RevokedToken(models.Model):
+    """
+    Append-only revocation log (see accounts.revocation). A row revokes one
+    token by jti, or, with jti empty, every token of `user` issued before
+    `issued_before`. Rows are useless once `expires_at` has passed.
+    """
+    jti = models.CharField(max_length=64, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="revoked_tokens"
+    )
+    issued_before = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["jti"], condition=~models.Q(jti=""), name="accounts_revokedtoken_unique_jti"),
+        ]
+
+    def __str__(self):
+        return self.jti or f"user {self.user_id} before {self.issued_before:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,195 @@
+"""
+JWT revocation without a query per request.
+
+Revocations are appended to the RevokedToken log: single tokens by jti
+(logout) and user-wide cutoffs (password change, "log out everywhere").
+Each process mirrors the live part of the log in memory:
+
+  - a Bloom filter over the jtis present at the last full rebuild,
+  - an exact set of jtis logged since then (kept small by rebuilding),
+  - the newest cutoff per user.
+
+A token that misses all three is not revoked, which is the common case and
+costs no I/O. A Bloom hit is confirmed against the table once and the answer
+memoized. The mirror follows the log incrementally by id every
+REVOCATION_SYNC_INTERVAL seconds (re-reading a short overlap, since ids are
+not committed in order) and is rebuilt from scratch, dropping expired rows,
+every REVOCATION_REBUILD_INTERVAL seconds or once the exact set outgrows
+REVOCATION_EXACT_MAX. Revocations made by this process apply immediately;
+other processes see them after at most one sync interval.
+"""
+import hashlib
+import math
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from one 128-bit digest
+        h1, h2 = struct.unpack(">QQ", hashlib.blake2b(key.encode(), digest_size=16).digest())
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class _Mirror:
+    def __init__(self):
+        self.bloom = BloomFilter(0, settings.REVOCATION_BLOOM_FP_RATE)
+        self.recent = set()  # jtis logged since the Bloom filter was built
+        self.cutoffs = {}  # user_id -> unix time; tokens issued earlier are revoked
+        self.confirmed = {}  # jti -> revoked?, for Bloom hits already checked
+        self.last_id = 0
+        self.built_at = self.synced_at = None  # monotonic times; None = never loaded
+
+
+_mirror = _Mirror()
+_lock = threading.Lock()
+
+
+def _add(mirror: _Mirror, rows, into_bloom: bool) -> None:
+    for row_id, jti, user_id, issued_before in rows:
+        if jti:
+            if into_bloom:
+                mirror.bloom.add(jti)
+            else:
+                mirror.recent.add(jti)
+            mirror.confirmed.pop(jti, None)
+        elif user_id is not None and issued_before is not None:
+            cutoff = issued_before.timestamp()
+            if cutoff > mirror.cutoffs.get(str(user_id), 0):
+                mirror.cutoffs[str(user_id)] = cutoff
+        mirror.last_id = max(mirror.last_id, row_id)
+
+
+def _rows(qs):
+    return qs.values_list("id", "jti", "user_id", "issued_before")
+
+
+def rebuild() -> None:
+    """Reload the mirror from the live log (and prune expired rows)."""
+    global _mirror
+    RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+    rows = list(_rows(RevokedToken.objects.all()))
+
+    mirror = _Mirror()
+    mirror.bloom = BloomFilter(2 * len(rows), settings.REVOCATION_BLOOM_FP_RATE)
+    _add(mirror, rows, into_bloom=True)
+    mirror.built_at = mirror.synced_at = time.monotonic()
+    _mirror = mirror
+
+
+def sync() -> None:
+    """Fold log rows appended since the last sync into the exact set."""
+    mirror = _mirror
+    overlap = timezone.now() - timedelta(seconds=settings.REVOCATION_SYNC_OVERLAP)
+    rows = list(_rows(RevokedToken.objects.filter(Q(id__gt=mirror.last_id) | Q(revoked_at__gte=overlap))))
+    _add(mirror, rows, into_bloom=False)
+    mirror.synced_at = time.monotonic()
+
+
+def needs_sync() -> bool:
+    mirror = _mirror
+    return mirror.synced_at is None or time.monotonic() - mirror.synced_at >= settings.REVOCATION_SYNC_INTERVAL
+
+
+def refresh() -> None:
+    """sync() or rebuild() if due; at most one thread does the work."""
+    if not needs_sync() or not _lock.acquire(blocking=False):
+        return
+    try:
+        mirror = _mirror
+        if (
+            mirror.built_at is None
+            or time.monotonic() - mirror.built_at >= settings.REVOCATION_REBUILD_INTERVAL
+            or len(mirror.recent) > settings.REVOCATION_EXACT_MAX
+        ):
+            rebuild()
+        else:
+            sync()
+    finally:
+        _lock.release()
+
+
+def cached_status(token):
+    """
+    True / False if the in-memory mirror decides whether `token` is revoked,
+    None if a Bloom hit still has to be confirmed (see is_revoked()).
+    """
+    mirror = _mirror
+    cutoff = mirror.cutoffs.get(str(token.get(api_settings.USER_ID_CLAIM)))
+    if cutoff is not None and token.get("iat", 0) < cutoff:
+        return True
+
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return False
+    if jti in mirror.recent:
+        return True
+    if jti not in mirror.bloom:
+        return False
+    return mirror.confirmed.get(jti)
+
+
+def is_revoked(token) -> bool:
+    refresh()
+    revoked = cached_status(token)
+    if revoked is None:
+        jti = token[api_settings.JTI_CLAIM]
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        mirror = _mirror
+        if len(mirror.confirmed) >= settings.REVOCATION_EXACT_MAX:
+            mirror.confirmed.clear()
+        mirror.confirmed[jti] = revoked
+    return revoked
+
+
+def _apply_locally(rows) -> None:
+    # This process need not wait for the next sync
+    transaction.on_commit(lambda: _add(_mirror, rows, into_bloom=False))
+
+
+def revoke_tokens(tokens) -> None:
+    """Revoke simplejwt tokens (access or refresh) individually, until they expire."""
+    entries = [
+        RevokedToken(
+            jti=token[api_settings.JTI_CLAIM],
+            user_id=token.get(api_settings.USER_ID_CLAIM),
+            expires_at=datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc),
+        )
+        for token in tokens
+        if token.get(api_settings.JTI_CLAIM)
+    ]
+    RevokedToken.objects.bulk_create(entries, ignore_conflicts=True)
+    _apply_locally([(0, entry.jti, entry.user_id, None) for entry in entries])
+
+
+def revoke_user_sessions(user_id) -> None:
+    """Revoke every token issued to the user so far (tokens issued from now on stay valid)."""
+    # Whole seconds, like the iat claim it is compared with: a token issued
+    # in this same second (e.g. right after a password change) stays valid
+    issued_before = timezone.now().replace(microsecond=0)
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    RevokedToken.objects.create(user_id=user_id, issued_before=issued_before, expires_at=issued_before + lifetime)
+    _apply_locally([(0, "", user_id, issued_before)])
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from . import revocation
 from .models import DealerProfile
 
 User = get_user_model()
@@ -10,3 +11,10 @@ User = get_user_model()
 def ensure_dealer_profile(sender, instance, created, **kwargs):
     # Only create on demand in real apps; for MVP we don't auto-create to avoid junk profiles.
     return
+
+
+@receiver(post_save, sender=User)
+def revoke_sessions_on_password_change(sender, instance, created, **kwargs):
+    # set_password() leaves the raw password on _password until the save completes
+    if not created and instance._password is not None:
+        revocation.revoke_user_sessions(instance.pk)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve /graphql/ with the async view (see config.urls)
+os.environ.setdefault('GRAPHQL_ASYNC', 'True')
 
 application = get_asgi_application()
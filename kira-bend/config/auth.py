@@ -0,0 +1,203 @@
+"""
+JWT authentication with a per-process cache of token-verified users.
+
+Verifying an access token is pure CPU (signature + expiry); loading its user
+is a query. CachedJWTAuthentication keeps the loaded user (dealer profile
+joined in) in a bounded, TTL'd LRU keyed by (user_id, jti), so repeated
+requests with the same token skip auth_user entirely. Entries never outlive
+the token, and saving / deleting a user or their dealer profile drops that
+user's entries in this process; other workers pick the change up within
+JWT_USER_CACHE_TTL (as do QuerySet.update()s, which send no signals).
+
+Tokens are also checked against accounts.revocation, which answers from
+memory in the common (not revoked) case.
+
+Used by config.middleware.JWTAuthMiddleware (GraphQL) and as the DRF
+authentication class, so both share one cache.
+
+pooled_authenticate() is the async login's password check: it runs on a
+small dedicated thread pool, so a burst of logins queues there instead of
+occupying every worker (or the thread async views share for the ORM).
+"""
+import asyncio
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.db import close_old_connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts import revocation
+from accounts.models import DealerProfile
+
+User = get_user_model()
+
+
+class UserCache:
+    """Thread-safe LRU of pickled users with per-entry expiry, keyed by (user_id, jti)."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user_id, jti) -> (expires_at, pickled user)
+        self._keys_by_user = {}  # user_id -> {(user_id, jti), ...}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            blob = entry[1]
+        # A fresh instance per request: callers may mutate their user
+        return pickle.loads(blob)
+
+    def set(self, key, user, token_exp: float) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        entry = (min(time.time() + self.ttl, token_exp), pickle.dumps(user))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id) -> None:
+        with self._lock:
+            for key in self._keys_by_user.pop(str(user_id), ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+user_cache = UserCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose get_user() goes through user_cache."""
+
+    def authenticate(self, request):
+        # DRF view behind JWTAuthMiddleware: the token was already verified
+        token = getattr(getattr(request, "_request", None), "auth", None)
+        if token is not None:
+            return self.get_user(token), token
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(token):
+            raise InvalidToken(_("Token has been revoked"))
+        return token
+
+    def validated_token(self, request, check_revoked: bool = True):
+        """
+        The request's verified access token, or None. Without `check_revoked`
+        it never queries; the caller then checks accounts.revocation itself.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        try:
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            if not check_revoked:
+                return super().get_validated_token(raw_token)
+            return self.get_validated_token(raw_token)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+
+    @staticmethod
+    def _key(validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        return str(user_id), validated_token.get(api_settings.JTI_CLAIM)
+
+    def cached_user(self, validated_token):
+        """The token's user if it is cached, else None (never queries)."""
+        return user_cache.get(self._key(validated_token))
+
+    def get_user(self, validated_token):
+        key = self._key(validated_token)
+        user = user_cache.get(key)
+        if user is not None:
+            return user
+
+        # Same checks as JWTAuthentication.get_user(), plus the dealer profile join;
+        # the user is only cached once they pass. Always from the primary: the lazy
+        # user may resolve inside a replica-routed operation (config.replicas), and
+        # a lagging replica could still show a deactivated user as active
+        try:
+            user = self.user_model.objects.using("default").select_related("dealer_profile").get(
+                **{api_settings.USER_ID_FIELD: key[0]}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        user_cache.set(key, user, validated_token["exp"])
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=DealerProfile)
+@receiver(post_delete, sender=DealerProfile)
+def invalidate_cached_dealer(sender, instance, **kwargs):
+    user_cache.invalidate(instance.user_id)
+
+
+_hash_executor = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+
+
+def _authenticate(credentials):
+    # Pool threads live outside the request cycle: manage connections ourselves
+    close_old_connections()
+    try:
+        return authenticate(**credentials)
+    finally:
+        close_old_connections()
+
+
+async def pooled_authenticate(**credentials):
+    """authenticate() on the AUTH_HASH_WORKERS pool; excess logins wait for a free thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, functools.partial(_authenticate, credentials))
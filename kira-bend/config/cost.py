@@ -0,0 +1,168 @@
+"""
+Static query cost analysis and limits for /graphql/.
+
+Before execution each operation gets a cost: every object a field can return
+costs its weight (default 1, scalars 0), multiplied by the size of every list
+above it. Paginated fields use their clamped `pagination.limit` / `first`;
+other lists use a size estimate. Operations over GRAPHQL_MAX_COST are
+rejected, and the cost is reported under `extensions.cost` so the budget can
+be tuned from real traffic.
+
+Depth and alias limits are Strawberry's QueryDepthLimiter / MaxAliasesLimiter
+validation rules, built once so ValidationCache can reuse their results.
+"""
+from typing import Iterator, Optional
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    OperationType,
+    get_named_type,
+    get_nullable_type,
+    is_list_type,
+    value_from_ast_untyped,
+)
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import MaxAliasesLimiter, QueryDepthLimiter, SchemaExtension
+
+# Max page size per paginated field (GraphQL name); others use GRAPHQL_MAX_PAGE_SIZE
+PAGE_SIZE_LIMITS = {
+    "dealers": 50,
+    "myLeads": 50,
+}
+
+# Assumed length of lists without pagination arguments
+LIST_SIZE_ESTIMATES = {
+    "images": 10,
+    "attributeValues": 25,
+    "categories": 50,
+    "categoryAttributes": 30,
+}
+DEFAULT_LIST_SIZE = 10
+
+# Fields that cost more than the objects they return (extra queries / aggregates)
+FIELD_WEIGHTS = {
+    "totalCount": 5,
+    "listingFacets": 50,
+    "uniqueViews": 2,
+}
+
+PAGE_SIZE_ARGS = ("pagination", "first")
+
+
+def clamp_page_size(field_name: str, size: int) -> int:
+    """`size` capped at the field's page size limit (negative sizes become 0)."""
+    limit = PAGE_SIZE_LIMITS.get(field_name, settings.GRAPHQL_MAX_PAGE_SIZE)
+    return max(0, min(size, limit))
+
+
+def _page_size(field_def, node: FieldNode, variables: dict) -> Optional[int]:
+    """Requested page size of a paginated field (after clamping), else None."""
+    args = {arg.name.value: arg.value for arg in node.arguments or ()}
+    for name in PAGE_SIZE_ARGS:
+        arg_def = field_def.args.get(name)
+        if arg_def is None:
+            continue
+
+        value = value_from_ast_untyped(args[name], variables) if name in args else None
+        if name == "pagination":
+            default = get_named_type(arg_def.type).fields["limit"].default_value
+            size = (value or {}).get("limit", default)
+        else:
+            size = arg_def.default_value if value is None else value
+
+        if not isinstance(size, int):
+            size = DEFAULT_LIST_SIZE
+        return clamp_page_size(node.name.value, size)
+    return None
+
+
+class _CostWalker:
+    def __init__(self, fragments: dict, variables: dict):
+        self.fragments = fragments
+        self.variables = variables
+
+    def _fields(self, selection_set) -> Iterator[FieldNode]:
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from self._fields(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    yield from self._fields(fragment.selection_set)
+
+    def cost(self, selection_set, parent_type, multiplier: int, page_size: Optional[int] = None) -> int:
+        total = 0
+        for node in self._fields(selection_set):
+            name = node.name.value
+            if name.startswith("__") or not isinstance(parent_type, GraphQLObjectType):
+                continue
+            field_def = parent_type.fields.get(name)
+            if field_def is None:
+                continue
+
+            # A page/connection field's size applies to the first list below it
+            child_page_size = _page_size(field_def, node, self.variables) or page_size
+            count = multiplier
+            if is_list_type(get_nullable_type(field_def.type)):
+                count *= child_page_size or LIST_SIZE_ESTIMATES.get(name, DEFAULT_LIST_SIZE)
+                child_page_size = None
+
+            named = get_named_type(field_def.type)
+            weight = FIELD_WEIGHTS.get(name, 1 if isinstance(named, GraphQLObjectType) else 0)
+            # Weighted fields are charged once per parent, other objects once per item
+            total += weight * (multiplier if name in FIELD_WEIGHTS else count)
+            total += self.cost(node.selection_set, named, count, child_page_size)
+        return total
+
+
+def operation_cost(schema, document, operation_name: Optional[str], variables: Optional[dict]) -> int:
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0
+    root = schema.mutation_type if operation.operation == OperationType.MUTATION else schema.query_type
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    return _CostWalker(fragments, variables or {}).cost(operation.selection_set, root, 1)
+
+
+class QueryCost(SchemaExtension):
+    """Rejects operations whose static cost exceeds GRAPHQL_MAX_COST."""
+
+    def __init__(self):
+        super().__init__()
+        self.cost = None
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        self.cost = operation_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            execution_context.operation_name,
+            execution_context.variables,
+        )
+        if self.cost > settings.GRAPHQL_MAX_COST:
+            raise GraphQLError(
+                f"Query cost {self.cost} exceeds the maximum of {settings.GRAPHQL_MAX_COST}.",
+                extensions={"code": "QUERY_TOO_COMPLEX"},
+            )
+        yield
+
+    def get_results(self) -> dict:
+        if self.cost is None:
+            return {}
+        return {"cost": {"requested": self.cost, "maximum": settings.GRAPHQL_MAX_COST}}
+
+
+def limit_rules() -> list:
+    """Depth + alias validation rules (same classes every request, so ValidationCache hits)."""
+    return [
+        *QueryDepthLimiter(max_depth=settings.GRAPHQL_MAX_DEPTH).validation_rules,
+        *MaxAliasesLimiter(max_alias_count=settings.GRAPHQL_MAX_ALIASES).validation_rules,
+    ]
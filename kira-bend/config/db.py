@@ -0,0 +1,24 @@
+"""
+Per-session Postgres state that must not leak between pooled connection users.
+
+config.timeouts sets statement_timeout on whichever connection a GraphQL
+operation runs on; psycopg_pool calls reset_session() (settings: DATABASES
+OPTIONS["pool"]["reset"]) when a connection is returned, so the next user
+gets the server default back. Kept free of Django imports: settings imports it.
+"""
+
+
+def statement_timeout(conn) -> int:
+    """statement_timeout (ms) last set on this psycopg connection by set_statement_timeout(), 0 = server default."""
+    return getattr(conn, "_statement_timeout_ms", 0)
+
+
+def set_statement_timeout(conn, ms: int) -> None:
+    conn.execute(f"SET statement_timeout = {int(ms)}")
+    conn._statement_timeout_ms = int(ms)
+
+
+def reset_session(conn) -> None:
+    if statement_timeout(conn):
+        conn.execute("RESET statement_timeout")
+        conn._statement_timeout_ms = 0
@@ -0,0 +1,214 @@
+"""
+Per-operation timing for /graphql/.
+
+The Instrumentation extension records, for each operation:
+  - wall time per resolver path (root fields and fields with their own
+    resolver; plain attribute fields are skipped), list indexes folded so
+    `listingsPageV2.results.isFavorited` is one entry. Paths use the
+    client's aliases, so metrics label the time by schema field instead
+    (`ListingType.isFavorited`), which keeps their cardinality bounded
+  - SQL query count and time, through a database execute wrapper that every
+    connection gets (so queries from django_resolver / config.parallel
+    worker threads are counted too)
+
+The view (config.views) turns that into a Server-Timing header, adds the
+response size, and feeds the Prometheus metrics served at /metrics.
+`extensions.tracing` is added when GRAPHQL_TRACING is on or the client
+sends `X-GraphQL-Tracing: 1`.
+"""
+import re
+import time
+from contextvars import ContextVar
+from inspect import isawaitable
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from strawberry.extensions import SchemaExtension
+
+from . import metrics
+
+SQL_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1_000, 5_000, 20_000, 100_000, 500_000, 2_000_000)
+
+REQUESTS = metrics.counter("graphql_requests_total", "GraphQL operations.", ("operation", "status"))
+DURATION = metrics.histogram("graphql_request_duration_seconds", "GraphQL operation wall time.", ("operation",))
+SQL_QUERIES = metrics.histogram(
+    "graphql_sql_queries", "SQL queries per GraphQL operation.", ("operation",), buckets=SQL_BUCKETS
+)
+SQL_DURATION = metrics.histogram("graphql_sql_duration_seconds", "SQL time per GraphQL operation.", ("operation",))
+RESPONSE_SIZE = metrics.histogram(
+    "graphql_response_size_bytes", "GraphQL response payload size.", ("operation",), buckets=SIZE_BUCKETS
+)
+RESOLVER_DURATION = metrics.histogram(
+    "graphql_resolver_duration_seconds", "Resolver wall time per schema field.", ("operation", "field")
+)
+
+_OPERATION_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+_operation_labels: set[str] = set()
+
+_current: ContextVar[Optional["OperationTiming"]] = ContextVar("graphql_operation_timing", default=None)
+
+# (parent type, field) -> whether resolve() times it
+_timed_fields: dict[tuple[str, str], bool] = {}
+
+
+def operation_label(name: Optional[str]) -> str:
+    """Bounded label for an operation name (client-chosen names must not blow up cardinality)."""
+    if not name:
+        return "anonymous"
+    if name in _operation_labels:
+        return name
+    if not _OPERATION_NAME_RE.match(name) or len(_operation_labels) >= settings.METRICS_MAX_OPERATIONS:
+        return "other"
+    _operation_labels.add(name)
+    return name
+
+
+class OperationTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.operation = "anonymous"
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.resolvers: dict[str, list] = {}  # path -> [calls, seconds, schema field]
+        self.errors = False
+
+    def add_resolver(self, path: str, field: str, seconds: float) -> None:
+        entry = self.resolvers.setdefault(path, [0, 0.0, field])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def server_timing(self) -> str:
+        parts = [
+            f"graphql;dur={self.duration * 1000:.1f}",
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+        ]
+        for path, (_, seconds, _) in self.resolvers.items():
+            if "." not in path:
+                parts.append(f"resolve-{path};dur={seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+    def tracing(self) -> dict:
+        return {
+            "durationMs": round(self.duration * 1000, 2),
+            "sql": {"count": self.sql_count, "durationMs": round(self.sql_time * 1000, 2)},
+            "resolvers": [
+                {"path": path, "calls": calls, "durationMs": round(seconds * 1000, 2)}
+                for path, (calls, seconds, _) in sorted(self.resolvers.items(), key=lambda kv: -kv[1][1])
+            ],
+        }
+
+    def record(self, response_size: int) -> None:
+        REQUESTS.inc(self.operation, "error" if self.errors else "ok")
+        DURATION.observe(self.operation, value=self.duration)
+        SQL_QUERIES.observe(self.operation, value=self.sql_count)
+        SQL_DURATION.observe(self.operation, value=self.sql_time)
+        RESPONSE_SIZE.observe(self.operation, value=response_size)
+        by_field: dict[str, float] = {}
+        for _, seconds, field in self.resolvers.values():
+            by_field[field] = by_field.get(field, 0.0) + seconds
+        for field, seconds in by_field.items():
+            RESOLVER_DURATION.observe(self.operation, field, value=seconds)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql_count += 1
+        timing.sql_time += time.perf_counter() - started
+
+
+def _install_sql_wrapper(connection) -> None:
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_sql_wrapper(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+def _path(path) -> str:
+    keys = []
+    while path is not None:
+        if isinstance(path.key, str):
+            keys.append(path.key)
+        path = path.prev
+    return ".".join(reversed(keys))
+
+
+class Instrumentation(SchemaExtension):
+    def __init__(self):
+        super().__init__()
+        self.timing = None
+
+    def on_operation(self) -> Iterator[None]:
+        self.timing = timing = OperationTiming()
+        token = _current.set(timing)
+        # Connections opened before this module was imported don't have the wrapper yet
+        for connection in connections.all(initialized_only=True):
+            _install_sql_wrapper(connection)
+
+        request = self.execution_context.context.request
+        request._graphql_timing = timing
+        try:
+            yield
+        finally:
+            _current.reset(token)
+            timing.operation = operation_label(self.execution_context.operation_name)
+            timing.duration = time.perf_counter() - timing.started
+            timing.errors = bool(self.execution_context.pre_execution_errors) or bool(
+                self.execution_context.result and self.execution_context.result.errors
+            )
+
+    def _is_timed(self, info) -> bool:
+        key = (info.parent_type.name, info.field_name)
+        timed = _timed_fields.get(key)
+        if timed is None:
+            if info.path.prev is None:
+                timed = True
+            else:
+                definition = info.parent_type.fields[info.field_name].extensions.get("strawberry-definition")
+                timed = getattr(definition, "base_resolver", None) is not None
+            _timed_fields[key] = timed
+        return timed
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if not self._is_timed(info):
+            return _next(root, info, *args, **kwargs)
+
+        timing = self.timing
+        path = _path(info.path)
+        field = f"{info.parent_type.name}.{info.field_name}"
+        started = time.perf_counter()
+        result = _next(root, info, *args, **kwargs)
+        if not isawaitable(result):
+            timing.add_resolver(path, field, time.perf_counter() - started)
+            return result
+
+        async def timed():
+            try:
+                return await result
+            finally:
+                timing.add_resolver(path, field, time.perf_counter() - started)
+
+        return timed()
+
+    def get_results(self) -> dict:
+        request = self.execution_context.context.request
+        if self.timing is None or not (
+            settings.GRAPHQL_TRACING or request.headers.get("X-GraphQL-Tracing") == "1"
+        ):
+            return {}
+        self.timing.duration = time.perf_counter() - self.timing.started
+        return {"tracing": self.timing.tracing()}
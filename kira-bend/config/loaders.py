@@ -0,0 +1,99 @@
+"""
+Request-scoped batch loaders for GraphQL field resolvers.
+
+The schema runs on the sync Django view, so these are synchronous
+DataLoaders: list resolvers register the rows they return, and the first
+per-row lookup resolves every registered row with a single query.
+"""
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from market.models import FavoriteV2
+from market.view_counts import unique_views
+
+
+class FavoriteLoader:
+    """
+    "Has the current user favorited listing X?" for one favorite model
+    (Favorite for V1 CarListing, FavoriteV2 for V2 Listing).
+    """
+
+    def __init__(self, model, user):
+        self.model = model
+        self.user = user
+        self._pending: set[int] = set()
+        self._favorited: dict[int, bool] = {}
+
+    def register(self, listing_ids: Iterable[int]) -> None:
+        """Queue ids so the next miss loads them in the same query."""
+        self._pending.update(i for i in listing_ids if i not in self._favorited)
+
+    def prime(self, listing_ids: Iterable[int], favorited: bool) -> None:
+        """Record known answers (e.g. every row of myFavorites is favorited)."""
+        for listing_id in listing_ids:
+            self._favorited[listing_id] = favorited
+            self._pending.discard(listing_id)
+
+    def load(self, listing_id: int) -> bool:
+        if listing_id not in self._favorited:
+            self._pending.add(listing_id)
+            self._flush()
+        return self._favorited[listing_id]
+
+    def _flush(self) -> None:
+        ids, self._pending = self._pending, set()
+        found = set(
+            self.model.objects.filter(user=self.user, listing_id__in=ids).values_list("listing_id", flat=True)
+        )
+        for listing_id in ids:
+            self._favorited[listing_id] = listing_id in found
+
+
+def favorite_loader(info, model) -> Optional[FavoriteLoader]:
+    """The request's FavoriteLoader for `model`, or None for anonymous users."""
+    request = info.context.request
+    user = getattr(request, "user", None)
+    if not user or not user.is_authenticated:
+        return None
+
+    loaders = request.__dict__.setdefault("_favorite_loaders", {})
+    if model not in loaders:
+        loaders[model] = FavoriteLoader(model, user)
+    return loaders[model]
+
+
+class UniqueViewsLoader:
+    """Estimated distinct visitors of V2 listings over the last `days` days."""
+
+    def __init__(self, days: int, pending: set[int]):
+        self.days = days
+        self._pending = pending  # shared per request, filled by register_listings
+        self._counts: dict[int, int] = {}
+
+    def load(self, listing_id: int) -> int:
+        if listing_id not in self._counts:
+            ids = (self._pending - self._counts.keys()) | {listing_id}
+            self._counts.update(unique_views(ids, self.days))
+        return self._counts[listing_id]
+
+
+def unique_views_loader(info, days: int) -> UniqueViewsLoader:
+    request = info.context.request
+    days = max(1, min(days, getattr(settings, "UNIQUE_VIEWS_MAX_DAYS", 90)))
+    loaders = request.__dict__.setdefault("_unique_views_loaders", {})
+    if days not in loaders:
+        loaders[days] = UniqueViewsLoader(days, request.__dict__.setdefault("_listing_ids_v2", set()))
+    return loaders[days]
+
+
+def register_listings(info, favorite_model, listings: list) -> list:
+    """Register listings with the request's loaders; returns `listings` unchanged."""
+    loader = favorite_loader(info, favorite_model)
+    if loader is not None:
+        loader.register(listing.id for listing in listings)
+    if favorite_model is FavoriteV2:
+        info.context.request.__dict__.setdefault("_listing_ids_v2", set()).update(
+            listing.id for listing in listings
+        )
+    return listings
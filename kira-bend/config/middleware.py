@@ -1,28 +1,82 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+
+from accounts import revocation
+
+from .auth import CachedJWTAuthentication
 
 
 class JWTAuthMiddleware:
     """
     Allows JWT auth for normal Django HttpRequest objects (GraphQL included).
     If Authorization: Bearer <token> is present, it sets request.user.
+
+    The token is verified up front (no query) and stored on request.auth;
+    its user is resolved lazily through config.auth's user cache, so
+    requests that never read request.user never touch auth_user.
+
+    Sync and async capable, so under ASGI the async GraphQL view isn't
+    pushed onto a thread just to get past this middleware.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        self.jwt_auth = JWTAuthentication()
-
-    def __call__(self, request):
-        # If already authenticated by session, leave it
-        if getattr(request, "user", None) and request.user.is_authenticated:
-            return self.get_response(request)
+        self.jwt_auth = CachedJWTAuthentication()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
+    def _token_user(self, token, fallback):
         try:
-            result = self.jwt_auth.authenticate(request)
-            if result is not None:
-                user, token = result
-                request.user = user
-                request.auth = token
+            return self.jwt_auth.get_user(token)
         except Exception:
-            # If token is invalid/expired, just treat as anonymous
-            pass
+            # Unknown / inactive user: just treat as anonymous
+            return fallback
 
+    def _resolve(self, session_user, token):
+        # If already authenticated by session, leave it
+        if session_user is not None and session_user.is_authenticated:
+            return session_user
+        return self._token_user(token, session_user or AnonymousUser())
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        token = self.jwt_auth.validated_token(request)
+        if token is not None:
+            request.auth = token
+            # Still lazy: neither the session nor the token user is loaded here
+            session_user = getattr(request, "user", None)
+            request.user = SimpleLazyObject(lambda: self._resolve(session_user, token))
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Resolve the session user now: touching the lazy request.user later,
+        # from async code, would hit the database on the event loop
+        user = await request.auser() if hasattr(request, "auser") else None
+        if user is not None:
+            request.user = user
+
+        token = self.jwt_auth.validated_token(request, check_revoked=False)
+        if token is not None:
+            revoked = None if revocation.needs_sync() else revocation.cached_status(token)
+            if revoked is None:
+                # Due revocation-log sync or a Bloom hit to confirm: off the event loop
+                revoked = await sync_to_async(revocation.is_revoked)(token)
+            if revoked:
+                token = None
+
+        if token is not None and not (user and user.is_authenticated):
+            request.auth = token
+            cached = self.jwt_auth.cached_user(token)
+            if cached is not None:
+                request.user = cached
+            else:
+                # Cache miss loads the user row: run it off the event loop
+                request.user = await sync_to_async(self._token_user)(token, user or AnonymousUser())
+
+        return await self.get_response(request)
@@ -0,0 +1,139 @@
+"""
+Selection-aware queryset optimizer for the GraphQL resolvers.
+
+Walks the selection set the client actually sent and turns it into
+.only() columns, select_related() joins and Prefetch() querysets, so
+`listingsPageV2 { results { id title price } }` reads three columns and
+touches no related tables, while a full card query still costs one
+query per relation.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from strawberry.types.nodes import SelectedField
+from strawberry.utils.str_converters import to_snake_case
+
+from market.models import CarImage, ListingImage, ListingImageRendition
+
+# Computed GraphQL fields -> model columns their resolvers read
+FIELD_REQUIREMENTS = {
+    CarImage: {"image_url": ("image",), "thumbnail_url": ("thumbnail",)},
+    ListingImage: {"image_url": ("image",), "thumbnail_url": ("thumbnail",)},
+    ListingImageRendition: {"url": ("file",)},
+}
+
+# Computed GraphQL fields -> (relation, columns) their resolvers read;
+# planned as if the client had selected those columns under the relation
+FIELD_RELATIONS = {
+    ListingImage: {"srcset": ("renditions", ("size", "format", "width", "file"))},
+}
+
+
+def _flatten(selections) -> list[SelectedField]:
+    """Inline fragment spreads / inline fragments into a flat field list."""
+    fields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            fields.append(selection)
+        else:
+            fields.extend(_flatten(selection.selections))
+    return fields
+
+
+def selected_fields(info, *path: str) -> list[SelectedField]:
+    """
+    Fields selected under the current resolver's field, optionally descending
+    through wrapper fields by GraphQL name, e.g. selected_fields(info, "results")
+    for a page type or selected_fields(info, "edges", "node") for a connection.
+    """
+    fields = [child for field in _flatten(info.selected_fields) for child in _flatten(field.selections)]
+    for name in path:
+        fields = [child for field in fields if field.name == name for child in _flatten(field.selections)]
+    return fields
+
+
+def _column(name: str) -> SelectedField:
+    return SelectedField(name=name, directives={}, arguments={}, selections=[])
+
+
+def _expand(model, fields: list[SelectedField]) -> list[SelectedField]:
+    """
+    Replace relation-backed computed fields (FIELD_RELATIONS) with the relation
+    itself and merge repeated fields, so a relation is prefetched once however
+    many selections (aliases, srcset + renditions, ...) need it.
+    """
+    relations = FIELD_RELATIONS.get(model, {})
+    merged: dict[str, SelectedField] = {}
+    for field in fields:
+        name = to_snake_case(field.name)
+        if name in relations:
+            name, columns = relations[name]
+            field = SelectedField(name=name, directives={}, arguments={}, selections=[_column(c) for c in columns])
+        if name in merged:
+            first = merged[name]
+            merged[name] = SelectedField(
+                name=first.name,
+                directives={},
+                arguments={},
+                selections=_flatten(first.selections) + _flatten(field.selections),
+            )
+        else:
+            merged[name] = field
+    return list(merged.values())
+
+
+def _plan(model, fields, prefix: str, only: set, related: list, prefetches: list) -> None:
+    only.add(prefix + model._meta.pk.name)
+    requirements = FIELD_REQUIREMENTS.get(model, {})
+
+    for field in _expand(model, fields):
+        name = to_snake_case(field.name)
+        if name.startswith("__"):
+            continue
+
+        if name in requirements:
+            only.update(prefix + column for column in requirements[name])
+            continue
+
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Computed field without model requirements (e.g. isFavorited)
+            continue
+
+        children = _flatten(field.selections)
+
+        if model_field.is_relation and model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            # Forward FK / one-to-one: join it in the same query
+            only.add(prefix + name)
+            related.append(prefix + name)
+            _plan(model_field.related_model, children, f"{prefix}{name}__", only, related, prefetches)
+        elif model_field.one_to_many or model_field.many_to_many:
+            # Reverse FK / M2M: one extra query with its own optimized queryset
+            # (a reverse FK prefetch matches rows to parents through the FK column)
+            back_ref = (model_field.field.name,) if model_field.one_to_many else ()
+            child_qs = optimize(model_field.related_model.objects.all(), children, extra_only=back_ref)
+            prefetches.append(Prefetch(prefix + name, queryset=child_qs))
+        elif model_field.concrete:
+            only.add(prefix + name)
+
+
+def optimize(qs, fields: list[SelectedField], extra_only: tuple[str, ...] = ()):
+    """
+    Restrict qs to what `fields` (a selected_fields() result for qs.model) needs.
+    `extra_only` adds columns the resolver itself reads (e.g. cursor fields).
+    """
+    only, related, prefetches = set(extra_only), [], []
+    _plan(qs.model, fields, "", only, related, prefetches)
+
+    qs = qs.only(*sorted(only))
+    if related:
+        qs = qs.select_related(*related)
+    if prefetches:
+        qs = qs.prefetch_related(*prefetches)
+    return qs
+
+
+def optimize_related(qs, relation: str, fields: list[SelectedField]):
+    """optimize() for a queryset whose rows are returned through `relation` (e.g. favorites -> listing)."""
+    wrapper = SelectedField(name=relation, directives={}, arguments={}, selections=fields)
+    return optimize(qs, [wrapper])
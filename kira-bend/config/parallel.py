@@ -0,0 +1,43 @@
+"""
+Run a resolver's independent ORM reads at the same time.
+
+Django connections are per thread, so each extra callable runs in a worker
+thread with its own connection; e.g. the COUNT and the page slice of
+listingsPageV2 overlap instead of running back to back. Resolvers are
+synchronous under both the WSGI and the ASGI view (see django_resolver in
+config.schema), so this is used the same way from either.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "GRAPHQL_PARALLEL_WORKERS", 8),
+    thread_name_prefix="graphql-parallel",
+)
+
+
+def _run(func):
+    # Worker threads live outside the request cycle: honour CONN_MAX_AGE / broken connections ourselves
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+def parallel(*funcs) -> list:
+    """
+    Call each zero-argument function and return their results in order.
+    The first runs on the calling thread; inside a transaction everything
+    runs serially, since other connections can't see its uncommitted rows.
+    """
+    if len(funcs) < 2 or not getattr(settings, "GRAPHQL_PARALLEL_QUERIES", True) or connection.in_atomic_block:
+        return [func() for func in funcs]
+
+    # Copy the caller's context so per-operation state (e.g. SQL timing) follows the query
+    futures = [_executor.submit(contextvars.copy_context().run, _run, func) for func in funcs[1:]]
+    first = funcs[0]()
+    return [first, *(future.result() for future in futures)]
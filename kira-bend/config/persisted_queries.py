@@ -0,0 +1,126 @@
+"""
+Automatic persisted queries (Apollo APQ protocol) for /graphql/.
+
+Clients send `extensions.persistedQuery.sha256Hash` instead of (or with)
+the query text:
+  - hash + query: the server checks the hash and stores the document
+  - hash only:    the server looks the document up; an unknown hash answers
+                  PERSISTED_QUERY_NOT_FOUND and the client retries with the text
+
+Documents come from the operator manifest (GRAPHQL_PERSISTED_QUERIES_MANIFEST)
+first, then from the shared cache where clients registered them. With
+GRAPHQL_PERSISTED_QUERIES_ONLY the manifest is an allow-list: raw queries and
+client registration are refused.
+
+Parsed and validated ASTs are kept per process by Strawberry's ParserCache /
+ValidationCache, so a persisted document is parsed and validated once per
+worker rather than on every request.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import GraphQLError
+from strawberry.extensions import SchemaExtension
+
+APQ_VERSION = 1
+CACHE_PREFIX = "graphql:apq:"
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _manifest(path: str) -> dict[str, str]:
+    """
+    {sha256: query} from the manifest file. Accepts a plain mapping or the
+    Apollo persisted query manifest format ({"operations": [{"id", "body"}]}).
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+
+    if isinstance(data, dict) and "operations" in data:
+        data = {op["id"]: op["body"] for op in data["operations"]}
+
+    documents = {}
+    for sha, query in data.items():
+        if query_hash(query) != sha:
+            raise ValueError(f"Persisted query manifest entry {sha} does not match its document.")
+        documents[sha] = query
+    return documents
+
+
+def manifest() -> dict[str, str]:
+    return _manifest(getattr(settings, "GRAPHQL_PERSISTED_QUERIES_MANIFEST", ""))
+
+
+def allow_list_only() -> bool:
+    return getattr(settings, "GRAPHQL_PERSISTED_QUERIES_ONLY", False)
+
+
+def lookup(sha: str) -> Optional[str]:
+    query = manifest().get(sha)
+    if query is None and not allow_list_only():
+        query = cache.get(CACHE_PREFIX + sha)
+    return query
+
+
+def store(sha: str, query: str) -> None:
+    if sha not in manifest():
+        cache.set(CACHE_PREFIX + sha, query, getattr(settings, "GRAPHQL_PERSISTED_QUERIES_TTL", 86400))
+
+
+def _error(message: str, code: str) -> GraphQLError:
+    return GraphQLError(message, extensions={"code": code})
+
+
+def persisted_query_hash(operation_extensions: Optional[dict]) -> Optional[str]:
+    """The sha256Hash a request carries, or None for a plain query."""
+    persisted = (operation_extensions or {}).get("persistedQuery")
+    if not isinstance(persisted, dict):
+        return None
+    if persisted.get("version") != APQ_VERSION:
+        raise _error("Unsupported persisted query version.", "PERSISTED_QUERY_NOT_SUPPORTED")
+    sha = persisted.get("sha256Hash")
+    if not isinstance(sha, str) or not sha:
+        raise _error("Persisted query is missing sha256Hash.", "BAD_USER_INPUT")
+    return sha.lower()
+
+
+class PersistedQueries(SchemaExtension):
+    """
+    Resolves the request's document from its APQ hash before Strawberry
+    parses it. Must run before ParserCache / ValidationCache.
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        sha = persisted_query_hash(execution_context.operation_extensions)
+        query = execution_context.query
+
+        if sha is None:
+            if query and allow_list_only():
+                raise _error("Only persisted queries are accepted.", "PERSISTED_QUERY_REQUIRED")
+        elif query:
+            if query_hash(query) != sha:
+                raise _error("Provided sha256Hash does not match query.", "BAD_USER_INPUT")
+            if allow_list_only():
+                if sha not in manifest():
+                    raise _error("Query is not in the persisted query allow-list.", "PERSISTED_QUERY_NOT_ALLOWED")
+            else:
+                store(sha, query)
+        else:
+            query = lookup(sha)
+            if query is None:
+                if allow_list_only():
+                    raise _error("Query is not in the persisted query allow-list.", "PERSISTED_QUERY_NOT_ALLOWED")
+                raise _error("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            execution_context.query = query
+
+        yield
@@ -0,0 +1,96 @@
+"""
+Token-bucket rate limits for abusable mutations (login, register, ...),
+shared by every worker through the default cache.
+
+A bucket holds `burst` tokens and refills them over `period` seconds. It is
+stored GCRA-style as an anchor time plus a request counter: the counter is
+only ever changed with cache.incr()/decr(), which are atomic on Redis and
+LocMem, so concurrent requests from one attacker cannot all slip through.
+The bucket restarts (anchor = now) once it has fully refilled, and its keys
+expire at that same moment, so idle clients cost no cache memory.
+
+RATE_LIMITS maps an action to its buckets, keyed per client IP and/or per
+username. Behind a proxy, REMOTE_ADDR must be the client address.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError
+
+
+class RateLimited(GraphQLError):
+    def __init__(self, action: str, retry_after: float):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"Too many attempts. Try again in {retry_after} seconds.",
+            extensions={"code": "RATE_LIMITED", "action": action, "retryAfter": retry_after},
+        )
+
+
+def _take(cache, key: str, burst: int, period: float) -> float:
+    """Take one token; 0 if allowed, else seconds until one is available."""
+    interval = period / burst
+    anchor_key, count_key = f"{key}:t0", f"{key}:n"
+    now = time.time()
+
+    state = cache.get_many([anchor_key, count_key])
+    anchor, count = state.get(anchor_key), state.get(count_key)
+    if anchor is None or count is None or anchor + count * interval <= now:
+        # Full bucket: restart the sequence here
+        cache.set_many({anchor_key: now, count_key: 1}, timeout=math.ceil(interval) + 1)
+        return 0
+
+    try:
+        count = cache.incr(count_key)
+    except ValueError:
+        # Expired between get and incr, i.e. refilled in the meantime
+        cache.set_many({anchor_key: now, count_key: 1}, timeout=math.ceil(interval) + 1)
+        return 0
+
+    ready_at = anchor + count * interval  # when the bucket would be full again
+    if ready_at - now <= period:
+        ttl = math.ceil(ready_at - now) + 1
+        cache.touch(anchor_key, ttl)
+        cache.touch(count_key, ttl)
+        return 0
+
+    # Denied requests do not consume tokens
+    _refund(cache, [key])
+    return ready_at - now - period
+
+
+def _refund(cache, keys) -> None:
+    for key in keys:
+        try:
+            cache.decr(f"{key}:n")
+        except ValueError:
+            pass
+
+
+def check(action: str, **keys) -> None:
+    """Take a token from each bucket of `action` (keys: ip=..., username=...); raise RateLimited if one is empty."""
+    cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+    taken = []
+    for scope, (burst, period) in settings.RATE_LIMITS.get(action, {}).items():
+        value = keys.get(scope)
+        if not value:
+            continue
+        digest = hashlib.sha256(str(value).lower().encode()).hexdigest()[:32]
+        key = f"ratelimit:{action}:{scope}:{digest}"
+        retry_after = _take(cache, key, burst, period)
+        if retry_after:
+            _refund(cache, taken)
+            raise RateLimited(action, retry_after)
+        taken.append(key)
+
+
+def client_ip(request) -> str:
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def rate_limit(info, action: str, username: str = None) -> None:
+    """check() keyed by the GraphQL request's client IP (and `username` if given)."""
+    check(action, ip=client_ip(info.context.request), username=username)
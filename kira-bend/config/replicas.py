@@ -0,0 +1,107 @@
+"""
+Read replicas for GraphQL queries.
+
+DATABASE_REPLICAS (from DATABASE_REPLICA_URLS) lists read-only aliases. The
+ReadReplicas extension sends each query operation's reads to one of them
+(picked per operation, so its queries see one snapshot source); mutations,
+everything outside /graphql/, and every write go to `default`. Routing is
+per operation and follows config.parallel / django_resolver threads, since
+it lives in a context variable holding a shared object:
+
+  - the first write of an operation (ReplicaRouter.db_for_write) pins the
+    rest of it to the primary, so it reads its own writes;
+  - after a mutation (or a pinned query) the client is kept on the primary
+    for DB_STICKY_SECONDS, so the queries that follow see what it just did
+    despite replica lag. Users are recognised by their access token's user
+    id, without loading the user.
+
+Locally, point DATABASE_REPLICA_URLS at a second database on the same
+Postgres instance (or at the primary itself to exercise the routing only).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from strawberry.extensions import SchemaExtension
+
+PRIMARY = "default"
+
+
+class _Route:
+    def __init__(self, replica: str):
+        self.replica = replica
+        self.pinned = False
+
+
+_route: ContextVar[Optional[_Route]] = ContextVar("graphql_db_route", default=None)
+
+
+@contextmanager
+def replica_reads(replica: str):
+    """Route the block's reads to `replica` until its first write."""
+    token = _route.set(_Route(replica))
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def pinned() -> bool:
+    route = _route.get()
+    return route is not None and route.pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if route is None or route.pinned:
+            # Explicit, so instances loaded from a replica don't drag reads back to it
+            return PRIMARY
+        return route.replica
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None:
+            route.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's data
+        aliases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def _sticky_key(request) -> Optional[str]:
+    # Authenticated clients only: anonymous mutations (view counts, inquiries)
+    # don't need read-your-writes, and keying them by IP would pin whole NATs
+    token = getattr(request, "auth", None)
+    user_id = token.get(api_settings.USER_ID_CLAIM) if token is not None else None
+    return f"db:sticky:user:{user_id}" if user_id is not None else None
+
+
+class ReadReplicas(SchemaExtension):
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        key = _sticky_key(execution_context.context.request)
+        replicas = settings.DATABASE_REPLICAS
+        mutation = execution_context.operation_type.value == "mutation"
+
+        if mutation or not replicas or (key and cache.get(key)):
+            yield
+            wrote = mutation
+        else:
+            with replica_reads(random.choice(replicas)):
+                yield
+                wrote = pinned()
+
+        if wrote and key and replicas and settings.DB_STICKY_SECONDS:
+            cache.set(key, True, settings.DB_STICKY_SECONDS)
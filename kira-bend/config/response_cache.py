@@ -0,0 +1,144 @@
+"""
+Response cache for anonymous, read-only GraphQL operations.
+
+Only queries whose root fields are all in CACHEABLE_FIELDS are cached, and
+only for anonymous requests. Entries are keyed on the normalized document,
+operation name and variables, and remember the versions of the entity tags
+they were built from (see market.cache): static tags per root field, plus
+tags resolvers add while resolving (e.g. "listing:42"). A hit whose tags
+have moved on is a miss, so edits show up immediately; the TTL only bounds
+how long an untouched entry lives.
+
+The backend is the RESPONSE_CACHE_ALIAS cache (local memory by default).
+"""
+import hashlib
+import json
+from functools import lru_cache
+from typing import Iterator
+
+from django.conf import settings
+from graphql import ExecutionResult, FieldNode, OperationDefinitionNode, OperationType, parse, print_ast
+from strawberry.extensions import SchemaExtension
+
+from market.cache import tag_cache, tag_versions, tags_current
+
+# Root field -> entity tags its result depends on
+CACHEABLE_FIELDS = {
+    "categories": ("categories",),
+    "category": ("categories",),
+    "categoryAttributes": ("category_attributes",),
+    "listingBySlugV2": (),  # tagged per listing by the resolver
+    "listingsPageV2": ("listings",),
+}
+
+STATS_PREFIX = "graphql:response:stats:"
+
+
+@lru_cache(maxsize=256)
+def _document_digest(query: str) -> str:
+    """Hash of the document with formatting / comments normalized away."""
+    return hashlib.sha256(print_ast(parse(query)).encode()).hexdigest()
+
+
+def tag(info, *tags: str) -> None:
+    """Record entity tags the current operation's response depends on."""
+    pending = info.context.request.__dict__.get("_response_cache_tags")
+    if pending is not None:
+        pending.update(tag_versions(tags))
+
+
+def _count(field: str, outcome: str) -> None:
+    backend = tag_cache()
+    key = f"{STATS_PREFIX}{field}:{outcome}"
+    try:
+        backend.incr(key)
+    except ValueError:
+        backend.add(key, 0, timeout=None)
+        backend.incr(key)
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Hit/miss counters per cacheable root field."""
+    keys = {(field, outcome): f"{STATS_PREFIX}{field}:{outcome}" for field in CACHEABLE_FIELDS for outcome in ("hit", "miss")}
+    found = tag_cache().get_many(list(keys.values()))
+    return {
+        field: {outcome: found.get(keys[field, outcome], 0) for outcome in ("hit", "miss")}
+        for field in CACHEABLE_FIELDS
+    }
+
+
+class ResponseCache(SchemaExtension):
+    def __init__(self):
+        super().__init__()
+        self.key = None
+        self.hit = False
+
+    def _root_fields(self):
+        execution_context = self.execution_context
+        operations = [
+            d for d in execution_context.graphql_document.definitions
+            if isinstance(d, OperationDefinitionNode)
+            and (execution_context.operation_name is None or d.name and d.name.value == execution_context.operation_name)
+        ]
+        if len(operations) != 1 or operations[0].operation != OperationType.QUERY:
+            return None
+        selections = operations[0].selection_set.selections
+        # Fragments / directives at the root aren't worth the bookkeeping
+        if any(not isinstance(s, FieldNode) or s.directives for s in selections):
+            return None
+        names = [s.name.value for s in selections]
+        if not all(name in CACHEABLE_FIELDS for name in names):
+            return None
+        return names
+
+    def _cache_key(self) -> str:
+        execution_context = self.execution_context
+        raw = json.dumps(
+            [
+                _document_digest(execution_context.query),
+                execution_context.operation_name,
+                execution_context.variables or {},
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return "graphql:response:" + hashlib.sha256(raw.encode()).hexdigest()
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        request = execution_context.context.request
+        user = getattr(request, "user", None)
+        fields = None
+        if not (user and user.is_authenticated) and execution_context.query:
+            fields = self._root_fields()
+
+        if not fields:
+            yield
+            return
+
+        backend = tag_cache()
+        self.key = self._cache_key()
+        entry = backend.get(self.key)
+        if entry is not None and tags_current(entry["tags"]):
+            self.hit = True
+            for field in fields:
+                _count(field, "hit")
+            execution_context.result = ExecutionResult(data=entry["data"])
+            yield
+            return
+
+        for field in fields:
+            _count(field, "miss")
+        # Read tag versions before resolving, so a write during execution invalidates this entry
+        tags = tag_versions({t for field in fields for t in CACHEABLE_FIELDS[field]})
+        request.__dict__["_response_cache_tags"] = tags
+        yield
+
+        result = execution_context.result
+        if result is not None and not result.errors:
+            backend.set(self.key, {"data": result.data, "tags": tags}, settings.GRAPHQL_RESPONSE_CACHE_TTL)
+
+    def get_results(self) -> dict:
+        if self.key is None:
+            return {}
+        return {"responseCache": {"hit": self.hit}}
@@ -1,15 +1,32 @@
 import strawberry
+from strawberry.extensions import AddValidationRules, ParserCache, ValidationCache
 from strawberry.types import Info
+from strawberry.utils.inspect import in_async_context
 import strawberry_django
 from strawberry_django import auth
-
+from strawberry_django.resolvers import django_resolver
+
+import base64
+import dataclasses
+import functools
+import json
+from datetime import datetime
+from enum import Enum
 from typing import Optional, List
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.db.models import Q
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import BooleanField, Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
 
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from accounts import revocation
 from accounts.models import DealerProfile
 from leads.models import InquiryLead
 
@@ -18,16 +35,42 @@ from market.models import (
     # V1
     CarListing,
     CarImage,
+    CarListingView,
     Favorite,
     ListingStatus,
     # V2
     Category,
     Listing,
     ListingImage,
+    ListingImageRendition,
+    RenditionFormat,
+    RenditionSize,
     CategoryAttribute,
     ListingAttributeValue,
     FavoriteV2,
+    ListingView,
+    AttributeDataType,
+    TYPED_VALUE_FIELDS,
+    coerce_attribute_value,
 )
+from market import counts
+from market.attributes import upsert_listing_attributes
+from market.cache import listings_cache_key
+from market.facets import listing_facets
+from market.search import apply_search
+from market.view_counts import record_view, visitor_hash
+
+from .auth import pooled_authenticate
+from .cost import QueryCost, clamp_page_size, limit_rules
+from .instrumentation import Instrumentation
+from .loaders import favorite_loader, register_listings, unique_views_loader
+from .optimizer import optimize, optimize_related, selected_fields
+from .parallel import parallel
+from .persisted_queries import PersistedQueries
+from .ratelimit import rate_limit
+from .replicas import ReadReplicas
+from .response_cache import ResponseCache, tag
+from .timeouts import StatementTimeout
 
 
 # =====================================================
@@ -76,6 +119,15 @@ class PageInfo:
     offset: int
     has_next: bool
     has_prev: bool
+    # False when total_count is capped ("1000+") or a planner estimate
+    count_is_exact: bool = True
+
+
+@strawberry.enum
+class CountMode(Enum):
+    EXACT = counts.EXACT          # exact COUNT(*), cached per filter set
+    CAPPED = counts.CAPPED        # exact up to LISTING_COUNT_CAP, then "cap+"
+    ESTIMATED = counts.ESTIMATED  # planner estimate for broad queries
 
 
 # =====================================================
@@ -140,11 +192,11 @@ class CarListingType:
     images: list[CarImageType]
 
     @strawberry.field
+    @django_resolver
     def is_favorited(self, info: Info) -> bool:
-        user = info.context.request.user
-        if not user or not user.is_authenticated:
-            return False
-        return Favorite.objects.filter(user=user, listing_id=self.id).exists()
+        # Batched per request (see config.loaders)
+        loader = favorite_loader(info, Favorite)
+        return loader.load(self.id) if loader else False
 
 
 @strawberry_django.type(InquiryLead)
@@ -180,6 +232,35 @@ class CategoryType:
     created_at: strawberry.auto
 
 
+@strawberry.enum
+class ImageRenditionSize(Enum):
+    CARD = RenditionSize.CARD.value
+    GALLERY = RenditionSize.GALLERY.value
+    FULL = RenditionSize.FULL.value
+
+
+@strawberry.enum
+class ImageRenditionFormat(Enum):
+    AVIF = RenditionFormat.AVIF.value
+    WEBP = RenditionFormat.WEBP.value
+    JPEG = RenditionFormat.JPEG.value
+
+
+@strawberry_django.type(ListingImageRendition)
+class ListingImageRenditionType:
+    size: str
+    format: str
+    width: strawberry.auto
+    height: strawberry.auto
+
+    @strawberry.field
+    def url(self) -> Optional[str]:
+        try:
+            return self.file.url
+        except Exception:
+            return None
+
+
 @strawberry_django.type(ListingImage)
 class ListingImageType:
     id: strawberry.auto
@@ -189,6 +270,23 @@ class ListingImageType:
     sort_order: strawberry.auto
     created_at: strawberry.auto
 
+    # Filled in the background after upload (see market.renditions); empty until then
+    renditions: list[ListingImageRenditionType]
+
+    @strawberry.field
+    def srcset(
+        self,
+        size: ImageRenditionSize = ImageRenditionSize.CARD,
+        format: ImageRenditionFormat = ImageRenditionFormat.WEBP,
+    ) -> Optional[str]:
+        # e.g. "/media/.../card-480.webp 480w, /media/.../card-960.webp 960w"; null until rendered
+        candidates = [
+            f"{r.file.url} {r.width}w"
+            for r in self.renditions.all()
+            if r.size == size.value and r.format == format.value
+        ]
+        return ", ".join(candidates) or None
+
     @strawberry.field
     def image_url(self) -> Optional[str]:
         try:
@@ -252,11 +350,18 @@ class ListingType:
     attribute_values: list[ListingAttributeValueType]
 
     @strawberry.field
+    @django_resolver
     def is_favorited(self, info: Info) -> bool:
-        user = info.context.request.user
-        if not user or not user.is_authenticated:
-            return False
-        return FavoriteV2.objects.filter(user=user, listing_id=self.id).exists()
+        # Batched per request (see config.loaders)
+        loader = favorite_loader(info, FavoriteV2)
+        return loader.load(self.id) if loader else False
+
+    @strawberry.field
+    @django_resolver
+    def unique_views(self, info: Info, days: int = 30) -> int:
+        # Estimated distinct visitors over the last `days` days (HyperLogLog, ~2% error).
+        # Batched per request (see config.loaders); lags views not yet flushed
+        return unique_views_loader(info, days).load(self.id)
 
 
 @strawberry.type
@@ -266,6 +371,66 @@ class ListingsPageV2:
     results: list[ListingType]
 
 
+# Explore page facets
+@strawberry.type
+class FacetBucket:
+    value: str
+    label: str
+    count: int
+
+
+@strawberry.type
+class AttributeFacet:
+    key: str
+    label: str
+    buckets: list[FacetBucket]
+
+
+@strawberry.type
+class PriceBucket:
+    min: float
+    max: float
+    count: int
+
+
+@strawberry.type
+class ListingFacets:
+    total_count: int
+    categories: list[FacetBucket]
+    countries: list[FacetBucket]
+    regions: list[FacetBucket]
+    cities: list[FacetBucket]
+    attributes: list[AttributeFacet]
+    price_histogram: list[PriceBucket]
+
+
+# Relay-style connection (keyset pagination)
+@strawberry.type
+class ConnectionPageInfo:
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str]
+    end_cursor: Optional[str]
+
+
+@strawberry.type
+class ListingEdgeV2:
+    cursor: str
+    node: ListingType
+
+
+@strawberry.type
+class ListingConnectionV2:
+    edges: list[ListingEdgeV2]
+    page_info: ConnectionPageInfo
+
+
+@strawberry.enum
+class ListingSortV2(Enum):
+    FEATURED = "featured"    # featured first, then newest (default)
+    RELEVANCE = "relevance"  # full-text rank for `q`; falls back to FEATURED without `q`
+
+
 # =====================================================
 # Inputs (V1 legacy) — unchanged
 # =====================================================
@@ -359,10 +524,23 @@ class CreateInquiryInput:
 # Inputs (V2 universal) — GraphQL-safe + modern
 # =====================================================
 
+@strawberry.enum
+class AttributeFilterOp(Enum):
+    EQ = "eq"
+    IN = "in"
+    GTE = "gte"
+    LTE = "lte"
+    BETWEEN = "between"
+
+
 @strawberry.input
 class AttributeFilterKVInput:
     key: str
-    value: str
+    value: Optional[str] = None
+    op: AttributeFilterOp = AttributeFilterOp.EQ
+
+    # IN: any of `values`; BETWEEN: [low, high]
+    values: Optional[list[str]] = None
 
 
 @strawberry.input
@@ -385,8 +563,9 @@ class ListingsV2FilterInput:
 
     featured_only: Optional[bool] = None
 
-    # GraphQL-safe key/value list for dynamic attribute filters
-    # Example: [{key:"mileage", value:"50000"}, {key:"fuel_type", value:"DIESEL"}]
+    # GraphQL-safe key/value list for dynamic attribute filters (typed by CategoryAttribute.data_type)
+    # Example: [{key:"year", op:GTE, value:"2015"}, {key:"mileage", op:LTE, value:"80000"},
+    #           {key:"fuel_type", op:IN, values:["DIESEL","HYBRID"]}]
     attributes: Optional[list[AttributeFilterKVInput]] = None
 
 
@@ -436,6 +615,13 @@ def get_dealer_profile_or_none(user):
     return getattr(user, "dealer_profile", None)
 
 
+def _revoke_current_token(info: Info) -> None:
+    # User-wide cutoffs have one-second resolution (iat); the caller's own token goes explicitly
+    access = getattr(info.context.request, "auth", None)
+    if access is not None:
+        revocation.revoke_tokens([access])
+
+
 def require_dealer(info: Info) -> DealerProfile:
     user = require_user(info)
     dealer = get_dealer_profile_or_none(user)
@@ -449,24 +635,14 @@ def require_dealer(info: Info) -> DealerProfile:
 # -------------------------
 
 def _public_listings_qs(filters: ListingsFilterInput):
-    qs = (
-        CarListing.objects.select_related("dealer")
-        .prefetch_related("images")
-        .filter(status=ListingStatus.PUBLISHED)
-    )
+    # Columns / joins / prefetches are added by the resolver (config.optimizer)
+    qs = CarListing.objects.filter(status=ListingStatus.PUBLISHED)
 
     if filters.featured_only is True:
         qs = qs.filter(is_featured=True)
 
     if filters.q:
-        q = filters.q.strip()
-        qs = qs.filter(
-            Q(title__icontains=q)
-            | Q(make__icontains=q)
-            | Q(model__icontains=q)
-            | Q(trim__icontains=q)
-            | Q(description__icontains=q)
-        )
+        qs = apply_search(qs, filters.q)
 
     if filters.make:
         qs = qs.filter(make__iexact=filters.make)
@@ -497,12 +673,9 @@ def _public_listings_qs(filters: ListingsFilterInput):
 # V2 listing queryset helper (modern + category + attributes)
 # -------------------------
 
-def _public_listings_v2_qs(filters: ListingsV2FilterInput):
-    qs = (
-        Listing.objects.select_related("dealer", "category")
-        .prefetch_related("images", "attribute_values__attribute")
-        .filter(status=ListingStatus.PUBLISHED)
-    )
+def _public_listings_v2_qs(filters: ListingsV2FilterInput, sort: Optional[ListingSortV2] = None):
+    # Columns / joins / prefetches are added by the resolver (config.optimizer)
+    qs = Listing.objects.filter(status=ListingStatus.PUBLISHED)
 
     if filters.featured_only is True:
         qs = qs.filter(is_featured=True)
@@ -510,15 +683,9 @@ def _public_listings_v2_qs(filters: ListingsV2FilterInput):
     if filters.category_slug:
         qs = qs.filter(category__slug=filters.category_slug)
 
+    ranked = sort == ListingSortV2.RELEVANCE and bool(filters.q)
     if filters.q:
-        q = filters.q.strip()
-        qs = qs.filter(
-            Q(title__icontains=q)
-            | Q(description__icontains=q)
-            | Q(city__icontains=q)
-            | Q(region__icontains=q)
-            | Q(country__icontains=q)
-        )
+        qs = apply_search(qs, filters.q, rank=ranked)
 
     if filters.price_min is not None:
         qs = qs.filter(price__gte=filters.price_min)
@@ -532,50 +699,261 @@ def _public_listings_v2_qs(filters: ListingsV2FilterInput):
     if filters.city:
         qs = qs.filter(city__iexact=filters.city)
 
-    # GraphQL-safe key/value list filtering
+    # GraphQL-safe key/value list filtering (typed columns, indexed per attribute).
+    # Each filter is a correlated EXISTS semi-join, so rows never fan out and no DISTINCT is needed.
     if filters.attributes:
+        definitions = _attribute_definitions(filters.attributes, filters.category_slug)
         for kv in filters.attributes:
             key = (kv.key or "").strip()
-            raw = (kv.value or "").strip()
             if not key:
                 continue
-            qs = qs.filter(
-                attribute_values__attribute__key=key,
-                attribute_values__value__icontains=str(raw),
-            )
+            cond = _attribute_filter_q(definitions.get(key, []), kv)
+            if cond is None:
+                return qs.none()
+            qs = qs.filter(Exists(ListingAttributeValue.objects.filter(cond, listing=OuterRef("pk"))))
 
-    return qs.order_by("-is_featured", "-created_at").distinct()
+    if "search_rank" in qs.query.annotations:
+        return qs.order_by("-search_rank", "-is_featured", "-created_at", "-id")
+    return qs.order_by(*PUBLIC_LISTING_ORDER)
 
 
-def _upsert_listing_attributes(listing: Listing, attrs: list[AttributeKVInput]):
+_RANGE_TYPES = (AttributeDataType.INT, AttributeDataType.FLOAT)
+
+
+def _attribute_definitions(kvs: list[AttributeFilterKVInput], category_slug: Optional[str]):
     """
-    Upsert ListingAttributeValue based on attribute keys for the listing's category.
-    Unknown keys are ignored (safe default).
+    key -> [CategoryAttribute] for the filtered keys (one query).
+    A key may exist in several categories when no category is selected.
     """
-    if not attrs:
-        return
+    keys = {(kv.key or "").strip() for kv in kvs} - {""}
+    qs = CategoryAttribute.objects.filter(key__in=keys).only("id", "key", "data_type")
+    if category_slug:
+        qs = qs.filter(category__slug=category_slug)
+
+    definitions = {}
+    for attr in qs:
+        definitions.setdefault(attr.key, []).append(attr)
+    return definitions
 
-    allowed = {
-        a.key: a
-        for a in CategoryAttribute.objects.filter(category=listing.category)
-    }
 
-    for kv in attrs:
-        key = kv.key
-        if key not in allowed:
+def _attribute_filter_q(attrs: list[CategoryAttribute], kv: AttributeFilterKVInput) -> Optional[Q]:
+    """
+    Q over ListingAttributeValue typed columns for one attribute filter
+    (evaluated inside the per-filter EXISTS subquery).
+    Returns None when nothing can match (unknown key / values of the wrong type).
+    """
+    op = kv.op or AttributeFilterOp.EQ
+    raw_values = list(kv.values or [])
+    if kv.value is not None:
+        raw_values.insert(0, kv.value)
+
+    if op == AttributeFilterOp.BETWEEN and len(raw_values) != 2:
+        raise Exception(f"Attribute filter '{kv.key}': BETWEEN needs exactly two values.")
+
+    combined = None
+    for attr in attrs:
+        if op in (AttributeFilterOp.GTE, AttributeFilterOp.LTE, AttributeFilterOp.BETWEEN) \
+                and attr.data_type not in _RANGE_TYPES:
+            raise Exception(f"Attribute filter '{kv.key}': {op.name} needs a numeric attribute.")
+
+        typed = []
+        for raw in raw_values:
+            try:
+                typed.append(coerce_attribute_value(attr.data_type, raw))
+            except ValueError:
+                continue
+
+        if op == AttributeFilterOp.BETWEEN and len(typed) != 2:
+            continue
+        if not typed:
             continue
 
-        ListingAttributeValue.objects.update_or_create(
-            listing=listing,
-            attribute=allowed[key],
-            defaults={"value": kv.value},
-        )
+        column = TYPED_VALUE_FIELDS[attr.data_type]
+        if op == AttributeFilterOp.IN:
+            lookup = {f"{column}__in": typed}
+        elif op == AttributeFilterOp.GTE:
+            lookup = {f"{column}__gte": typed[0]}
+        elif op == AttributeFilterOp.LTE:
+            lookup = {f"{column}__lte": typed[0]}
+        elif op == AttributeFilterOp.BETWEEN:
+            lookup = {f"{column}__range": (min(typed), max(typed))}
+        else:
+            lookup = {column: typed[0]}
+
+        cond = Q(attribute_id=attr.id, **lookup)
+        combined = cond if combined is None else combined | cond
+
+    return combined
+
+
+# -------------------------
+# Pagination / page counts
+# -------------------------
+
+def _pagination(info: Info, pagination: Optional[PaginationInput]) -> PaginationInput:
+    """Defaulted pagination with `limit` clamped to this field's maximum page size (see config.cost)."""
+    if pagination is None:
+        pagination = PaginationInput()
+    pagination.limit = clamp_page_size(info.field_name, pagination.limit)
+    pagination.offset = max(0, pagination.offset)
+    return pagination
+
+
+# Facet dimension -> the ListingsV2FilterInput fields filtering it
+_FACET_FILTER_FIELDS = {
+    "category": ("category_slug",),
+    "country": ("country",),
+    "region": ("region",),
+    "city": ("city",),
+    "price": ("price_min", "price_max"),
+}
+
+
+def _facet_exclusions(filters: ListingsV2FilterInput) -> dict:
+    """
+    Facet dimension -> builder of the listing queryset with that dimension's
+    filter left out, for each filtered dimension (see market.facets).
+    """
+    excluding = {}
+    for dimension, fields in _FACET_FILTER_FIELDS.items():
+        if any(getattr(filters, field) not in (None, "") for field in fields):
+            without = dataclasses.replace(filters, **dict.fromkeys(fields))
+            excluding[dimension] = functools.partial(_public_listings_v2_qs, without)
+
+    attributes = filters.attributes or []
+    for key in {(kv.key or "").strip() for kv in attributes} - {""}:
+        rest = [kv for kv in attributes if (kv.key or "").strip() != key]
+        without = dataclasses.replace(filters, attributes=rest or None)
+        excluding[f"attribute:{key}"] = functools.partial(_public_listings_v2_qs, without)
+    return excluding
+
+
+def _normalized(value):
+    """Canonical JSON-able form of a filter input (for cache keys)."""
+    if dataclasses.is_dataclass(value):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        return {k: _normalized(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        items = [_normalized(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+def _page(qs, pagination: PaginationInput, namespace: str, filters, count_mode: CountMode):
+    """(total, count_is_exact, has_next, results) for an offset page."""
+    start = pagination.offset
+    end = pagination.offset + pagination.limit
+
+    cache_key = None
+    if count_mode == CountMode.EXACT:
+        cache_key = listings_cache_key(f"count:{namespace}", _normalized(filters))
+
+    # The page slice and the count are independent: run them side by side.
+    # One extra row tells us whether there is a next page, whatever the count mode.
+    rows, (total, exact) = parallel(
+        lambda: list(qs[start:end + 1]),
+        lambda: counts.count_queryset(qs, count_mode.value, cache_key=cache_key),
+    )
+    has_next = len(rows) > pagination.limit
+    results = rows[:pagination.limit]
+
+    # Never report fewer results than this page already proves exist
+    total = max(total, start + len(results))
+    return total, exact, has_next, results
+
+
+# -------------------------
+# Keyset (cursor) pagination
+# -------------------------
+
+# Orderings are all-descending so a cursor maps to one row comparison,
+# matching the (status, -is_featured, -created_at, -id) / (dealer, -created_at, -id) indexes.
+PUBLIC_LISTING_ORDER = ("-is_featured", "-created_at", "-id")
+DEALER_LISTING_ORDER = ("-created_at", "-id")
+CURSOR_FIELDS = ("is_featured", "created_at")
+
+
+def _encode_cursor(listing: Listing) -> str:
+    """Opaque cursor for (is_featured, created_at, id)."""
+    raw = json.dumps([listing.is_featured, listing.created_at.isoformat(), listing.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        is_featured, created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"is_featured": bool(is_featured), "created_at": datetime.fromisoformat(created_at), "id": int(pk)}
+    except Exception:
+        raise Exception("Invalid cursor.")
+
+
+def _keyset_after(qs, ordering: tuple[str, ...], cursor: str):
+    """
+    Rows strictly after `cursor` for an all-descending `ordering`, as a single
+    row-value comparison: (a, b, c) < (%s, %s, %s). Postgres turns this into an
+    index range scan instead of walking and discarding an OFFSET.
+    """
+    values = _decode_cursor(cursor)
+    fields = [f.lstrip("-") for f in ordering]
+    table = connection.ops.quote_name(qs.model._meta.db_table)
+    columns = ", ".join(f"{table}.{connection.ops.quote_name(qs.model._meta.get_field(f).column)}" for f in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    return qs.filter(
+        RawSQL(f"({columns}) < ({placeholders})", [values[f] for f in fields], output_field=BooleanField())
+    )
+
+
+def _listing_connection(qs, ordering: tuple[str, ...], first: int, after: Optional[str]) -> ListingConnectionV2:
+    if first < 1:
+        raise Exception("`first` must be at least 1.")
+
+    qs = qs.order_by(*ordering)
+    if after:
+        qs = _keyset_after(qs, ordering, after)
+
+    rows = list(qs[: first + 1])
+    has_next = len(rows) > first
+    rows = rows[:first]
+
+    edges = [ListingEdgeV2(cursor=_encode_cursor(row), node=row) for row in rows]
+    return ListingConnectionV2(
+        edges=edges,
+        page_info=ConnectionPageInfo(
+            has_next_page=has_next,
+            has_previous_page=bool(after),
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+    )
+
+
+def _upsert_listing_attributes(listing: Listing, attrs: list[AttributeKVInput]):
+    """
+    Upsert ListingAttributeValue based on attribute keys for the listing's category,
+    in one statement (see market.attributes). Unknown keys are ignored (safe default);
+    values that don't match the attribute's data_type / choices are rejected.
+    Repeated keys: the last one wins.
+    """
+    if not attrs:
+        return
+
+    try:
+        upsert_listing_attributes(listing, {kv.key: kv.value for kv in attrs})
+    except ValueError as exc:
+        raise Exception(str(exc))
 
 
 # =====================================================
 # Query
 # =====================================================
 
+# Resolvers are plain (sync) ORM code: @django_resolver calls them inline under
+# the WSGI view and via sync_to_async under the ASGI view (config.views).
 @strawberry.type
 class Query:
     me: Optional[UserType] = auth.current_user()
@@ -584,49 +962,51 @@ class Query:
     # Dealers (shared)
     # -------------------------
     @strawberry.field
-    def dealers(self, pagination: Optional[PaginationInput] = None) -> list[DealerType]:
-        if pagination is None:
-            pagination = PaginationInput()
-        qs = DealerProfile.objects.all().order_by("-created_at")
+    @django_resolver
+    def dealers(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[DealerType]:
+        pagination = _pagination(info, pagination)
+        qs = optimize(DealerProfile.objects.all(), selected_fields(info)).order_by("-created_at")
         return list(qs[pagination.offset: pagination.offset + pagination.limit])
 
     @strawberry.field
-    def dealer(self, dealer_id: strawberry.ID) -> Optional[DealerType]:
-        return DealerProfile.objects.filter(id=dealer_id).first()
+    @django_resolver
+    def dealer(self, info: Info, dealer_id: strawberry.ID) -> Optional[DealerType]:
+        return optimize(DealerProfile.objects.filter(id=dealer_id), selected_fields(info)).first()
 
     # =================================================
     # V1 (Cars) — unchanged endpoints
     # =================================================
 
     @strawberry.field
+    @django_resolver
     def listings(
         self,
+        info: Info,
         filters: Optional[ListingsFilterInput] = None,
         pagination: Optional[PaginationInput] = None,
     ) -> list[CarListingType]:
         if filters is None:
             filters = ListingsFilterInput()
-        if pagination is None:
-            pagination = PaginationInput()
-        qs = _public_listings_qs(filters)
-        return list(qs[pagination.offset: pagination.offset + pagination.limit])
+        pagination = _pagination(info, pagination)
+        qs = optimize(_public_listings_qs(filters), selected_fields(info))
+        return register_listings(info, Favorite, list(qs[pagination.offset: pagination.offset + pagination.limit]))
 
     @strawberry.field
+    @django_resolver
     def listings_page(
         self,
+        info: Info,
         filters: Optional[ListingsFilterInput] = None,
         pagination: Optional[PaginationInput] = None,
+        count_mode: CountMode = CountMode.EXACT,
     ) -> ListingsPage:
         if filters is None:
             filters = ListingsFilterInput()
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = _public_listings_qs(filters)
-        total = qs.count()
-        start = pagination.offset
-        end = pagination.offset + pagination.limit
-        results = list(qs[start:end])
+        qs = optimize(_public_listings_qs(filters), selected_fields(info, "results"))
+        total, exact, has_next, results = _page(qs, pagination, "v1", filters, count_mode)
+        register_listings(info, Favorite, results)
 
         return ListingsPage(
             total_count=total,
@@ -634,129 +1014,120 @@ class Query:
                 limit=pagination.limit,
                 offset=pagination.offset,
                 has_prev=pagination.offset > 0,
-                has_next=end < total,
+                has_next=has_next,
+                count_is_exact=exact,
             ),
             results=results,
         )
 
     @strawberry.field
-    def listing(self, listing_id: strawberry.ID) -> Optional[CarListingType]:
-        return (
-            CarListing.objects.select_related("dealer")
-            .prefetch_related("images")
-            .filter(id=listing_id, status=ListingStatus.PUBLISHED)
-            .first()
-        )
+    @django_resolver
+    def listing(self, info: Info, listing_id: strawberry.ID) -> Optional[CarListingType]:
+        qs = CarListing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED)
+        return optimize(qs, selected_fields(info)).first()
 
     @strawberry.field
-    def listing_by_slug(self, slug: str) -> Optional[CarListingType]:
-        return (
-            CarListing.objects.select_related("dealer")
-            .prefetch_related("images")
-            .filter(slug=slug, status=ListingStatus.PUBLISHED)
-            .first()
-        )
+    @django_resolver
+    def listing_by_slug(self, info: Info, slug: str) -> Optional[CarListingType]:
+        qs = CarListing.objects.filter(slug=slug, status=ListingStatus.PUBLISHED)
+        return optimize(qs, selected_fields(info)).first()
 
     @strawberry.field
+    @django_resolver
     def my_listings(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[CarListingType]:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
         if not dealer:
             return []
 
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = (
-            CarListing.objects.select_related("dealer")
-            .prefetch_related("images")
-            .filter(dealer=dealer)
-            .order_by("-created_at")
-        )
-        return list(qs[pagination.offset: pagination.offset + pagination.limit])
+        qs = optimize(CarListing.objects.filter(dealer=dealer), selected_fields(info)).order_by("-created_at")
+        return register_listings(info, Favorite, list(qs[pagination.offset: pagination.offset + pagination.limit]))
 
     @strawberry.field
+    @django_resolver
     def my_leads(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[InquiryLeadType]:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
         if not dealer:
             return []
 
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = (
-            InquiryLead.objects.select_related("dealer", "listing")
-            .filter(dealer=dealer)
-            .order_by("-created_at")
-        )
-        return list(qs[pagination.offset: pagination.offset + pagination.limit])
+        qs = optimize(
+            InquiryLead.objects.filter(dealer=dealer), selected_fields(info), extra_only=("listing",)
+        ).order_by("-created_at")
+        leads = list(qs[pagination.offset: pagination.offset + pagination.limit])
+
+        loader = favorite_loader(info, Favorite)
+        loader.register(lead.listing_id for lead in leads)
+        return leads
 
     @strawberry.field
+    @django_resolver
     def my_favorites(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[CarListingType]:
         user = require_user(info)
-        if pagination is None:
-            pagination = PaginationInput()
-
-        favs = (
-            Favorite.objects.filter(user=user)
-            .select_related("listing__dealer")
-            .prefetch_related("listing__images")
-            .order_by("-created_at")
-        )
-        return [f.listing for f in favs[pagination.offset: pagination.offset + pagination.limit]]
+        pagination = _pagination(info, pagination)
+
+        favs = optimize_related(Favorite.objects.filter(user=user), "listing", selected_fields(info)).order_by("-created_at")
+        listings = [f.listing for f in favs[pagination.offset: pagination.offset + pagination.limit]]
+        favorite_loader(info, Favorite).prime((listing.id for listing in listings), True)
+        return listings
 
     # =================================================
     # V2 (Universal Marketplace) — modern endpoints
     # =================================================
 
     @strawberry.field
-    def categories(self) -> list[CategoryType]:
-        return list(Category.objects.all().order_by("name"))
+    @django_resolver
+    def categories(self, info: Info) -> list[CategoryType]:
+        return list(optimize(Category.objects.all(), selected_fields(info)).order_by("name"))
 
     @strawberry.field
-    def category(self, slug: str) -> Optional[CategoryType]:
-        return Category.objects.filter(slug=slug).first()
+    @django_resolver
+    def category(self, info: Info, slug: str) -> Optional[CategoryType]:
+        return optimize(Category.objects.filter(slug=slug), selected_fields(info)).first()
 
     @strawberry.field
-    def category_attributes(self, category_slug: str) -> list[CategoryAttributeType]:
-        return list(
-            CategoryAttribute.objects.select_related("category")
-            .filter(category__slug=category_slug)
-            .order_by("sort_order", "id")
-        )
+    @django_resolver
+    def category_attributes(self, info: Info, category_slug: str) -> list[CategoryAttributeType]:
+        qs = CategoryAttribute.objects.filter(category__slug=category_slug)
+        return list(optimize(qs, selected_fields(info)).order_by("sort_order", "id"))
 
     @strawberry.field
+    @django_resolver
     def listings_v2(
         self,
+        info: Info,
         filters: Optional[ListingsV2FilterInput] = None,
         pagination: Optional[PaginationInput] = None,
+        sort: Optional[ListingSortV2] = None,
     ) -> list[ListingType]:
         if filters is None:
             filters = ListingsV2FilterInput()
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = _public_listings_v2_qs(filters)
-        return list(qs[pagination.offset: pagination.offset + pagination.limit])
+        qs = optimize(_public_listings_v2_qs(filters, sort), selected_fields(info))
+        return register_listings(info, FavoriteV2, list(qs[pagination.offset: pagination.offset + pagination.limit]))
 
     @strawberry.field
+    @django_resolver
     def listings_page_v2(
         self,
+        info: Info,
         filters: Optional[ListingsV2FilterInput] = None,
         pagination: Optional[PaginationInput] = None,
+        sort: Optional[ListingSortV2] = None,
+        count_mode: CountMode = CountMode.EXACT,
     ) -> ListingsPageV2:
         if filters is None:
             filters = ListingsV2FilterInput()
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = _public_listings_v2_qs(filters)
-
-        total = qs.count()
-        start = pagination.offset
-        end = pagination.offset + pagination.limit
-        results = list(qs[start:end])
+        qs = optimize(_public_listings_v2_qs(filters, sort), selected_fields(info, "results"))
+        total, exact, has_next, results = _page(qs, pagination, "v2", filters, count_mode)
+        register_listings(info, FavoriteV2, results)
 
         return ListingsPageV2(
             total_count=total,
@@ -764,66 +1135,148 @@ class Query:
                 limit=pagination.limit,
                 offset=pagination.offset,
                 has_prev=pagination.offset > 0,
-                has_next=end < total,
+                has_next=has_next,
+                count_is_exact=exact,
             ),
             results=results,
         )
 
     @strawberry.field
-    def listing_v2(self, listing_id: strawberry.ID) -> Optional[ListingType]:
-        return (
-            Listing.objects.select_related("dealer", "category")
-            .prefetch_related("images", "attribute_values__attribute")
-            .filter(id=listing_id, status=ListingStatus.PUBLISHED)
-            .first()
+    @django_resolver
+    def listing_facets(
+        self,
+        filters: Optional[ListingsV2FilterInput] = None,
+        price_buckets: int = 10,
+    ) -> ListingFacets:
+        """Result counts per category / location / choice attribute + price histogram for `filters`."""
+        if filters is None:
+            filters = ListingsV2FilterInput()
+
+        cache_key = listings_cache_key("facets", {"filters": _normalized(filters), "price_buckets": price_buckets})
+        data = listing_facets(
+            _public_listings_v2_qs(filters),
+            price_buckets=price_buckets,
+            cache_key=cache_key,
+            excluding=_facet_exclusions(filters),
+        )
+
+        def buckets(rows):
+            return [FacetBucket(**row) for row in rows]
+
+        return ListingFacets(
+            total_count=data["total_count"],
+            categories=buckets(data["categories"]),
+            countries=buckets(data["countries"]),
+            regions=buckets(data["regions"]),
+            cities=buckets(data["cities"]),
+            attributes=[
+                AttributeFacet(key=a["key"], label=a["label"], buckets=buckets(a["buckets"]))
+                for a in data["attributes"]
+            ],
+            price_histogram=[PriceBucket(**row) for row in data["price_histogram"]],
         )
 
     @strawberry.field
-    def listing_by_slug_v2(self, slug: str) -> Optional[ListingType]:
-        return (
-            Listing.objects.select_related("dealer", "category")
-            .prefetch_related("images", "attribute_values__attribute")
-            .filter(slug=slug, status=ListingStatus.PUBLISHED)
-            .first()
+    @django_resolver
+    def listings_connection_v2(
+        self,
+        info: Info,
+        filters: Optional[ListingsV2FilterInput] = None,
+        first: int = 24,
+        after: Optional[str] = None,
+    ) -> ListingConnectionV2:
+        """Keyset-paginated variant of listingsPageV2 (stable under concurrent inserts)."""
+        if filters is None:
+            filters = ListingsV2FilterInput()
+
+        # cursor encoding reads the ordering columns of every row
+        qs = optimize(
+            _public_listings_v2_qs(filters), selected_fields(info, "edges", "node"), extra_only=CURSOR_FIELDS
         )
+        page = _listing_connection(qs, PUBLIC_LISTING_ORDER, clamp_page_size(info.field_name, first), after)
+        register_listings(info, FavoriteV2, [edge.node for edge in page.edges])
+        return page
+
+    @strawberry.field
+    @django_resolver
+    def listing_v2(self, info: Info, listing_id: strawberry.ID) -> Optional[ListingType]:
+        qs = Listing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED)
+        return optimize(qs, selected_fields(info)).first()
+
+    @strawberry.field
+    @django_resolver
+    def listing_by_slug_v2(self, info: Info, slug: str) -> Optional[ListingType]:
+        qs = Listing.objects.filter(slug=slug, status=ListingStatus.PUBLISHED)
+        listing = optimize(qs, selected_fields(info)).first()
+        # A miss can turn into a hit when any listing is published under this slug
+        tag(info, f"listing:{listing.id}" if listing else "listings")
+        return listing
 
     @strawberry.field
+    @django_resolver
     def my_listings_v2(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[ListingType]:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
         if not dealer:
             return []
 
-        if pagination is None:
-            pagination = PaginationInput()
+        pagination = _pagination(info, pagination)
 
-        qs = (
-            Listing.objects.select_related("dealer", "category")
-            .prefetch_related("images", "attribute_values__attribute")
-            .filter(dealer=dealer)
-            .order_by("-created_at")
-        )
-        return list(qs[pagination.offset: pagination.offset + pagination.limit])
+        qs = optimize(Listing.objects.filter(dealer=dealer), selected_fields(info)).order_by(*DEALER_LISTING_ORDER)
+        return register_listings(info, FavoriteV2, list(qs[pagination.offset: pagination.offset + pagination.limit]))
 
     @strawberry.field
+    @django_resolver
+    def my_listings_connection_v2(
+        self,
+        info: Info,
+        first: int = 24,
+        after: Optional[str] = None,
+    ) -> ListingConnectionV2:
+        """Keyset-paginated variant of myListingsV2."""
+        user = require_user(info)
+        dealer = get_dealer_profile_or_none(user)
+        if not dealer:
+            return _listing_connection(Listing.objects.none(), DEALER_LISTING_ORDER, first, None)
+
+        qs = optimize(Listing.objects.filter(dealer=dealer), selected_fields(info, "edges", "node"), extra_only=CURSOR_FIELDS)
+        page = _listing_connection(qs, DEALER_LISTING_ORDER, clamp_page_size(info.field_name, first), after)
+        register_listings(info, FavoriteV2, [edge.node for edge in page.edges])
+        return page
+
+    @strawberry.field
+    @django_resolver
     def my_favorites_v2(self, info: Info, pagination: Optional[PaginationInput] = None) -> list[ListingType]:
         user = require_user(info)
-        if pagination is None:
-            pagination = PaginationInput()
-
-        favs = (
-            FavoriteV2.objects.filter(user=user)
-            .select_related("listing__dealer", "listing__category")
-            .prefetch_related("listing__images", "listing__attribute_values__attribute")
-            .order_by("-created_at")
-        )
-        return [f.listing for f in favs[pagination.offset: pagination.offset + pagination.limit]]
+        pagination = _pagination(info, pagination)
+
+        favs = optimize_related(FavoriteV2.objects.filter(user=user), "listing", selected_fields(info)).order_by("-created_at")
+        listings = [f.listing for f in favs[pagination.offset: pagination.offset + pagination.limit]]
+        favorite_loader(info, FavoriteV2).prime((listing.id for listing in listings), True)
+        return register_listings(info, FavoriteV2, listings)
 
 
 # =====================================================
 # Mutations
 # =====================================================
 
+def _login_payload(user) -> AuthPayload:
+    if not user:
+        raise Exception("Invalid username or password.")
+
+    refresh = RefreshToken.for_user(user)
+
+    return AuthPayload(
+        user=user,
+        tokens=AuthTokens(access=str(refresh.access_token), refresh=str(refresh)),
+    )
+
+
+async def _alogin(info: Info, username: str, password: str) -> AuthPayload:
+    await sync_to_async(rate_limit, thread_sensitive=False)(info, "login", username=username)
+    return _login_payload(await pooled_authenticate(username=username, password=password))
+
+
 @strawberry.type
 class Mutation:
     # -------------------------
@@ -831,7 +1284,9 @@ class Mutation:
     # -------------------------
 
     @strawberry.mutation
-    def register(self, username: str, email: str, password: str) -> AuthPayload:
+    @django_resolver
+    def register(self, info: Info, username: str, email: str, password: str) -> AuthPayload:
+        rate_limit(info, "register", username=username)
         User = get_user_model()
 
         if User.objects.filter(username=username).exists():
@@ -849,35 +1304,74 @@ class Mutation:
 
     @strawberry.mutation
     def login(self, info: Info, username: str, password: str) -> AuthPayload:
-        user = authenticate(username=username, password=password)
-        if not user:
-            raise Exception("Invalid username or password.")
-
-        refresh = RefreshToken.for_user(user)
-
-        return AuthPayload(
-            user=user,
-            tokens=AuthTokens(access=str(refresh.access_token), refresh=str(refresh)),
-        )
+        if in_async_context():
+            # Hash on the bounded pool, not on the thread django_resolver shares with every resolver
+            return _alogin(info, username, password)
+        rate_limit(info, "login", username=username)
+        return _login_payload(authenticate(username=username, password=password))
 
     @strawberry.mutation
-    def refresh_token(self, refresh: str) -> AuthTokens:
+    @django_resolver
+    def refresh_token(self, info: Info, refresh: str) -> AuthTokens:
+        rate_limit(info, "refresh_token")
         try:
             token = RefreshToken(refresh)
+            if revocation.is_revoked(token):
+                raise TokenError("Token has been revoked")
             access = str(token.access_token)
             return AuthTokens(access=access, refresh=refresh)
         except Exception:
             raise Exception("Invalid refresh token.")
 
     @strawberry.mutation
-    def logout(self, refresh: str) -> bool:
+    @django_resolver
+    def logout(self, info: Info, refresh: str) -> bool:
+        # Revoke the refresh token and the access token this request was made with
+        tokens = []
+        try:
+            tokens.append(RefreshToken(refresh))
+        except TokenError:
+            pass
+        access = getattr(info.context.request, "auth", None)
+        if access is not None:
+            tokens.append(access)
+        revocation.revoke_tokens(tokens)
         return True
 
+    @strawberry.mutation
+    @django_resolver
+    def revoke_all_sessions(self, info: Info) -> bool:
+        """Log out everywhere: every token issued to the user so far stops working."""
+        user = require_user(info)
+        revocation.revoke_user_sessions(user.pk)
+        _revoke_current_token(info)
+        return True
+
+    @strawberry.mutation
+    @django_resolver
+    def change_password(self, info: Info, old_password: str, new_password: str) -> AuthTokens:
+        user = require_user(info)
+        if not user.check_password(old_password):
+            raise Exception("Current password is incorrect.")
+        try:
+            validate_password(new_password, user)
+        except ValidationError as e:
+            raise Exception(" ".join(e.messages))
+
+        # Saving a new password revokes all existing sessions (accounts.signals);
+        # the tokens returned here are issued after that cutoff
+        user.set_password(new_password)
+        user.save(update_fields=["password"])
+        _revoke_current_token(info)
+        refresh = RefreshToken.for_user(user)
+        return AuthTokens(access=str(refresh.access_token), refresh=str(refresh))
+
     # =================================================
     # V1 Marketplace (Cars) — unchanged
     # =================================================
 
     @strawberry.mutation
+    @django_resolver
     def create_dealer_profile(self, info: Info, input: CreateDealerProfileInput) -> DealerType:
         user = require_user(info)
         if hasattr(user, "dealer_profile"):
@@ -897,6 +1391,7 @@ class Mutation:
         return profile
 
     @strawberry.mutation
+    @django_resolver
     def create_listing(self, info: Info, input: CreateListingInput) -> CarListingType:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
@@ -927,6 +1422,7 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def update_listing(self, info: Info, listing_id: strawberry.ID, input: UpdateListingInput) -> CarListingType:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
@@ -945,6 +1441,7 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def publish_listing(self, info: Info, listing_id: strawberry.ID) -> CarListingType:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
@@ -960,6 +1457,7 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def mark_sold(self, info: Info, listing_id: strawberry.ID) -> CarListingType:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
@@ -975,6 +1473,7 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def delete_listing(self, info: Info, listing_id: strawberry.ID) -> bool:
         user = require_user(info)
         dealer = get_dealer_profile_or_none(user)
@@ -985,7 +1484,9 @@ class Mutation:
         return deleted > 0
 
     @strawberry.mutation
-    def create_inquiry(self, listing_id: strawberry.ID, input: CreateInquiryInput) -> InquiryLeadType:
+    @django_resolver
+    def create_inquiry(self, info: Info, listing_id: strawberry.ID, input: CreateInquiryInput) -> InquiryLeadType:
+        rate_limit(info, "create_inquiry")
         listing = (
             CarListing.objects.select_related("dealer")
             .filter(id=listing_id, status=ListingStatus.PUBLISHED)
@@ -1006,6 +1507,7 @@ class Mutation:
         return lead
 
     @strawberry.mutation
+    @django_resolver
     def toggle_favorite(self, info: Info, listing_id: strawberry.ID) -> bool:
         user = require_user(info)
         listing = CarListing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED).first()
@@ -1021,19 +1523,21 @@ class Mutation:
         return True
 
     @strawberry.mutation
+    @django_resolver
     def increment_listing_view(self, listing_id: strawberry.ID) -> int:
-        listing = CarListing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED).first()
+        listing = CarListing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED).only("id", "views_count").first()
         if not listing:
             raise Exception("Listing not found.")
-        listing.views_count = (listing.views_count or 0) + 1
-        listing.save(update_fields=["views_count"])
-        return listing.views_count
+        # Buffered (see market.view_counts): the returned count lags by views not yet flushed
+        record_view(CarListingView, listing.id)
+        return (listing.views_count or 0) + 1
 
     # =================================================
     # V2 Marketplace (Universal) — modern
     # =================================================
 
     @strawberry.mutation
+    @django_resolver
     def create_listing_v2(self, info: Info, input: CreateListingV2Input) -> ListingType:
         dealer = require_dealer(info)
 
@@ -1041,25 +1545,28 @@ class Mutation:
         if not category:
             raise Exception("Category not found.")
 
-        listing = Listing.objects.create(
-            dealer=dealer,
-            created_by=info.context.request.user,
-            category=category,
-            title=input.title,
-            price=input.price,
-            currency=input.currency,
-            city=input.city,
-            region=input.region,
-            country=input.country,
-            description=input.description,
-        )
+        # Invalid attributes are only detected while writing them: roll back the listing too
+        with transaction.atomic():
+            listing = Listing.objects.create(
+                dealer=dealer,
+                created_by=info.context.request.user,
+                category=category,
+                title=input.title,
+                price=input.price,
+                currency=input.currency,
+                city=input.city,
+                region=input.region,
+                country=input.country,
+                description=input.description,
+            )
 
-        if input.attributes:
-            _upsert_listing_attributes(listing, input.attributes)
+            if input.attributes:
+                _upsert_listing_attributes(listing, input.attributes)
 
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def update_listing_v2(self, info: Info, listing_id: strawberry.ID, input: UpdateListingV2Input) -> ListingType:
         dealer = require_dealer(info)
 
@@ -1073,14 +1580,16 @@ class Mutation:
             if value is not None:
                 setattr(listing, field, value)
 
-        listing.save()
+        with transaction.atomic():
+            listing.save()
 
-        if input.attributes:
-            _upsert_listing_attributes(listing, input.attributes)
+            if input.attributes:
+                _upsert_listing_attributes(listing, input.attributes)
 
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def publish_listing_v2(self, info: Info, listing_id: strawberry.ID) -> ListingType:
         dealer = require_dealer(info)
 
@@ -1093,6 +1602,7 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def mark_sold_v2(self, info: Info, listing_id: strawberry.ID) -> ListingType:
         dealer = require_dealer(info)
 
@@ -1105,12 +1615,14 @@ class Mutation:
         return listing
 
     @strawberry.mutation
+    @django_resolver
     def delete_listing_v2(self, info: Info, listing_id: strawberry.ID) -> bool:
         dealer = require_dealer(info)
         deleted, _ = Listing.objects.filter(id=listing_id, dealer=dealer).delete()
         return deleted > 0
 
     @strawberry.mutation
+    @django_resolver
     def toggle_favorite_v2(self, info: Info, listing_id: strawberry.ID) -> bool:
         user = require_user(info)
 
@@ -1127,13 +1639,33 @@ class Mutation:
         return True
 
     @strawberry.mutation
-    def increment_listing_view_v2(self, listing_id: strawberry.ID) -> int:
-        listing = Listing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED).first()
+    @django_resolver
+    def increment_listing_view_v2(self, info: Info, listing_id: strawberry.ID) -> int:
+        listing = Listing.objects.filter(id=listing_id, status=ListingStatus.PUBLISHED).only("id", "views_count").first()
         if not listing:
             raise Exception("Listing not found.")
-        listing.views_count = (listing.views_count or 0) + 1
-        listing.save(update_fields=["views_count"])
-        return listing.views_count
-
-
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+        # Buffered (see market.view_counts): the returned count lags by views not yet flushed
+        record_view(ListingView, listing.id, visitor_hash(info.context.request))
+        return (listing.views_count or 0) + 1
+
+
+LIMIT_RULES = limit_rules()
+
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=[
+        # Outermost, so its timings cover everything below
+        Instrumentation,
+        # APQ first: it fills in the document the caches below parse/validate
+        PersistedQueries,
+        lambda: ParserCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        # depth / alias limits, then cost (see config.cost)
+        lambda: AddValidationRules(LIMIT_RULES),
+        lambda: ValidationCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE),
+        QueryCost,
+        StatementTimeout,
+        ReadReplicas,
+        ResponseCache,
+    ],
+)
@@ -16,6 +16,8 @@ from pathlib import Path
 import dj_database_url
 from datetime import timedelta
 
+from config.db import reset_session
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +50,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -96,7 +99,7 @@ DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
 
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        "default": dj_database_url.parse(DATABASE_URL)
     }
 else:
     DATABASES = {
@@ -110,6 +113,157 @@ else:
         }
     }
 
+# Read replicas for GraphQL queries (see config.replicas): comma-separated
+# database URLs, added as aliases replica1, replica2, ... Tests read them
+# through `default`.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f"replica{_index}"] = {**dj_database_url.parse(_url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica{_index}")
+DATABASE_ROUTERS = ["config.replicas.ReplicaRouter"]
+# After a mutation, a client's queries stay on the primary this long (replica lag)
+DB_STICKY_SECONDS = int(os.getenv("DB_STICKY_SECONDS", "5"))
+
+# Both branches: psycopg_pool connection pool per process, connections checked
+# on checkout and reset on return (config.db). DB_POOL=False (e.g. behind
+# PgBouncer in transaction mode) falls back to persistent connections.
+DB_POOL = os.getenv("DB_POOL", "True").lower() in ("1", "true", "yes", "y")
+DB_POOL_OPTIONS = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    # Seconds a request waits for a free connection before failing
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    "reset": reset_session,
+}
+
+for _database in DATABASES.values():
+    _database["CONN_HEALTH_CHECKS"] = True
+    if DB_POOL:
+        _database["CONN_MAX_AGE"] = 0  # required with pooling: closing returns the connection
+        _database.setdefault("OPTIONS", {})["pool"] = dict(DB_POOL_OPTIONS)
+    else:
+        _database["CONN_MAX_AGE"] = 600
+
+# -------------------------
+# Cache: shared Redis when REDIS_URL is set (needed for cross-worker invalidation);
+# else per-process local memory (fine for dev / single worker)
+# -------------------------
+REDIS_URL = os.getenv("REDIS_URL", "").strip()
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "kira-default",
+        }
+    }
+
+# GraphQL response cache + entity tag versions (see config.response_cache).
+# Local memory by default; point it at a shared backend when running several
+# workers so one worker's invalidation is seen by the others.
+CACHES["graphql"] = {
+    "BACKEND": os.getenv("RESPONSE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+    "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", "kira-graphql"),
+}
+RESPONSE_CACHE_ALIAS = "graphql"
+GRAPHQL_RESPONSE_CACHE_TTL = int(os.getenv("GRAPHQL_RESPONSE_CACHE_TTL", "300"))
+
+# Listing page counts (see market.counts)
+LISTING_COUNT_CAP = int(os.getenv("LISTING_COUNT_CAP", "1000"))
+LISTING_COUNT_CACHE_TTL = int(os.getenv("LISTING_COUNT_CACHE_TTL", "300"))
+
+# Buffered view counts (see market.view_counts)
+VIEW_COUNT_FLUSH_INTERVAL = int(os.getenv("VIEW_COUNT_FLUSH_INTERVAL", "60"))
+VIEW_COUNT_FLUSH_BATCH = int(os.getenv("VIEW_COUNT_FLUSH_BATCH", "5000"))
+# Longest window uniqueViews(days:) may merge
+UNIQUE_VIEWS_MAX_DAYS = int(os.getenv("UNIQUE_VIEWS_MAX_DAYS", "90"))
+
+# Per-category attribute schema used to validate listing specs (see market.attributes)
+CATEGORY_SCHEMA_CACHE_TTL = int(os.getenv("CATEGORY_SCHEMA_CACHE_TTL", "3600"))
+
+# V2 listing image renditions (see market.renditions); "avif" is opt-in (slow to encode)
+IMAGE_RENDITION_FORMATS = tuple(
+    f.strip() for f in os.getenv("IMAGE_RENDITION_FORMATS", "webp,jpeg").split(",") if f.strip()
+)
+IMAGE_RENDITION_WORKERS = int(os.getenv("IMAGE_RENDITION_WORKERS", "2"))
+# Image uploads are checked from their headers before anything is stored
+IMAGE_UPLOAD_FORMATS = ("JPEG", "MPO", "PNG", "WEBP")
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", "50000000"))
+IMAGE_UPLOAD_MIN_SIDE = int(os.getenv("IMAGE_UPLOAD_MIN_SIDE", "200"))
+
+# Explore page facets (see market.facets)
+LISTING_FACETS_CACHE_TTL = int(os.getenv("LISTING_FACETS_CACHE_TTL", "300"))
+
+# GraphQL documents (see config.persisted_queries)
+# Per-process LRU of parsed + validated query documents
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "256"))
+# APQ documents registered by clients live in the cache for this long
+GRAPHQL_PERSISTED_QUERIES_TTL = int(os.getenv("GRAPHQL_PERSISTED_QUERIES_TTL", "86400"))
+# Optional JSON manifest of operator-approved documents ({sha256: query} or Apollo manifest format)
+GRAPHQL_PERSISTED_QUERIES_MANIFEST = os.getenv("GRAPHQL_PERSISTED_QUERIES_MANIFEST", "").strip()
+# Allow-list mode: only manifest documents run; raw queries and APQ registration are refused
+GRAPHQL_PERSISTED_QUERIES_ONLY = os.getenv("GRAPHQL_PERSISTED_QUERIES_ONLY", "False").lower() in ("1", "true", "yes", "y")
+# Cache-Control max-age for anonymous persisted-query GETs (0 disables HTTP caching)
+GRAPHQL_GET_CACHE_MAX_AGE = int(os.getenv("GRAPHQL_GET_CACHE_MAX_AGE", "60"))
+
+# Query limits (see config.cost)
+GRAPHQL_MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", "5000"))
+GRAPHQL_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "10"))
+GRAPHQL_MAX_ALIASES = int(os.getenv("GRAPHQL_MAX_ALIASES", "15"))
+# Largest pagination.limit / first a list field serves (per-field overrides in config.cost)
+GRAPHQL_MAX_PAGE_SIZE = int(os.getenv("GRAPHQL_MAX_PAGE_SIZE", "100"))
+
+# SQL time budget per GraphQL operation, enforced with statement_timeout (see config.timeouts); 0 = off
+GRAPHQL_QUERY_TIMEOUT_MS = int(os.getenv("GRAPHQL_QUERY_TIMEOUT_MS", "5000"))
+GRAPHQL_MUTATION_TIMEOUT_MS = int(os.getenv("GRAPHQL_MUTATION_TIMEOUT_MS", "15000"))
+
+# Serving: async GraphQL view under ASGI (set by config.asgi), sync view under WSGI
+GRAPHQL_ASYNC = os.getenv("GRAPHQL_ASYNC", "False").lower() in ("1", "true", "yes", "y")
+# Independent queries of one resolver (page slice + count) run on extra connections (see config.parallel)
+GRAPHQL_PARALLEL_QUERIES = os.getenv("GRAPHQL_PARALLEL_QUERIES", "True").lower() in ("1", "true", "yes", "y")
+GRAPHQL_PARALLEL_WORKERS = int(os.getenv("GRAPHQL_PARALLEL_WORKERS", "8"))
+
+# Instrumentation (see config.instrumentation / config.metrics)
+# Always add extensions.tracing (otherwise only when the client sends X-GraphQL-Tracing: 1)
+GRAPHQL_TRACING = os.getenv("GRAPHQL_TRACING", "False").lower() in ("1", "true", "yes", "y")
+# Bearer token required by /metrics (empty = open; restrict at the proxy instead)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Distinct operation names tracked as metric labels; the rest are reported as "other"
+METRICS_MAX_OPERATIONS = int(os.getenv("METRICS_MAX_OPERATIONS", "200"))
+
+# Token-verified users cached per process (see config.auth)
+JWT_USER_CACHE_SIZE = int(os.getenv("JWT_USER_CACHE_SIZE", "10000"))
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL", "60"))
+
+# JWT revocation mirrored in memory per process (see accounts.revocation)
+REVOCATION_SYNC_INTERVAL = int(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))
+REVOCATION_SYNC_OVERLAP = int(os.getenv("REVOCATION_SYNC_OVERLAP", "60"))
+REVOCATION_REBUILD_INTERVAL = int(os.getenv("REVOCATION_REBUILD_INTERVAL", "3600"))
+REVOCATION_EXACT_MAX = int(os.getenv("REVOCATION_EXACT_MAX", "5000"))
+REVOCATION_BLOOM_FP_RATE = float(os.getenv("REVOCATION_BLOOM_FP_RATE", "0.001"))
+
+# Token-bucket rate limits (see config.ratelimit): action -> {key: (burst, period seconds)}
+RATE_LIMITS = {
+    "login": {"ip": (20, 60), "username": (5, 60)},
+    "register": {"ip": (5, 600)},
+    "refresh_token": {"ip": (60, 60)},
+    "create_inquiry": {"ip": (10, 600)},
+}
+RATE_LIMIT_CACHE_ALIAS = "default"
+# Threads hashing passwords for async logins; at most this many PBKDF2 runs at once
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "4"))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -126,7 +280,7 @@ SIMPLE_JWT = {
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "config.auth.CachedJWTAuthentication",
     ),
 }
 
@@ -0,0 +1,138 @@
+"""
+Per-operation SQL time budgets for /graphql/.
+
+StatementTimeout gives each operation a budget for its SQL:
+GRAPHQL_QUERY_TIMEOUT_MS for queries, GRAPHQL_MUTATION_TIMEOUT_MS for
+mutations. An execute wrapper on every connection (so config.parallel and
+django_resolver threads are covered too) sets statement_timeout to what is
+left of the budget before the operation's first statement on a connection,
+and lowers it again once less than half of that is left. Postgres then
+cancels a runaway query instead of letting it hold a pooled connection, and
+once the budget is spent no further statement starts. The cancelled field
+fails with a STATEMENT_TIMEOUT error; the operation, budget and SQL are
+logged and counted in graphql_statement_timeouts_total.
+
+statement_timeout is session state: pooled connections are reset when they
+are returned (config.db.reset_session), and a statement run outside any
+budget resets a leftover setting first.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from graphql import GraphQLError
+from psycopg import errors as pg_errors
+from psycopg.pq import TransactionStatus
+from strawberry.extensions import SchemaExtension
+
+from . import metrics
+from .db import reset_session, set_statement_timeout, statement_timeout
+from .instrumentation import operation_label
+
+logger = logging.getLogger(__name__)
+
+TIMEOUTS = metrics.counter(
+    "graphql_statement_timeouts_total", "SQL statements cancelled by a GraphQL operation budget.", ("operation", "type")
+)
+
+
+class StatementTimeoutError(GraphQLError):
+    def __init__(self, budget_ms: int):
+        super().__init__(
+            f"The request took too long and was cancelled (SQL budget {budget_ms} ms).",
+            extensions={"code": "STATEMENT_TIMEOUT", "budgetMs": budget_ms},
+        )
+
+
+class Budget:
+    def __init__(self, operation: str, kind: str, budget_ms: int):
+        self.operation = operation
+        self.kind = kind
+        self.budget_ms = budget_ms
+        self.deadline = time.monotonic() + budget_ms / 1000
+        self.sessions: set[int] = set()  # psycopg connections this operation has set a timeout on
+
+    def remaining_ms(self) -> int:
+        return int((self.deadline - time.monotonic()) * 1000)
+
+    def exceeded(self, sql: str) -> StatementTimeoutError:
+        TIMEOUTS.inc(self.operation, self.kind)
+        logger.warning(
+            "GraphQL %s %s exceeded its %d ms SQL budget: %s", self.kind, self.operation, self.budget_ms, sql[:1000]
+        )
+        return StatementTimeoutError(self.budget_ms)
+
+
+_current: ContextVar[Optional[Budget]] = ContextVar("graphql_sql_budget", default=None)
+
+
+def _timeout_wrapper(execute, sql, params, many, context):
+    raw = context["connection"].connection
+    status = raw.info.transaction_status
+    if status == TransactionStatus.INERROR:
+        # Only the rollback that follows can run here
+        return execute(sql, params, many, context)
+
+    budget = _current.get()
+    if budget is None:
+        if status == TransactionStatus.IDLE:
+            reset_session(raw)
+        return execute(sql, params, many, context)
+
+    remaining = budget.remaining_ms()
+    if remaining <= 0:
+        raise budget.exceeded(sql)
+    if id(raw) not in budget.sessions or remaining < statement_timeout(raw) / 2:
+        set_statement_timeout(raw, remaining)
+        budget.sessions.add(id(raw))
+
+    try:
+        return execute(sql, params, many, context)
+    except OperationalError as e:
+        if isinstance(e.__cause__, pg_errors.QueryCanceled):
+            raise budget.exceeded(sql) from e
+        raise
+
+
+def _install_timeout_wrapper(connection) -> None:
+    if connection.vendor == "postgresql" and _timeout_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timeout_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_timeout_wrapper(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+@contextmanager
+def sql_budget(budget_ms: int, operation: str = "anonymous", kind: str = "query"):
+    """Run the block's SQL (in this context and contexts copied from it) under a `budget_ms` budget."""
+    # Connections opened before this module was imported don't have the wrapper yet
+    for connection in connections.all(initialized_only=True):
+        _install_timeout_wrapper(connection)
+
+    token = _current.set(Budget(operation, kind, budget_ms))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class StatementTimeout(SchemaExtension):
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        kind = execution_context.operation_type.value
+        budget_ms = settings.GRAPHQL_MUTATION_TIMEOUT_MS if kind == "mutation" else settings.GRAPHQL_QUERY_TIMEOUT_MS
+        if not budget_ms:
+            yield
+            return
+
+        with sql_budget(budget_ms, operation_label(execution_context.operation_name), kind):
+            yield
@@ -3,18 +3,24 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from strawberry.django.views import GraphQLView
 from django.urls import path, include
 
 
+from .metrics import metrics_view
 from .schema import schema
+from .views import KiraAsyncGraphQLView, KiraGraphQLView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
 
     # CSRF exempt for API clients (curl/Postman/React)
-    path("graphql/", csrf_exempt(GraphQLView.as_view(schema=schema))),
+    # Async view when served over ASGI (config.asgi sets GRAPHQL_ASYNC)
+    path(
+        "graphql/",
+        csrf_exempt((KiraAsyncGraphQLView if settings.GRAPHQL_ASYNC else KiraGraphQLView).as_view(schema=schema)),
+    ),
     path("api/market/", include("market.urls")),  # ✅ add this
+    path("metrics", metrics_view),
 
 ]
 
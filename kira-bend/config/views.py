@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from strawberry.django.views import AsyncGraphQLView, GraphQLView
+
+from .persisted_queries import persisted_query_hash
+
+
+class KiraViewMixin:
+    """
+    Response post-processing shared by the sync and async views:
+      - lets HTTP caches/CDNs store anonymous persisted-query GETs
+        (GET /graphql/?extensions={"persistedQuery":...}&variables=...);
+        session-authenticated ones stay private, like config.response_cache
+      - Server-Timing header + /metrics from config.instrumentation
+    """
+
+    def _is_public_persisted_get(self, request) -> bool:
+        if request.method != "GET" or "Authorization" in request.headers:
+            return False
+        try:
+            extensions = self.parse_json(request.GET.get("extensions") or "{}")
+            return persisted_query_hash(extensions) is not None
+        except Exception:
+            return False
+
+    def _patch_cache_headers(self, request, response):
+        if self._is_public_persisted_get(request) and response.status_code == 200:
+            # No Authorization header, but the session cookie may still have signed the user in
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                patch_cache_control(response, private=True, no_store=True)
+                patch_vary_headers(response, ["Authorization", "Cookie"])
+                return response
+
+            max_age = getattr(settings, "GRAPHQL_GET_CACHE_MAX_AGE", 60)
+            if max_age and not getattr(request, "_graphql_errors", True):
+                patch_cache_control(response, public=True, max_age=max_age)
+            else:
+                patch_cache_control(response, no_store=True)
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+    def _finalize(self, request, response):
+        timing = getattr(request, "_graphql_timing", None)
+        if timing is not None:
+            response["Server-Timing"] = timing.server_timing()
+            timing.record(len(response.content) if not response.streaming else 0)
+        return self._patch_cache_headers(request, response)
+
+
+class KiraGraphQLView(KiraViewMixin, GraphQLView):
+    """Sync view (WSGI)."""
+
+    def process_result(self, request, result):
+        request._graphql_errors = bool(result.errors)
+        return super().process_result(request, result)
+
+    def dispatch(self, request, *args, **kwargs):
+        return self._finalize(request, super().dispatch(request, *args, **kwargs))
+
+
+class KiraAsyncGraphQLView(KiraViewMixin, AsyncGraphQLView):
+    """Async view (ASGI): resolvers run through django_resolver, off the event loop."""
+
+    async def process_result(self, request, result):
+        request._graphql_errors = bool(result.errors)
+        return await super().process_result(request, result)
+
+    async def dispatch(self, request, *args, **kwargs):
+        return self._finalize(request, await super().dispatch(request, *args, **kwargs))
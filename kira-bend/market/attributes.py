@@ -0,0 +1,109 @@
+"""
+Writing listing spec values (ListingAttributeValue) in bulk.
+
+A category's attribute schema (key -> id, data_type, choices) is cached, so
+upserting any number of values is one INSERT ... ON CONFLICT DO UPDATE plus
+one search-vector refresh. bulk_create skips save() and the post_save
+receivers, so the typed columns and the invalidation they would have done
+happen here, once per call instead of once per value.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import bump_listings_generation, bump_tags
+from .models import (
+    TYPED_VALUE_COLUMNS,
+    AttributeDataType,
+    CategoryAttribute,
+    Listing,
+    ListingAttributeValue,
+    coerce_attribute_value,
+)
+from .search import refresh_listing_search_vectors
+
+
+@dataclass(frozen=True)
+class AttributeSpec:
+    id: int
+    key: str
+    data_type: str
+    choices: Optional[tuple[str, ...]]
+
+
+def _schema_key(category_id: int) -> str:
+    return f"market:category_schema:{category_id}"
+
+
+def category_schema(category_id: int) -> dict[str, AttributeSpec]:
+    """Attribute key -> AttributeSpec for a category; cleared by market.signals on change."""
+    key = _schema_key(category_id)
+    schema = cache.get(key)
+    if schema is None:
+        schema = {
+            attr.key: AttributeSpec(
+                id=attr.id,
+                key=attr.key,
+                data_type=attr.data_type,
+                choices=tuple(str(c) for c in attr.choices) if attr.choices else None,
+            )
+            for attr in CategoryAttribute.objects.filter(category_id=category_id).only(
+                "id", "key", "data_type", "choices"
+            )
+        }
+        cache.set(key, schema, timeout=getattr(settings, "CATEGORY_SCHEMA_CACHE_TTL", 3600))
+    return schema
+
+
+def invalidate_category_schema(category_id: int) -> None:
+    cache.delete(_schema_key(category_id))
+
+
+def validate_attribute_value(spec: AttributeSpec, raw):
+    """Typed value for `raw`, or ValueError if it doesn't fit spec's data_type / choices."""
+    typed = coerce_attribute_value(spec.data_type, raw)
+    if spec.data_type == AttributeDataType.CHOICE and spec.choices:
+        if typed not in {coerce_attribute_value(spec.data_type, c) for c in spec.choices}:
+            raise ValueError(f"Expected one of {', '.join(spec.choices)}, got {raw!r}.")
+    return typed
+
+
+def upsert_listing_attributes(listing: Listing, values: dict) -> int:
+    """
+    Insert or update `listing`'s values for {attribute key: raw value}.
+    Unknown keys are ignored (safe default); any invalid value raises
+    ValueError naming every bad key, and nothing is written.
+    Returns the number of values written.
+    """
+    schema = category_schema(listing.category_id)
+    rows, errors = [], []
+    for key, raw in values.items():
+        spec = schema.get(key)
+        if spec is None:
+            continue
+        try:
+            validate_attribute_value(spec, raw)
+        except ValueError as exc:
+            errors.append(f"{key}: {exc}")
+            continue
+        row = ListingAttributeValue(listing=listing, attribute_id=spec.id, value=raw)
+        row.sync_typed_value(spec.data_type)
+        rows.append(row)
+
+    if errors:
+        raise ValueError(f"Invalid attributes: {'; '.join(errors)}")
+    if not rows:
+        return 0
+
+    ListingAttributeValue.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["listing", "attribute"],
+        update_fields=["value", *TYPED_VALUE_COLUMNS],
+    )
+    refresh_listing_search_vectors([listing.pk])
+    bump_listings_generation()
+    bump_tags("listings", f"listing:{listing.pk}")
+    return len(rows)
@@ -0,0 +1,86 @@
+"""
+Cache helpers for listing read paths (counts, facets, ...).
+
+Cached listing results are keyed on a generation number that is bumped by
+market.signals whenever a listing (or anything it is filtered on) changes,
+so one write invalidates every cached result at once.
+
+Finer-grained caches (the GraphQL response cache) use entity tags instead:
+each tag ("listings", "listing:42", "categories", ...) has a version that
+market.signals bumps when that entity changes, and cached entries remember
+the versions they were built from.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+GENERATION_KEY = "market:listings:generation"
+
+
+def listings_generation() -> int:
+    gen = cache.get(GENERATION_KEY)
+    if gen is None:
+        # Seed from the clock so an evicted counter never reuses an old generation
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        gen = cache.get(GENERATION_KEY, 0)
+    return gen
+
+
+def bump_listings_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def listings_cache_key(namespace: str, payload) -> str:
+    """Stable key for `payload` (any JSON-able value) within the current generation."""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    digest = hashlib.sha256(raw.encode()).hexdigest()[:32]
+    return f"market:{namespace}:{listings_generation()}:{digest}"
+
+
+# -------------------------
+# Entity tags
+# -------------------------
+
+def tag_cache():
+    """Backend holding tag versions (and the entries that depend on them)."""
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _tag_key(tag: str) -> str:
+    return f"market:tag:{tag}"
+
+
+def tag_versions(tags) -> dict[str, int]:
+    """Current version of each tag, creating missing ones."""
+    backend = tag_cache()
+    found = backend.get_many([_tag_key(t) for t in tags])
+    versions = {}
+    for tag in tags:
+        version = found.get(_tag_key(tag))
+        if version is None:
+            # Clock-seeded like the listings generation: an evicted tag never reuses a version
+            backend.add(_tag_key(tag), time.time_ns(), timeout=None)
+            version = backend.get(_tag_key(tag))
+        versions[tag] = version
+    return versions
+
+
+def tags_current(versions: dict[str, int]) -> bool:
+    """True if no tag in `versions` has been bumped since."""
+    found = tag_cache().get_many([_tag_key(t) for t in versions])
+    return all(found.get(_tag_key(t)) == v for t, v in versions.items())
+
+
+def bump_tags(*tags: str) -> None:
+    backend = tag_cache()
+    for tag in tags:
+        try:
+            backend.incr(_tag_key(tag))
+        except ValueError:
+            backend.set(_tag_key(tag), time.time_ns(), timeout=None)
@@ -0,0 +1,67 @@
+"""
+Count strategies for paginated listing queries.
+
+  exact     - COUNT(*), cached per normalized filter set (market.cache)
+  capped    - COUNT over a LIMIT cap+1 subquery; stops scanning at the cap ("1000+")
+  estimated - planner row estimate from EXPLAIN; falls back to a capped count
+              when the estimate is small enough to count cheaply
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+EXACT = "exact"
+CAPPED = "capped"
+ESTIMATED = "estimated"
+
+
+def _cap() -> int:
+    return getattr(settings, "LISTING_COUNT_CAP", 1000)
+
+
+def exact_count(qs, cache_key: str = None) -> int:
+    if cache_key:
+        total = cache.get(cache_key)
+        if total is not None:
+            return total
+
+    total = qs.count()
+    if cache_key:
+        cache.set(cache_key, total, getattr(settings, "LISTING_COUNT_CACHE_TTL", 300))
+    return total
+
+
+def capped_count(qs, cap: int = None) -> tuple[int, bool]:
+    """(count, is_exact); count == cap and is_exact False means "cap or more"."""
+    cap = cap or _cap()
+    total = qs.order_by()[: cap + 1].count()
+    if total > cap:
+        return cap, False
+    return total, True
+
+
+def estimated_count(qs) -> int:
+    """Planner's row estimate for qs (no rows are read)."""
+    qs = qs.order_by()
+    sql, params = qs.query.sql_with_params()
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        raw = cursor.fetchone()[0]
+    plan = json.loads(raw) if isinstance(raw, str) else raw
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_queryset(qs, mode: str = EXACT, cache_key: str = None) -> tuple[int, bool]:
+    """Count qs using `mode`. Returns (count, is_exact)."""
+    if mode == CAPPED:
+        return capped_count(qs)
+
+    if mode == ESTIMATED:
+        estimate = estimated_count(qs)
+        if estimate <= _cap():
+            return capped_count(qs)
+        return estimate, False
+
+    return exact_count(qs, cache_key), True
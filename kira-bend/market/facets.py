@@ -0,0 +1,160 @@
+"""
+Facet counts for the V2 explore page.
+
+Every facet is one grouped aggregate over the filtered listing set
+(category, country, region, city, choice attributes, price histogram),
+so the cost doesn't depend on how many distinct values a facet has.
+A facet whose own dimension is filtered counts over the set with that one
+filter left out, so it keeps offering the alternatives to the selected
+value; that costs one more aggregate per filtered dimension.
+Results are plain dicts so they can be cached as-is (see market.cache).
+"""
+from decimal import Decimal
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Func, IntegerField, Max, Min, Q, Value
+from django.db.models.functions import Least, Lower
+
+from .models import AttributeDataType, CategoryAttribute, ListingAttributeValue
+
+MAX_PRICE_BUCKETS = 50
+
+
+def _plain(qs):
+    return qs.order_by().select_related(None).prefetch_related(None)
+
+
+def _value_facet(qs, field: str) -> list[dict]:
+    # Case-insensitive, like the iexact filters: one bucket per value, labelled by one of its spellings
+    rows = (
+        qs.exclude(**{field: ""})
+        .values(key=Lower(field))
+        .annotate(label=Min(field), count=Count("pk"))
+        .order_by("-count", "key")
+    )
+    return [{"value": r["label"], "label": r["label"], "count": r["count"]} for r in rows]
+
+
+def _category_facet(qs) -> list[dict]:
+    rows = (
+        qs.values("category__slug", "category__name")
+        .annotate(count=Count("pk"))
+        .order_by("-count", "category__name")
+    )
+    return [{"value": r["category__slug"], "label": r["category__name"], "count": r["count"]} for r in rows]
+
+
+def _choice_value_counts(qs, *conditions):
+    return (
+        ListingAttributeValue.objects.filter(
+            *conditions,
+            listing__in=qs.values("pk"),
+            attribute__data_type=AttributeDataType.CHOICE,
+            attribute__is_filterable=True,
+            value_text__isnull=False,
+        )
+        .values("attribute_id", "value_text")
+        .annotate(count=Count("pk"))
+    )
+
+
+def _choice_attribute_facets(qs, filtered: dict) -> list[dict]:
+    """`filtered`: attribute key -> the listing queryset without that key's filter."""
+    others = [~Q(attribute__key__in=list(filtered))] if filtered else []
+    counts = list(_choice_value_counts(qs, *others))
+    for key, key_qs in filtered.items():
+        counts += _choice_value_counts(key_qs, Q(attribute__key=key))
+
+    by_attribute = {}
+    for row in counts:
+        by_attribute.setdefault(row["attribute_id"], {})[row["value_text"]] = row["count"]
+    if not by_attribute:
+        return []
+
+    facets = []
+    attrs = CategoryAttribute.objects.filter(id__in=by_attribute).order_by("sort_order", "id")
+    for attr in attrs:
+        seen = by_attribute[attr.id]
+        buckets = []
+        # Declared choices first (zero counts included, so the UI can grey them out)
+        for choice in attr.choices or []:
+            buckets.append({"value": str(choice), "label": str(choice), "count": seen.pop(str(choice).casefold(), 0)})
+        # Values stored outside the declared choices
+        for value, count in sorted(seen.items(), key=lambda kv: -kv[1]):
+            buckets.append({"value": value, "label": value, "count": count})
+        facets.append({"key": attr.key, "label": attr.label, "buckets": buckets})
+    return facets
+
+
+def _price_histogram(qs, buckets: int) -> list[dict]:
+    bounds = qs.aggregate(lo=Min("price"), hi=Max("price"))
+    lo, hi = bounds["lo"], bounds["hi"]
+    if lo is None:
+        return []
+    if lo == hi:
+        return [{"min": float(lo), "max": float(hi), "count": qs.count()}]
+
+    # width_bucket() puts price == hi in bucket n+1; fold it into the last bucket
+    bucket = Least(
+        Func(F("price"), Value(lo), Value(hi), Value(buckets), function="WIDTH_BUCKET", output_field=IntegerField()),
+        Value(buckets),
+    )
+    rows = qs.annotate(bucket=bucket).values("bucket").annotate(count=Count("pk")).order_by("bucket")
+    counts = {r["bucket"]: r["count"] for r in rows}
+
+    width = (hi - lo) / Decimal(buckets)
+    return [
+        {
+            "min": float(lo + width * (i - 1)),
+            "max": float(hi if i == buckets else lo + width * i),
+            "count": counts.get(i, 0),
+        }
+        for i in range(1, buckets + 1)
+    ]
+
+
+def listing_facets(
+    qs, price_buckets: int = 10, cache_key: str = None, excluding: dict[str, Callable] = None
+) -> dict:
+    """
+    Facet counts for a filtered Listing queryset (optionally cached under cache_key).
+
+    `excluding` maps each filtered facet dimension ("category", "country",
+    "region", "city", "price" or "attribute:<key>") to a function returning
+    the listing queryset without that filter; the facet is counted over it.
+    """
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    excluding = excluding or {}
+    qs = _plain(qs)
+
+    def facet_qs(dimension: str):
+        build = excluding.get(dimension)
+        return _plain(build()) if build else qs
+
+    price_buckets = max(1, min(price_buckets, MAX_PRICE_BUCKETS))
+    filtered_attributes = {
+        dimension.removeprefix("attribute:"): facet_qs(dimension)
+        for dimension in excluding
+        if dimension.startswith("attribute:")
+    }
+
+    categories = _category_facet(facet_qs("category"))
+    facets = {
+        "total_count": qs.count() if "category" in excluding else sum(c["count"] for c in categories),
+        "categories": categories,
+        "countries": _value_facet(facet_qs("country"), "country"),
+        "regions": _value_facet(facet_qs("region"), "region"),
+        "cities": _value_facet(facet_qs("city"), "city"),
+        "attributes": _choice_attribute_facets(qs, filtered_attributes),
+        "price_histogram": _price_histogram(facet_qs("price"), price_buckets),
+    }
+
+    if cache_key:
+        cache.set(cache_key, facets, getattr(settings, "LISTING_FACETS_CACHE_TTL", 300))
+    return facets
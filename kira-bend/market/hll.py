@@ -0,0 +1,87 @@
+"""
+HyperLogLog distinct-count sketch, serialized compactly for a bytea column.
+
+PRECISION = 11 gives 2048 registers (~2.3% standard error). Sketches with
+few visitors are stored sparse (3 bytes per touched register) and switch to
+the dense form (one byte per register) once that is smaller, so a quiet
+listing-day costs a few bytes. Sketches of the same precision merge by
+taking the register-wise max, which is how daily sketches roll up into
+weekly / monthly uniques.
+"""
+import hashlib
+import math
+import struct
+
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+
+_DENSE = 1
+_SPARSE = 2
+_SPARSE_ENTRY = struct.Struct(">HB")
+
+
+def hash64(value: str) -> int:
+    """Stable signed 64-bit hash (fits a Postgres bigint)."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    __slots__ = ("registers",)
+
+    def __init__(self, registers: dict[int, int] = None):
+        # Sparse in memory too: index -> rank, untouched registers are 0
+        self.registers = registers or {}
+
+    def add(self, hashed: int) -> None:
+        hashed &= (1 << 64) - 1
+        index = hashed >> (64 - PRECISION)
+        rest = hashed & ((1 << (64 - PRECISION)) - 1)
+        rank = (64 - PRECISION) - rest.bit_length() + 1
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        for index, rank in other.registers.items():
+            if rank > self.registers.get(index, 0):
+                self.registers[index] = rank
+        return self
+
+    def estimate(self) -> int:
+        m = REGISTERS
+        zeros = m - len(self.registers)
+        raw = _alpha(m) * m * m / (zeros + sum(2.0 ** -r for r in self.registers.values()))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        if len(self.registers) * _SPARSE_ENTRY.size < REGISTERS:
+            return bytes([_SPARSE]) + b"".join(
+                _SPARSE_ENTRY.pack(index, rank) for index, rank in sorted(self.registers.items())
+            )
+        dense = bytearray(REGISTERS)
+        for index, rank in self.registers.items():
+            dense[index] = rank
+        return bytes([_DENSE]) + bytes(dense)
+
+    @classmethod
+    def from_bytes(cls, data) -> "HyperLogLog":
+        data = bytes(data or b"")
+        if not data:
+            return cls()
+        if data[0] == _SPARSE:
+            return cls({index: rank for index, rank in _SPARSE_ENTRY.iter_unpack(data[1:])})
+        if data[0] == _DENSE and len(data) == REGISTERS + 1:
+            return cls({index: rank for index, rank in enumerate(data[1:]) if rank})
+        raise ValueError("Not a HyperLogLog sketch of this precision.")
@@ -1,16 +1,162 @@
-from django.core.management.base import BaseCommand
-from market.models import CarImage
-from market.signals import generate_thumbnail
+"""
+Generate missing image derivatives in bulk:
+  - CarImage (V1): the 700px JPEG thumbnail
+  - ListingImage (V2): the responsive renditions (see market.renditions)
+
+Decoding and encoding fan out to a process pool; results are written back
+once per batch (files, then one bulk_update / bulk_create), and the last
+processed id is checkpointed after every batch so an interrupted run
+resumes where it stopped.
+
+    python manage.py backfill_thumbnails --workers 8 --batch-size 200
+    python manage.py backfill_thumbnails --model listing --since-id 120000
+"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+
+from market.models import CarImage, ListingImage, ListingImageRendition
+from market.renditions import render_renditions, render_thumbnail, rendition_formats, save_renditions, thumbnail_name
+
+MODELS = {"car": CarImage, "listing": ListingImage}
+
+
+# Worker-process side: storage in, bytes out (no database access)
+
+def _render_car_thumbnail(name: str) -> bytes:
+    with CarImage._meta.get_field("image").storage.open(name, "rb") as source:
+        return render_thumbnail(source)
+
+
+def _render_listing_renditions(name: str, formats: list[str]):
+    with ListingImage._meta.get_field("image").storage.open(name, "rb") as source:
+        return render_renditions(source, formats)
+
+
+def _format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
 
 class Command(BaseCommand):
-    help = "Generate missing thumbnails for CarImage rows."
-
-    def handle(self, *args, **options):
-        qs = CarImage.objects.filter(thumbnail__isnull=True).exclude(image="")
-        count = 0
-        for img in qs.iterator():
-            generate_thumbnail(CarImage, img, created=False)
-            img.refresh_from_db()
-            if img.thumbnail:
-                count += 1
-        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails: {count}"))
+    help = "Generate missing CarImage thumbnails and ListingImage renditions in parallel (resumable)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=sorted(MODELS), action="append", help="Only these models (repeatable).")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes.")
+        parser.add_argument("--batch-size", type=int, default=200, help="Images per write-back / checkpoint.")
+        parser.add_argument("--since-id", type=int, default=None, help="Start after this id (overrides the checkpoint).")
+        parser.add_argument(
+            "--checkpoint",
+            default=str(Path(settings.BASE_DIR) / ".backfill_thumbnails.json"),
+            help="File holding the last processed id per model.",
+        )
+        parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the beginning.")
+        parser.add_argument("--force", action="store_true", help="Regenerate even where derivatives exist.")
+
+    def handle(self, *args, **opts):
+        if opts["workers"] < 1 or opts["batch_size"] < 1:
+            raise CommandError("--workers and --batch-size must be at least 1.")
+
+        self.checkpoint_path = Path(opts["checkpoint"])
+        self.checkpoint = {} if opts["reset"] else self._load_checkpoint()
+        self.formats = rendition_formats()
+
+        # Workers are forked from this process: they inherit settings and storage,
+        # but must not share its database sockets (they never query anyway)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=opts["workers"], mp_context=multiprocessing.get_context("fork")) as pool:
+            for kind in opts["model"] or sorted(MODELS):
+                since_id = opts["since_id"] if opts["since_id"] is not None else self.checkpoint.get(kind, 0)
+                self._backfill(pool, kind, since_id, opts["batch_size"], opts["force"])
+
+    def _pending(self, kind: str, force: bool):
+        if kind == "car":
+            qs = CarImage.objects.exclude(image="")
+            if not force:
+                qs = qs.filter(Q(thumbnail__isnull=True) | Q(thumbnail=""))
+            return qs.only("id", "image", "thumbnail")
+
+        qs = ListingImage.objects.exclude(image="")
+        if not force:
+            current = ListingImageRendition.objects.filter(image=OuterRef("pk"), source=OuterRef("image"))
+            qs = qs.filter(~Exists(current))
+        return qs.only("id", "listing_id", "image", "thumbnail")
+
+    def _submit(self, pool, kind: str, image):
+        if kind == "car":
+            return pool.submit(_render_car_thumbnail, image.image.name)
+        return pool.submit(_render_listing_renditions, image.image.name, self.formats)
+
+    def _backfill(self, pool, kind: str, since_id: int, batch_size: int, force: bool) -> None:
+        qs = self._pending(kind, force)
+        total = qs.filter(id__gt=since_id).count()
+        self.stdout.write(f"{kind}: {total} images after id {since_id}")
+        if not total:
+            return
+
+        started = time.monotonic()
+        self.done = self.failed = 0
+        last_id = since_id
+        in_flight = None
+        while True:
+            batch = list(qs.filter(id__gt=last_id).order_by("id")[:batch_size])
+            # Queue the next batch before writing back the previous one, so workers never idle on the database
+            submitted = [(image, self._submit(pool, kind, image)) for image in batch]
+            if in_flight:
+                self._write_back(kind, in_flight)
+                self._progress(kind, total, started)
+            if not batch:
+                break
+            in_flight = submitted
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"{kind}: generated {self.done}, failed {self.failed}"))
+
+    def _write_back(self, kind: str, submitted) -> None:
+        results = []
+        for image, future in submitted:
+            try:
+                results.append((image, future.result()))
+            except Exception as exc:
+                self.failed += 1
+                self.stderr.write(f"{kind} image {image.id}: {exc}")
+
+        if kind == "car":
+            for image, content in results:
+                image.thumbnail.save(thumbnail_name(image.image.name), ContentFile(content), save=False)
+            CarImage.objects.bulk_update([image for image, _ in results], ["thumbnail"])
+        else:
+            save_renditions(results)
+
+        self.done += len(results)
+        self._save_checkpoint(kind, submitted[-1][0].id)
+
+    def _progress(self, kind: str, total: int, started: float) -> None:
+        processed = self.done + self.failed
+        rate = processed / max(time.monotonic() - started, 1e-6)
+        eta = _format_eta((total - processed) / rate) if rate else "?"
+        self.stdout.write(f"{kind}: {processed}/{total} ({rate:.1f} img/s, ETA {eta})")
+
+    def _load_checkpoint(self) -> dict:
+        try:
+            return json.loads(self.checkpoint_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_checkpoint(self, kind: str, last_id: int) -> None:
+        self.checkpoint[kind] = last_id
+        # Write-then-rename: a crash mid-write never leaves a truncated checkpoint
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.checkpoint))
+        os.replace(tmp, self.checkpoint_path)
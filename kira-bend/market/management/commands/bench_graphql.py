@@ -0,0 +1,115 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+LISTING_CARD = "id title slug price currency city region country isFeatured createdAt isFavorited images { thumbnailUrl isCover } category { name slug }"
+
+QUERIES = {
+    "listings_page_v2": (
+        "query Bench($offset: Int!, $limit: Int!) {"
+        "  listingsPageV2(pagination: {offset: $offset, limit: $limit}) {"
+        "    totalCount pageInfo { hasNext hasPrev countIsExact }"
+        f"    results {{ {LISTING_CARD} }}"
+        "  }"
+        "}"
+    ),
+    "listings_v2": (
+        "query Bench($offset: Int!, $limit: Int!) {"
+        f"  listingsV2(pagination: {{offset: $offset, limit: $limit}}) {{ {LISTING_CARD} }}"
+        "}"
+    ),
+    "listings_page": (
+        "query Bench($offset: Int!, $limit: Int!) {"
+        "  listingsPage(pagination: {offset: $offset, limit: $limit}) {"
+        "    totalCount results { id title slug price currency make model year images { thumbnailUrl } }"
+        "  }"
+        "}"
+    ),
+}
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class Command(BaseCommand):
+    help = (
+        "HTTP load test for the listings GraphQL queries. Run it against the same app served "
+        "over WSGI and ASGI to compare throughput, e.g.\n"
+        "  gunicorn config.wsgi -w 4 -b :8000\n"
+        "  uvicorn config.asgi:application --workers 4 --port 8001\n"
+        "  manage.py bench_graphql --url http://127.0.0.1:8000/graphql/ --url http://127.0.0.1:8001/graphql/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", action="append", dest="urls", help="GraphQL endpoint (repeat to compare servers)."
+        )
+        parser.add_argument("--query", choices=sorted(QUERIES), default="listings_page_v2")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once.")
+        parser.add_argument("--limit", type=int, default=24, help="Page size.")
+        parser.add_argument("--pages", type=int, default=10, help="Cycle offsets over this many pages.")
+        parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each run.")
+        parser.add_argument(
+            "--token",
+            help="Bearer token to send. Authenticated requests bypass the anonymous response cache.",
+        )
+
+    def _post(self, url: str, body: bytes, headers: dict) -> tuple[float, bool]:
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                payload = json.loads(response.read())
+            ok = not payload.get("errors")
+        except (urllib.error.URLError, ValueError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def _run(self, url: str, opts) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if opts["token"]:
+            headers["Authorization"] = f"Bearer {opts['token']}"
+
+        def body(i: int) -> bytes:
+            variables = {"offset": (i % opts["pages"]) * opts["limit"], "limit": opts["limit"]}
+            return json.dumps({"query": QUERIES[opts["query"]], "variables": variables}).encode()
+
+        with ThreadPoolExecutor(max_workers=opts["concurrency"]) as pool:
+            list(pool.map(lambda i: self._post(url, body(i), headers), range(opts["warmup"])))
+
+            started = time.perf_counter()
+            results = list(pool.map(lambda i: self._post(url, body(i), headers), range(opts["requests"])))
+            elapsed = time.perf_counter() - started
+
+        latencies = [latency * 1000 for latency, ok in results if ok]
+        if not latencies:
+            raise CommandError(f"Every request to {url} failed.")
+        return {
+            "url": url,
+            "rps": len(results) / elapsed,
+            "errors": sum(1 for _, ok in results if not ok),
+            "p50": statistics.median(latencies),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+        }
+
+    def handle(self, *args, **opts):
+        urls = opts["urls"] or ["http://127.0.0.1:8000/graphql/"]
+        self.stdout.write(
+            f"{opts['query']}: {opts['requests']} requests, concurrency {opts['concurrency']}, limit {opts['limit']}"
+        )
+
+        for url in urls:
+            r = self._run(url, opts)
+            self.stdout.write(
+                f"{r['url']}: {r['rps']:.1f} req/s  p50={r['p50']:.1f}ms p95={r['p95']:.1f}ms "
+                f"p99={r['p99']:.1f}ms errors={r['errors']}"
+            )
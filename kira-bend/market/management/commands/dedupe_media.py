@@ -0,0 +1,161 @@
+"""
+Move existing listing media into content-addressed storage (see market.media).
+
+Every file referenced from an image column (media.REFERENCES) under
+listings/ (V1) and listings/v2/ (V2) is hashed. The first file with a given
+SHA-256 is hard-linked (or copied) to cas/...; every row pointing at any
+copy is repointed with one UPDATE per column per batch, blob reference
+counts are recounted, and the old copies are deleted once the batch has
+committed. Safe to re-run: names already under cas/ are skipped, and an
+interrupted batch leaves the old names in place.
+
+    python manage.py dedupe_media --dry-run
+    python manage.py dedupe_media --batch-size 1000
+"""
+import os
+import shutil
+from collections import Counter, defaultdict
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from market.media import REFERENCES, content_hash, content_name, extension
+from market.models import ListingImageRendition, MediaBlob
+
+# Columns that store a file name without holding a reference to it
+NAME_COLUMNS = REFERENCES + ((ListingImageRendition, "source"),)
+
+
+def _update_from_values(model, field: str, key: str, pairs: dict) -> None:
+    """UPDATE model SET field = v.value FROM (VALUES (key, value), ...) WHERE key column = v.key."""
+    if not pairs:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    target = quote(model._meta.get_field(field).column)
+    match = quote(model._meta.get_field(key).column)
+    values = ", ".join(["(%s, %s)"] * len(pairs))
+    params = [value for pair in pairs.items() for value in pair]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} AS t SET {target} = v.value FROM (VALUES {values}) AS v(key, value) "
+            f"WHERE t.{match} = v.key",
+            params,
+        )
+
+
+def _link(source: str, target: str) -> None:
+    """Make `target` hold the bytes of `source` without copying them where the filesystem allows."""
+    try:
+        source_path, target_path = default_storage.path(source), default_storage.path(target)
+    except NotImplementedError:
+        # Remote storage: no links, copy through the storage API
+        with default_storage.open(source, "rb") as f:
+            default_storage.save(target, f)
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(source_path, target_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+class Command(BaseCommand):
+    help = "Deduplicate files under listings/ and listings/v2/ into content-addressed storage (cas/)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deduplicated.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Files per transaction.")
+
+    def handle(self, *args, **opts):
+        names = set()
+        for model, field in REFERENCES:
+            names.update(
+                model.objects.filter(**{f"{field}__startswith": "listings/"})
+                .values_list(field, flat=True)
+                .distinct()
+            )
+        names = sorted(names)
+        self.stdout.write(f"{len(names)} referenced files under listings/")
+
+        self.missing = self.moved = self.freed = 0
+        self.seen = defaultdict(list)  # sha256 -> names, for --dry-run
+        batch_size = max(1, opts["batch_size"])
+        for start in range(0, len(names), batch_size):
+            batch = names[start: start + batch_size]
+            if opts["dry_run"]:
+                self._hash(batch)
+            else:
+                self._dedupe(batch)
+            self.stdout.write(f"{min(start + batch_size, len(names))}/{len(names)}")
+
+        if opts["dry_run"]:
+            duplicates = {sha: group for sha, group in self.seen.items() if len(group) > 1}
+            wasted = sum(size * (len(group) - 1) for (sha, size), group in duplicates.items())
+            self.stdout.write(self.style.WARNING(
+                f"DRY RUN: {len(duplicates)} contents stored more than once, "
+                f"{wasted / 1024 / 1024:.1f} MB reclaimable, {self.missing} files missing."
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {self.moved} files into cas/, freed {self.freed / 1024 / 1024:.1f} MB, "
+            f"{self.missing} referenced files missing."
+        ))
+
+    def _hash(self, batch) -> dict[str, tuple[str, int]]:
+        hashes = {}
+        for name in batch:
+            if not default_storage.exists(name):
+                self.missing += 1
+                self.stderr.write(f"missing: {name}")
+                continue
+            with default_storage.open(name, "rb") as f:
+                hashes[name] = (content_hash(f), f.size)
+            self.seen[hashes[name]].append(name)
+        return hashes
+
+    def _dedupe(self, batch) -> None:
+        hashes = self._hash(batch)
+        if not hashes:
+            return
+
+        shas = {sha for sha, _ in hashes.values()}
+        blobs = dict(MediaBlob.objects.filter(sha256__in=shas).values_list("sha256", "name"))
+        new = {}
+        for name, (sha, size) in hashes.items():
+            if sha in blobs or sha in new:
+                continue
+            target = content_name(sha, extension(name))
+            _link(name, target)
+            new[sha] = MediaBlob(sha256=sha, name=target, size=size)
+        MediaBlob.objects.bulk_create(new.values(), ignore_conflicts=True)
+        blobs.update(MediaBlob.objects.filter(sha256__in=new).values_list("sha256", "name"))
+
+        renames = {name: blobs[sha] for name, (sha, _) in hashes.items()}
+        with transaction.atomic():
+            for model, field in NAME_COLUMNS:
+                _update_from_values(model, field, field, renames)
+            self._recount(set(renames.values()))
+
+        for name in renames:
+            default_storage.delete(name)
+        self.moved += len(renames)
+        self.freed += sum(size for _, size in hashes.values()) - sum(blob.size for blob in new.values())
+
+    def _recount(self, blob_names: set[str]) -> None:
+        counts = Counter({name: 0 for name in blob_names})
+        for model, field in REFERENCES:
+            rows = (
+                model.objects.filter(**{f"{field}__in": blob_names})
+                .values(field)
+                .annotate(n=Count("pk"))
+                .values_list(field, "n")
+            )
+            for name, n in rows:
+                counts[name] += n
+        _update_from_values(MediaBlob, "ref_count", "name", dict(counts))
@@ -0,0 +1,106 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from market.models import TYPED_VALUE_FIELDS, AttributeDataType, CategoryAttribute, ListingAttributeValue
+
+
+def _plan_nodes(node, depth=0):
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child, depth + 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Query-plan regression check for listingsPageV2 attribute filters: "
+        "EXPLAINs the V2 listing queryset with 0..N attribute filters and shows how the plan grows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", default="cars", help="Category slug to sample filterable attributes from.")
+        parser.add_argument("--max-filters", type=int, default=4, help="Largest number of attribute filters to explain.")
+        parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE (runs the queries).")
+        parser.add_argument("--verbose-plan", action="store_true", help="Print the full plan tree for each step.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if the page query uses DISTINCT or joins attribute values instead of EXISTS semi-joins.",
+        )
+
+    def handle(self, *args, **opts):
+        # Resolvers live in the GraphQL layer; import lazily so the command loads without it.
+        from config.schema import AttributeFilterKVInput, AttributeFilterOp, ListingsV2FilterInput, _public_listings_v2_qs
+
+        attrs = list(
+            CategoryAttribute.objects.filter(category__slug=opts["category"], is_filterable=True)
+            .order_by("sort_order", "id")
+        )
+        if not attrs:
+            raise CommandError(f"No filterable attributes for category '{opts['category']}'.")
+
+        # One sample filter per attribute, using a value that actually exists
+        sample_filters = []
+        for attr in attrs:
+            column = TYPED_VALUE_FIELDS[attr.data_type]
+            sample = (
+                ListingAttributeValue.objects.filter(attribute=attr)
+                .exclude(**{f"{column}__isnull": True})
+                .values_list("value", flat=True)
+                .first()
+            )
+            if sample is None:
+                continue
+            numeric = attr.data_type in (AttributeDataType.INT, AttributeDataType.FLOAT)
+            sample_filters.append(
+                AttributeFilterKVInput(
+                    key=attr.key,
+                    value=str(sample),
+                    op=AttributeFilterOp.GTE if numeric else AttributeFilterOp.EQ,
+                )
+            )
+            if len(sample_filters) >= opts["max_filters"]:
+                break
+
+        failures = []
+        explain = "EXPLAIN (ANALYZE, FORMAT JSON)" if opts["analyze"] else "EXPLAIN (FORMAT JSON)"
+
+        for n in range(len(sample_filters) + 1):
+            filters = ListingsV2FilterInput(category_slug=opts["category"], attributes=sample_filters[:n] or None)
+            qs = _public_listings_v2_qs(filters)
+
+            sql, params = qs.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"{explain} {sql}", params)
+                raw = cursor.fetchone()[0]
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+            nodes = list(_plan_nodes(plan))
+            node_types = [node["Node Type"] for _, node in nodes]
+            line = (
+                f"filters={n}: cost={plan['Total Cost']:.1f} rows={plan['Plan Rows']} "
+                f"nodes={len(nodes)} joins={sum(1 for t in node_types if 'Join' in t or t == 'Nested Loop')}"
+            )
+            if opts["analyze"]:
+                line += f" time={plan.get('Actual Total Time', 0):.2f}ms"
+            self.stdout.write(line)
+
+            if opts["verbose_plan"]:
+                for depth, node in nodes:
+                    rel = f" on {node['Relation Name']}" if "Relation Name" in node else ""
+                    join = f" ({node['Join Type']})" if "Join Type" in node else ""
+                    self.stdout.write(f"    {'  ' * depth}{node['Node Type']}{join}{rel}")
+
+            if opts["check"]:
+                if qs.query.distinct:
+                    failures.append(f"filters={n}: queryset uses DISTINCT")
+                if sql.count("EXISTS") != n:
+                    failures.append(f"filters={n}: expected {n} EXISTS subqueries, found {sql.count('EXISTS')}")
+                if "Unique" in node_types[:2]:
+                    failures.append(f"filters={n}: plan de-duplicates the result set")
+
+        if failures:
+            raise CommandError("Plan regression:\n  " + "\n  ".join(failures))
+        if opts["check"]:
+            self.stdout.write(self.style.SUCCESS("Attribute filters compile to EXISTS semi-joins without DISTINCT."))
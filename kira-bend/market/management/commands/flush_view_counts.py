@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from market.view_counts import flush_views
+
+
+class Command(BaseCommand):
+    help = "Fold buffered listing views (ListingView / CarListingView) into views_count now."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Views moved per transaction.")
+
+    def handle(self, *args, **opts):
+        flushed = flush_views(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} buffered views."))
@@ -7,6 +7,7 @@ from market.models import (
     CategoryAttribute, ListingAttributeValue,
     CarListing, CarImage, Favorite,
 )
+from market.media import retain
 
 # ---- helpers ----
 
@@ -195,6 +196,8 @@ class Command(BaseCommand):
                     is_cover=im.is_cover,
                     sort_order=im.sort_order,
                 )
+                # Same files as the V1 image: one more reference each (see market.media)
+                retain([im.image.name, im.thumbnail.name])
                 created_images += 1
 
         # Favorites migration
@@ -0,0 +1,151 @@
+"""
+Content-addressed media storage.
+
+store() saves uploads at cas/<aa>/<bb>/<sha256><ext> in the default storage.
+Identical bytes are therefore stored once, whether that is the same photo on
+several listings or V1 images copied into V2. Each MediaBlob counts the image
+columns (REFERENCES) that point at it. store() and retain() add references,
+release() drops them, and a blob's file is deleted once its count reaches
+zero. Files without a blob (stored before this, or through the admin) are
+released by checking REFERENCES directly. `manage.py dedupe_media` moves
+existing files into cas/.
+"""
+import hashlib
+import os
+from collections import Counter, defaultdict
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import CarImage, ListingImage, ListingImageRendition, MediaBlob
+
+CAS_PREFIX = "cas/"
+
+# (model, field) pairs holding storage names; MediaBlob.ref_count counts rows across all of them
+REFERENCES = (
+    (CarImage, "image"),
+    (CarImage, "thumbnail"),
+    (ListingImage, "image"),
+    (ListingImage, "thumbnail"),
+    (ListingImageRendition, "file"),
+)
+
+_EXTENSIONS = {"JPEG": ".jpg", "MPO": ".jpg", "PNG": ".png", "WEBP": ".webp", "AVIF": ".avif"}
+
+
+def content_hash(file) -> str:
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_name(sha256: str, ext: str) -> str:
+    return f"{CAS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def extension(name: str, image_format: str = None) -> str:
+    if image_format in _EXTENSIONS:
+        return _EXTENSIONS[image_format]
+    ext = os.path.splitext(name or "")[1].lower()
+    return ".jpg" if ext == ".jpeg" else ext
+
+
+def store_many(files) -> list[str]:
+    """
+    Save each (file, image_format) content-addressed and take one reference per
+    file; returns their storage names. Bytes that are already stored are not
+    written again. A fixed number of queries however many files are passed.
+    """
+    if not files:
+        return []
+    hashes = [content_hash(file) for file, _ in files]
+    first = {}  # sha256 -> (file, image_format) that provides its bytes
+    for entry, sha256 in zip(files, hashes):
+        first.setdefault(sha256, entry)
+    counts = Counter(hashes)
+
+    table = MediaBlob._meta.db_table
+    values = ", ".join(["(%s, %s, %s, %s, now())"] * len(first))
+    params = []
+    for sha256, (file, image_format) in first.items():
+        params += [sha256, content_name(sha256, extension(file.name, image_format)), file.size, counts[sha256]]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Looking a blob up and referencing it is one statement, so _collect() can't delete
+        # it in between: it either waits for this commit (and then sees the reference) or
+        # deleted the row already, in which case this inserts it again (xmax = 0)
+        cursor.execute(
+            f"INSERT INTO {table} AS b (sha256, name, size, ref_count, created_at) VALUES {values} "
+            f"ON CONFLICT (sha256) DO UPDATE SET ref_count = b.ref_count + EXCLUDED.ref_count "
+            f"RETURNING sha256, name, xmax = 0",
+            params,
+        )
+        blobs = {}
+        for sha256, name, inserted in cursor.fetchall():
+            blobs[sha256] = name
+            # New (or collected) blob: write its bytes before the row becomes visible
+            if inserted and not default_storage.exists(name):
+                default_storage.save(name, first[sha256][0])
+
+    return [blobs[sha256] for sha256 in hashes]
+
+
+def store(file, image_format: str = None) -> str:
+    return store_many([(file, image_format)])[0]
+
+
+def _by_count(names) -> dict[int, list[str]]:
+    groups = defaultdict(list)
+    for name, count in Counter(n for n in names if n).items():
+        groups[count].append(name)
+    return groups
+
+
+def retain(names) -> None:
+    """Add a reference per occurrence of each name (no-op for files without a blob)."""
+    for count, group in _by_count(names).items():
+        MediaBlob.objects.filter(name__in=group).update(ref_count=F("ref_count") + count)
+
+
+def referenced(names) -> set[str]:
+    """Names still stored in any REFERENCES column."""
+    found = set()
+    for model, field in REFERENCES:
+        found.update(model.objects.filter(**{f"{field}__in": names}).values_list(field, flat=True))
+    return found
+
+
+def release(names) -> None:
+    """
+    Drop a reference per occurrence of each name. Once the transaction
+    commits, files nobody references any more are deleted.
+    """
+    names = [n for n in names if n]
+    if not names:
+        return
+    for count, group in _by_count(names).items():
+        MediaBlob.objects.filter(name__in=group).update(ref_count=Greatest(F("ref_count") - count, 0))
+    transaction.on_commit(lambda: _collect(set(names)))
+
+
+def _collect(names: set[str]) -> None:
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # A blob that just gained a reference is not deleted. The deleted rows stay
+            # locked until their files are gone too, so a store_many() of the same bytes
+            # waits for this commit and then writes the file again
+            cursor.execute(
+                f"DELETE FROM {MediaBlob._meta.db_table} WHERE name = ANY(%s) AND ref_count = 0 RETURNING name",
+                [list(names)],
+            )
+            unreferenced_blobs = {row[0] for row in cursor.fetchall()}
+        for name in unreferenced_blobs:
+            default_storage.delete(name)
+
+    blobs = set(MediaBlob.objects.filter(name__in=names).values_list("name", flat=True))
+    plain = names - unreferenced_blobs - blobs
+    for name in plain - referenced(plain):
+        default_storage.delete(name)
@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-17 03:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Frozen copy of market.search's vector expressions (as of this migration):
+# A = title, B = specs, C = location, D = description, "simple" config.
+LISTING_VECTOR_SQL = """
+UPDATE {listing} AS l SET search_vector =
+    setweight(to_tsvector('simple', COALESCE(l.title, '')), 'A')
+    || setweight(to_tsvector('simple', COALESCE((
+        SELECT STRING_AGG(v.value::text, ' ')
+        FROM {value} AS v JOIN {attribute} AS a ON a.id = v.attribute_id
+        WHERE v.listing_id = l.id AND a.data_type <> 'bool'
+    ), '')), 'B')
+    || setweight(to_tsvector('simple',
+        COALESCE(l.city, '') || ' ' || COALESCE(l.region, '') || ' ' || COALESCE(l.country, '')), 'C')
+    || setweight(to_tsvector('simple', COALESCE(l.description, '')), 'D')
+"""
+
+CAR_LISTING_VECTOR_SQL = """
+UPDATE {car_listing} AS l SET search_vector =
+    setweight(to_tsvector('simple', COALESCE(l.title, '')), 'A')
+    || setweight(to_tsvector('simple',
+        COALESCE(l.make, '') || ' ' || COALESCE(l.model, '') || ' ' || COALESCE(l.trim, '')), 'B')
+    || setweight(to_tsvector('simple', COALESCE(l.description, '')), 'D')
+"""
+
+
+def backfill_search_vectors(apps, schema_editor):
+    def table(name):
+        return schema_editor.quote_name(apps.get_model("market", name)._meta.db_table)
+
+    schema_editor.execute(
+        LISTING_VECTOR_SQL.format(
+            listing=table("Listing"), value=table("ListingAttributeValue"), attribute=table("CategoryAttribute")
+        )
+    )
+    schema_editor.execute(CAR_LISTING_VECTOR_SQL.format(car_listing=table("CarListing")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0003_category_categoryattribute_listing_favoritev2_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carlisting',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='carlisting_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='listing_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
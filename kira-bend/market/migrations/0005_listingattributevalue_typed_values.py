@@ -0,0 +1,120 @@
+# Generated by Django 6.0 on 2026-10-17 03:26
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# Frozen copy of market.models' typed-value rules (as of this migration)
+TYPED_VALUE_FIELDS = {
+    "int": "value_int",
+    "float": "value_float",
+    "text": "value_text",
+    "bool": "value_bool",
+    "choice": "value_text",
+}
+TYPED_VALUE_COLUMNS = ("value_int", "value_float", "value_text", "value_bool")
+TYPED_TEXT_MAX_LENGTH = 255
+TRUE_STRINGS = {"1", "true", "yes", "y", "on"}
+FALSE_STRINGS = {"0", "false", "no", "n", "off"}
+
+
+def coerce_attribute_value(data_type, raw):
+    if raw is None:
+        raise ValueError("Missing value.")
+
+    if data_type in ("int", "float"):
+        if isinstance(raw, bool):
+            raise ValueError("Expected a number.")
+        text = str(raw).strip().replace(",", "").replace("_", "")
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"Expected a number, got {raw!r}.")
+        if not number.is_finite():
+            raise ValueError(f"Expected a number, got {raw!r}.")
+        if data_type == "float":
+            return float(number)
+        if number != number.to_integral_value():
+            raise ValueError(f"Expected a whole number, got {raw!r}.")
+        return int(number)
+
+    if data_type == "bool":
+        if isinstance(raw, bool):
+            return raw
+        text = str(raw).strip().lower()
+        if text in TRUE_STRINGS:
+            return True
+        if text in FALSE_STRINGS:
+            return False
+        raise ValueError(f"Expected true/false, got {raw!r}.")
+
+    text = str(raw).strip()
+    if not text:
+        raise ValueError("Empty value.")
+    return text.casefold()[:TYPED_TEXT_MAX_LENGTH]
+
+
+def backfill_typed_values(apps, schema_editor):
+    ListingAttributeValue = apps.get_model("market", "ListingAttributeValue")
+
+    batch = []
+    for row in ListingAttributeValue.objects.select_related("attribute").iterator(chunk_size=2000):
+        data_type = row.attribute.data_type
+        try:
+            typed = coerce_attribute_value(data_type, row.value)
+        except ValueError:
+            continue
+        setattr(row, TYPED_VALUE_FIELDS[data_type], typed)
+        batch.append(row)
+        if len(batch) >= 2000:
+            ListingAttributeValue.objects.bulk_update(batch, TYPED_VALUE_COLUMNS)
+            batch = []
+    if batch:
+        ListingAttributeValue.objects.bulk_update(batch, TYPED_VALUE_COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0004_listing_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingattributevalue',
+            name='value_bool',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingattributevalue',
+            name='value_float',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingattributevalue',
+            name='value_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingattributevalue',
+            name='value_text',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='listingattributevalue',
+            index=models.Index(fields=['attribute', 'value_int'], name='attrvalue_attr_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingattributevalue',
+            index=models.Index(fields=['attribute', 'value_float'], name='attrvalue_attr_float_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingattributevalue',
+            index=models.Index(fields=['attribute', 'value_text'], name='attrvalue_attr_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listingattributevalue',
+            index=models.Index(fields=['attribute', 'value_bool'], name='attrvalue_attr_bool_idx'),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+    ]
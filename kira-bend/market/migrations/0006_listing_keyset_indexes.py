@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0005_listingattributevalue_typed_values'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', '-is_featured', '-created_at', '-id'], name='listing_status_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['dealer', '-created_at', '-id'], name='listing_dealer_feed_idx'),
+        ),
+    ]
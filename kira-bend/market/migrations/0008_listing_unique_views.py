@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0007_listing_view_buffers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingview',
+            name='viewed_on',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddField(
+            model_name='listingview',
+            name='visitor',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ListingDailyUniqueViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_unique_views', to='market.listing')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'day'), name='uniq_listing_daily_unique_views')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 03:49
+
+import django.db.models.deletion
+import market.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0008_listing_unique_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(choices=[('card', 'card'), ('gallery', 'gallery'), ('full', 'full')], max_length=10)),
+                ('format', models.CharField(choices=[('avif', 'avif'), ('webp', 'webp'), ('jpeg', 'jpeg')], max_length=4)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('file', models.ImageField(max_length=255, upload_to=market.models.listing_v2_rendition_path)),
+                ('source', models.CharField(max_length=255)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='market.listingimage')),
+            ],
+            options={
+                'ordering': ['size', 'format', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('image', 'size', 'format', 'width'), name='uniq_listing_image_rendition')],
+            },
+        ),
+    ]
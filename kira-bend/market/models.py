@@ -1,5 +1,10 @@
+from decimal import Decimal, InvalidOperation
+
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
 from accounts.models import DealerProfile
@@ -84,6 +89,9 @@ class Listing(models.Model):
 
     views_count = models.PositiveIntegerField(default=0)
 
+    # Full-text search (maintained by market.signals, see market.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="created_listings_v2"
     )
@@ -96,6 +104,10 @@ class Listing(models.Model):
             models.Index(fields=["country", "region", "city"]),
             models.Index(fields=["price"]),
             models.Index(fields=["category", "status"]),
+            # Keyset pagination (public feed / dealer dashboard orderings)
+            models.Index(fields=["status", "-is_featured", "-created_at", "-id"], name="listing_status_feed_idx"),
+            models.Index(fields=["dealer", "-created_at", "-id"], name="listing_dealer_feed_idx"),
+            GinIndex(fields=["search_vector"], name="listing_search_vector_gin"),
         ]
 
     def save(self, *args, **kwargs):
@@ -120,6 +132,66 @@ class AttributeDataType(models.TextChoices):
     CHOICE = "choice", "choice"
 
 
+# Typed column that mirrors ListingAttributeValue.value for each data type.
+# Choice values are plain strings, so they share the text column.
+TYPED_VALUE_FIELDS = {
+    AttributeDataType.INT: "value_int",
+    AttributeDataType.FLOAT: "value_float",
+    AttributeDataType.TEXT: "value_text",
+    AttributeDataType.BOOL: "value_bool",
+    AttributeDataType.CHOICE: "value_text",
+}
+TYPED_VALUE_COLUMNS = ("value_int", "value_float", "value_text", "value_bool")
+
+TYPED_TEXT_MAX_LENGTH = 255
+
+_TRUE_STRINGS = {"1", "true", "yes", "y", "on"}
+_FALSE_STRINGS = {"0", "false", "no", "n", "off"}
+
+
+def coerce_attribute_value(data_type: str, raw):
+    """
+    Coerce a raw attribute value (JSON scalar or filter string) to the python
+    type stored in the typed column for data_type.
+    Raises ValueError when the value can't represent that type.
+    Text/choice values are case-folded so equality filters can use the btree index.
+    """
+    if raw is None:
+        raise ValueError("Missing value.")
+
+    if data_type in (AttributeDataType.INT, AttributeDataType.FLOAT):
+        if isinstance(raw, bool):
+            raise ValueError("Expected a number.")
+        text = str(raw).strip().replace(",", "").replace("_", "")
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            raise ValueError(f"Expected a number, got {raw!r}.")
+        if not number.is_finite():
+            raise ValueError(f"Expected a number, got {raw!r}.")
+        if data_type == AttributeDataType.FLOAT:
+            return float(number)
+        if number != number.to_integral_value():
+            raise ValueError(f"Expected a whole number, got {raw!r}.")
+        return int(number)
+
+    if data_type == AttributeDataType.BOOL:
+        if isinstance(raw, bool):
+            return raw
+        text = str(raw).strip().lower()
+        if text in _TRUE_STRINGS:
+            return True
+        if text in _FALSE_STRINGS:
+            return False
+        raise ValueError(f"Expected true/false, got {raw!r}.")
+
+    # text / choice
+    text = str(raw).strip()
+    if not text:
+        raise ValueError("Empty value.")
+    return text.casefold()[:TYPED_TEXT_MAX_LENGTH]
+
+
 class CategoryAttribute(models.Model):
     """
     Defines a spec field for a given category.
@@ -158,11 +230,20 @@ class ListingAttributeValue(models.Model):
     """
     Stores a listing's value for an attribute.
     value is JSON so it can hold int/float/text/bool cleanly.
+
+    The typed value_* columns mirror `value` according to the attribute's
+    data_type (see TYPED_VALUE_FIELDS) so filters can run as indexed
+    equality/range scans. They are filled in on save().
     """
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="attribute_values")
     attribute = models.ForeignKey(CategoryAttribute, on_delete=models.CASCADE, related_name="values")
     value = models.JSONField()
 
+    value_int = models.BigIntegerField(null=True, blank=True, editable=False)
+    value_float = models.FloatField(null=True, blank=True, editable=False)
+    value_text = models.CharField(max_length=TYPED_TEXT_MAX_LENGTH, null=True, blank=True, editable=False)
+    value_bool = models.BooleanField(null=True, blank=True, editable=False)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["listing", "attribute"], name="uniq_listing_attribute_value")
@@ -170,8 +251,38 @@ class ListingAttributeValue(models.Model):
         indexes = [
             models.Index(fields=["attribute"]),
             models.Index(fields=["listing"]),
+            models.Index(fields=["attribute", "value_int"], name="attrvalue_attr_int_idx"),
+            models.Index(fields=["attribute", "value_float"], name="attrvalue_attr_float_idx"),
+            models.Index(fields=["attribute", "value_text"], name="attrvalue_attr_text_idx"),
+            models.Index(fields=["attribute", "value_bool"], name="attrvalue_attr_bool_idx"),
         ]
 
+    def sync_typed_value(self, data_type: str = None):
+        """
+        Fill the typed column for data_type from `value` (others are cleared).
+        Values that can't be coerced leave every typed column NULL.
+        """
+        if data_type is None:
+            data_type = self.attribute.data_type
+
+        for column in TYPED_VALUE_COLUMNS:
+            setattr(self, column, None)
+
+        try:
+            typed = coerce_attribute_value(data_type, self.value)
+        except ValueError:
+            return
+        setattr(self, TYPED_VALUE_FIELDS[data_type], typed)
+
+    def save(self, *args, **kwargs):
+        self.sync_typed_value()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "value" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *TYPED_VALUE_COLUMNS}
+
+        super().save(*args, **kwargs)
+
     def __str__(self) -> str:
         return f"{self.listing_id}:{self.attribute.key}={self.value}"
 
@@ -219,6 +330,71 @@ class ListingImage(models.Model):
         return f"Image {self.id} for listing {self.listing_id}"
 
 
+class RenditionSize(models.TextChoices):
+    CARD = "card", "card"
+    GALLERY = "gallery", "gallery"
+    FULL = "full", "full"
+
+
+class RenditionFormat(models.TextChoices):
+    AVIF = "avif", "avif"
+    WEBP = "webp", "webp"
+    JPEG = "jpeg", "jpeg"
+
+
+def listing_v2_rendition_path(instance: "ListingImageRendition", filename: str) -> str:
+    # Keyed by the source file rather than the image row: images sharing a source share renditions
+    stem = instance.source.rsplit(".", 1)[0]
+    return f"{stem}/renditions/{filename}"
+
+
+class ListingImageRendition(models.Model):
+    """
+    A resized / re-encoded copy of a ListingImage (see market.renditions).
+    Each size has a 1x and a 2x width per format, so a size + format pair is
+    one srcset.
+    """
+    image = models.ForeignKey(ListingImage, on_delete=models.CASCADE, related_name="renditions")
+    size = models.CharField(max_length=10, choices=RenditionSize.choices)
+    format = models.CharField(max_length=4, choices=RenditionFormat.choices)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.ImageField(upload_to=listing_v2_rendition_path, max_length=255)
+    # ListingImage.image name this was rendered from (stale once the original is replaced)
+    source = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["size", "format", "width"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["image", "size", "format", "width"], name="uniq_listing_image_rendition"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.image_id}:{self.size}@{self.width}.{self.format}"
+
+
+# -------------------------
+# Content-addressed media (see market.media)
+# -------------------------
+
+class MediaBlob(models.Model):
+    """
+    One stored file under cas/, named by the SHA-256 of its bytes, shared by
+    every image column that references it. ref_count is the number of those
+    references; the file is deleted when it drops to zero.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.ref_count} refs)"
+
+
 # -------------------------
 # NEW: Favorites (V2) - for universal listings
 # -------------------------
@@ -237,6 +413,42 @@ class FavoriteV2(models.Model):
         return f"{self.user_id} ♥ {self.listing_id}"
 
 
+# -------------------------
+# View counting buffer (see market.view_counts)
+# -------------------------
+
+class ListingView(models.Model):
+    """
+    One not-yet-counted view of a listing. Append-only and unindexed so a
+    page view is a cheap insert; market.view_counts folds these into
+    Listing.views_count in batches.
+    """
+    listing = models.ForeignKey(
+        Listing, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    # Salted 64-bit visitor hash (market.hll.hash64) for unique views; NULL = not counted as a visitor
+    visitor = models.BigIntegerField(null=True, blank=True)
+    viewed_on = models.DateField(default=timezone.localdate)
+
+
+class ListingDailyUniqueViews(models.Model):
+    """
+    HyperLogLog sketch (market.hll) of the distinct visitors of one listing on
+    one day. Sketches merge, so weekly / monthly uniques are a union of days.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="daily_unique_views")
+    day = models.DateField()
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "day"], name="uniq_listing_daily_unique_views")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.listing_id}@{self.day}"
+
+
 # ======================================================================
 # LEGACY MODELS (V1) — keep temporarily so current GraphQL/UI won't break
 # ======================================================================
@@ -274,6 +486,9 @@ class CarListing(models.Model):
 
     views_count = models.PositiveIntegerField(default=0)
 
+    # Full-text search (maintained by market.signals, see market.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -284,6 +499,7 @@ class CarListing(models.Model):
             models.Index(fields=["make", "model", "year"]),
             models.Index(fields=["country", "region", "city"]),
             models.Index(fields=["price"]),
+            GinIndex(fields=["search_vector"], name="carlisting_search_vector_gin"),
         ]
 
     def save(self, *args, **kwargs):
@@ -346,3 +562,10 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f"{self.user_id} ♥ {self.listing_id}"
+
+
+class CarListingView(models.Model):
+    """V1 counterpart of ListingView."""
+    listing = models.ForeignKey(
+        CarListing, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
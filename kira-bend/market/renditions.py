@@ -0,0 +1,349 @@
+"""
+Responsive renditions for V2 listing images.
+
+Every ListingImage gets card / gallery / full sizes, each at 1x and 2x
+width, in WebP plus a JPEG fallback (AVIF too when enabled in
+IMAGE_RENDITION_FORMATS and supported by Pillow). Rows live in
+ListingImageRendition; ListingImageType turns them into srcset strings.
+
+Rendering runs on a small background thread pool after the upload commits
+(Pillow releases the GIL while decoding, resizing and encoding), never
+inside the request; V1 CarImage thumbnails go through the same pool.
+render_renditions() / render_thumbnail() are pure
+(file in, bytes out) and save_renditions() takes a whole batch, so bulk jobs
+(manage.py backfill_thumbnails) render in worker processes and write back
+once per batch.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from . import media
+from .cache import bump_tags
+from .models import CarImage, ListingImage, ListingImageRendition, RenditionFormat, RenditionSize
+
+logger = logging.getLogger(__name__)
+
+# 1x widths; every size is also rendered at 2x. Never upscaled past the original.
+RENDITION_WIDTHS = {
+    RenditionSize.CARD: 480,
+    RenditionSize.GALLERY: 1024,
+    RenditionSize.FULL: 1600,
+}
+DENSITIES = (1, 2)
+
+# V1 CarImage thumbnails: good for cards/grids
+THUMB_SIZE = (700, 700)
+
+_ENCODERS = {
+    RenditionFormat.AVIF: ("AVIF", "avif", {"quality": 55, "speed": 6}),
+    RenditionFormat.WEBP: ("WEBP", "webp", {"quality": 80, "method": 4}),
+    RenditionFormat.JPEG: ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "IMAGE_RENDITION_WORKERS", 2),
+    thread_name_prefix="image-renditions",
+)
+
+
+@dataclass(frozen=True)
+class RenderedImage:
+    size: str
+    format: str
+    width: int
+    height: int
+    content: bytes
+
+
+def rendition_formats() -> list[str]:
+    """Configured formats this Pillow build can encode (JPEG always can)."""
+    configured = getattr(settings, "IMAGE_RENDITION_FORMATS", (RenditionFormat.WEBP, RenditionFormat.JPEG))
+    return [f for f in configured if f in _ENCODERS and (f == RenditionFormat.JPEG or features.check(f))]
+
+
+def rendition_widths(original_width: int) -> dict[str, list[int]]:
+    """Size -> distinct target widths (1x, 2x), capped at the original width."""
+    return {
+        size: sorted({min(width * density, original_width) for density in DENSITIES})
+        for size, width in RENDITION_WIDTHS.items()
+    }
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    pil_format, _, options = _ENCODERS[fmt]
+    if fmt == RenditionFormat.JPEG and img.mode != "RGB":
+        # No alpha in JPEG: flatten onto white
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A") if img.mode == "RGBA" else None)
+        img = background
+    buf = BytesIO()
+    img.save(buf, format=pil_format, **options)
+    return buf.getvalue()
+
+
+def render_renditions(source, formats) -> list[RenderedImage]:
+    """
+    Decode `source` (path or file object) once and return every rendition.
+    Widths are produced largest first, each resized from the previous one.
+    """
+    with Image.open(source) as original:
+        largest = max(width * max(DENSITIES) for width in RENDITION_WIDTHS.values())
+        # JPEG: let the decoder downscale by 1/2, 1/4, 1/8 when that still covers `largest`
+        original.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(original)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+    plan = rendition_widths(img.width)
+    rendered = []
+    current = img
+    for width in sorted({w for widths in plan.values() for w in widths}, reverse=True):
+        if width != current.width:
+            current = current.resize(
+                (width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS
+            )
+        for fmt in formats:
+            content = _encode(current, fmt)
+            rendered.extend(
+                RenderedImage(size, fmt, width, current.height, content)
+                for size, widths in plan.items()
+                if width in widths
+            )
+    return rendered
+
+
+def render_thumbnail(source, size=THUMB_SIZE) -> bytes:
+    """The single legacy JPEG thumbnail (CarImage.thumbnail)."""
+    with Image.open(source) as original:
+        original.draft("RGB", size)
+        img = original.convert("RGB")  # safe for PNG w/ alpha
+    img.thumbnail(size)
+    return _encode(img, RenditionFormat.JPEG)
+
+
+def thumbnail_name(image_name: str) -> str:
+    base = image_name.split("/")[-1].rsplit(".", 1)[0]
+    return f"{base}_thumb.jpg"
+
+
+def _filename(rendition: RenderedImage) -> str:
+    return f"{rendition.size}-{rendition.width}.{_ENCODERS[rendition.format][1]}"
+
+
+def _upsert_renditions(images: list[ListingImage], rows: list[ListingImageRendition]) -> list[ListingImageRendition]:
+    """Upsert `rows` as the complete rendition set of `images`; fixed number of queries."""
+    if not rows:
+        return rows
+    previous = {
+        (image_id, size, fmt, width): name
+        for image_id, size, fmt, width, name in ListingImageRendition.objects.filter(image__in=images).values_list(
+            "image_id", "size", "format", "width", "file"
+        )
+    }
+    ListingImageRendition.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["image", "size", "format", "width"],
+        update_fields=["height", "file", "source"],
+    )
+    replaced = [
+        previous[key]
+        for row in rows
+        if (key := (row.image_id, row.size, row.format, row.width)) in previous and previous[key] != row.file.name
+    ]
+    # Deleting stale rows releases their files (market.signals); replaced files are released here
+    ListingImageRendition.objects.filter(image__in=images).exclude(id__in=[row.id for row in rows]).delete()
+    media.release(replaced)
+
+    # Legacy thumbnailUrl: the smallest card JPEG, for clients that don't read renditions yet
+    thumbnails = {}
+    for row in rows:
+        if row.size == RenditionSize.CARD and row.format == RenditionFormat.JPEG and not row.image.thumbnail:
+            if row.image.pk not in thumbnails or row.width < thumbnails[row.image.pk][1]:
+                thumbnails[row.image.pk] = (row.image, row.width, row.file.name)
+    for image, _, name in thumbnails.values():
+        image.thumbnail.name = name
+    if thumbnails:
+        ListingImage.objects.bulk_update([image for image, _, _ in thumbnails.values()], ["thumbnail"])
+        media.retain(name for _, _, name in thumbnails.values())
+
+    bump_tags("listings", *{f"listing:{image.listing_id}" for image in images})
+    return rows
+
+
+def save_renditions(batch: list[tuple[ListingImage, list[RenderedImage]]]) -> list[ListingImageRendition]:
+    """
+    Store rendered files and upsert their rows for (image, renditions) pairs,
+    dropping renditions no longer produced: a fixed number of queries per batch.
+    """
+    rows = []
+    for image, rendered in batch:
+        for rendition in rendered:
+            row = ListingImageRendition(
+                image=image,
+                size=rendition.size,
+                format=rendition.format,
+                width=rendition.width,
+                height=rendition.height,
+                source=image.image.name,
+            )
+            field = row.file.field
+            name = field.generate_filename(row, _filename(rendition))
+            # Stable names: overwrite instead of letting storage add a suffix
+            field.storage.delete(name)
+            row.file.name = field.storage.save(name, ContentFile(rendition.content))
+            rows.append(row)
+    return _upsert_renditions([image for image, _ in batch], rows)
+
+
+def clone_renditions(image: ListingImage) -> list[ListingImageRendition]:
+    """
+    Point `image` at the renditions another image already has for the same
+    source file (same bytes, see market.media), instead of rendering again.
+    Returns [] when there are none.
+    """
+    donor = (
+        ListingImageRendition.objects.filter(source=image.image.name)
+        .exclude(image=image)
+        .values_list("image_id", flat=True)
+        .first()
+    )
+    if donor is None:
+        return []
+    rows = [
+        ListingImageRendition(
+            image=image,
+            size=r.size,
+            format=r.format,
+            width=r.width,
+            height=r.height,
+            file=r.file.name,
+            source=r.source,
+        )
+        for r in ListingImageRendition.objects.filter(image_id=donor)
+    ]
+    media.retain(row.file.name for row in rows)
+    return _upsert_renditions([image], rows)
+
+
+def renditions_current(image: ListingImage) -> bool:
+    renditions = ListingImageRendition.objects.filter(image=image)
+    return renditions.exists() and not renditions.exclude(source=image.image.name).exists()
+
+
+def generate_renditions(image_id: int, force: bool = False) -> int:
+    """Render and store every rendition of one image; returns how many were written."""
+    image = ListingImage.objects.filter(pk=image_id).only("id", "listing_id", "image", "thumbnail").first()
+    if image is None or not image.image:
+        return 0
+    if not force:
+        if renditions_current(image):
+            return 0
+        cloned = clone_renditions(image)
+        if cloned:
+            return len(cloned)
+
+    with image.image.open("rb") as source:
+        rendered = render_renditions(source, rendition_formats())
+    return len(save_renditions([(image, rendered)]))
+
+
+def generate_thumbnails(image_ids) -> int:
+    """Legacy thumbnails for the CarImages in `image_ids` that lack one, saved with one bulk_update."""
+    images = list(
+        CarImage.objects.filter(pk__in=image_ids)
+        .exclude(image="")
+        .filter(Q(thumbnail__isnull=True) | Q(thumbnail=""))
+        .only("id", "listing_id", "image", "thumbnail")
+    )
+    # Same source bytes (market.media) already thumbnailed elsewhere: reuse that thumbnail
+    existing = dict(
+        CarImage.objects.filter(image__in={image.image.name for image in images})
+        .exclude(Q(thumbnail__isnull=True) | Q(thumbnail=""))
+        .values_list("image", "thumbnail")
+    )
+    done, reused = [], []
+    for image in images:
+        if image.image.name in existing:
+            image.thumbnail.name = existing[image.image.name]
+            reused.append(image.thumbnail.name)
+            done.append(image)
+            continue
+        try:
+            content = render_thumbnail(image.image)
+        except Exception:
+            # don't fail the rest of the upload's thumbnails
+            logger.exception("Thumbnail for car image %s failed", image.pk)
+            continue
+        image.thumbnail.save(thumbnail_name(image.image.name), ContentFile(content), save=False)
+        existing[image.image.name] = image.thumbnail.name
+        done.append(image)
+    if done:
+        CarImage.objects.bulk_update(done, ["thumbnail"])
+        media.retain(reused)
+    return len(done)
+
+
+def _run(func, *args) -> None:
+    # Pool threads live outside the request cycle: manage connections ourselves
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        # Never surfaces to the uploader; the image keeps serving its original
+        logger.exception("%s%r failed", func.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(image_id: int) -> None:
+    """Render in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run, generate_renditions, image_id))
+
+
+def schedule_thumbnails(image_ids) -> None:
+    """CarImage thumbnails in the background once the current transaction commits."""
+    image_ids = list(image_ids)
+    transaction.on_commit(lambda: _executor.submit(_run, generate_thumbnails, image_ids))
+
+
+# -------------------------
+# Upload checks
+# -------------------------
+
+def probe_image(upload) -> tuple[str, int, int]:
+    """
+    (format, width, height) of an uploaded image, read from its header only:
+    Pillow's open() is lazy, so no pixels are decoded. Raises ValueError when
+    the file isn't an accepted format or its size is out of bounds.
+    """
+    max_bytes = getattr(settings, "IMAGE_UPLOAD_MAX_BYTES", 15 * 1024 * 1024)
+    if upload.size > max_bytes:
+        raise ValueError(f"File is larger than {max_bytes // (1024 * 1024)} MB.")
+
+    try:
+        with Image.open(upload) as img:
+            fmt, (width, height) = img.format, img.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise ValueError("Not a readable image.")
+    finally:
+        upload.seek(0)
+
+    formats = getattr(settings, "IMAGE_UPLOAD_FORMATS", ("JPEG", "MPO", "PNG", "WEBP"))
+    if fmt not in formats:
+        raise ValueError(f"Unsupported image format {fmt}.")
+    min_side = getattr(settings, "IMAGE_UPLOAD_MIN_SIDE", 200)
+    if min(width, height) < min_side:
+        raise ValueError(f"Image is smaller than {min_side}px.")
+    max_pixels = getattr(settings, "IMAGE_UPLOAD_MAX_PIXELS", 50_000_000)
+    if width * height > max_pixels:
+        raise ValueError(f"Image is larger than {max_pixels // 1_000_000} megapixels.")
+    return fmt, width, height
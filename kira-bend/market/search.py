@@ -0,0 +1,112 @@
+"""
+Postgres full-text search for listings (V1 + V2).
+
+Each listing keeps a precomputed `search_vector` (GIN indexed), refreshed by
+signals whenever the listing or its attribute values change. Weights:
+  A = title
+  B = specs (V2 attribute values / V1 make, model, trim)
+  C = location
+  D = description
+"""
+import re
+from typing import Optional
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import AttributeDataType, CarListing, Listing
+
+# "simple" = no stemming / stop words; safest for mixed English/Swahili content
+SEARCH_CONFIG = "simple"
+
+# Fields that feed the vectors (saves touching none of them skip the refresh)
+LISTING_SEARCH_FIELDS = {"title", "description", "city", "region", "country"}
+CAR_LISTING_SEARCH_FIELDS = {"title", "make", "model", "trim", "description"}
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# -------------------------
+# Vectors
+# -------------------------
+
+def listing_search_vector(model=Listing):
+    """
+    SearchVector expression for V2 listings.
+    `model` lets migrations pass the historical Listing model.
+    """
+    value_model = model._meta.get_field("attribute_values").related_model
+    specs = (
+        value_model.objects.filter(listing=OuterRef("pk"))
+        .exclude(attribute__data_type=AttributeDataType.BOOL)
+        .values("listing")
+        .annotate(text=StringAgg(Cast("value", TextField()), delimiter=" "))
+        .values("text")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(specs), Value(""), output_field=TextField()), weight="B", config=SEARCH_CONFIG)
+        + SearchVector("city", "region", "country", weight="C", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def car_listing_search_vector():
+    """SearchVector expression for V1 (legacy) car listings."""
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("make", "model", "trim", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def refresh_listing_search_vectors(ids=None, model=Listing) -> int:
+    """Recompute V2 vectors in a single UPDATE (all rows when ids is None)."""
+    qs = model.objects.all()
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    return qs.update(search_vector=listing_search_vector(model))
+
+
+def refresh_car_listing_search_vectors(ids=None, model=CarListing) -> int:
+    """Recompute V1 vectors in a single UPDATE (all rows when ids is None)."""
+    qs = model.objects.all()
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    return qs.update(search_vector=car_listing_search_vector())
+
+
+# -------------------------
+# Queries
+# -------------------------
+
+def build_search_query(text: str) -> Optional[SearchQuery]:
+    """
+    Turn free text into an AND tsquery. The last term is a prefix match so
+    results keep up while the user is still typing ("toyota ra" -> rav4).
+    Returns None when the text has no searchable terms.
+    """
+    terms = _TERM_RE.findall((text or "").lower())
+    if not terms:
+        return None
+
+    parts = [f"'{t}'" for t in terms[:-1]]
+    parts.append(f"'{terms[-1]}':*")
+    return SearchQuery(" & ".join(parts), search_type="raw", config=SEARCH_CONFIG)
+
+
+def apply_search(qs, text: str, rank: bool = False):
+    """
+    Filter a Listing/CarListing queryset by full-text match.
+    With rank=True the queryset is annotated with `search_rank`.
+    """
+    query = build_search_query(text)
+    if query is None:
+        return qs
+
+    qs = qs.filter(search_vector=query)
+    if rank:
+        qs = qs.annotate(search_rank=SearchRank(F("search_vector"), query))
+    return qs
@@ -1,34 +1,142 @@
-from io import BytesIO
-from PIL import Image
-
-from django.core.files.base import ContentFile
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import CarImage
+from . import media
+from .attributes import invalidate_category_schema
+from .cache import bump_listings_generation, bump_tags
+from .models import (
+    CarImage,
+    CarListing,
+    Category,
+    CategoryAttribute,
+    Listing,
+    ListingAttributeValue,
+    ListingImage,
+    ListingImageRendition,
+)
+from .renditions import schedule_renditions, schedule_thumbnails
+from .search import (
+    CAR_LISTING_SEARCH_FIELDS,
+    LISTING_SEARCH_FIELDS,
+    refresh_car_listing_search_vectors,
+    refresh_listing_search_vectors,
+)
 
-THUMB_SIZE = (700, 700)  # good for cards/grids
 
 @receiver(post_save, sender=CarImage)
 def generate_thumbnail(sender, instance: CarImage, created, **kwargs):
-    # Only generate when original exists and thumbnail missing
+    # Only generate when original exists and thumbnail missing; off the request (see market.renditions)
     if not instance.image or instance.thumbnail:
         return
+    schedule_thumbnails([instance.pk])
+
+
+@receiver(post_save, sender=ListingImage)
+def render_listing_image(sender, instance: ListingImage, created, update_fields=None, **kwargs):
+    # Off the request: renditions are generated in the background (see market.renditions)
+    if instance.image and (created or update_fields is None or "image" in update_fields):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=CarImage)
+@receiver(post_delete, sender=ListingImage)
+@receiver(post_delete, sender=ListingImageRendition)
+def release_image_files(sender, instance, **kwargs):
+    # Shared, reference-counted files (see market.media): deleted once nothing points at them
+    names = [getattr(instance, field).name for model, field in media.REFERENCES if model is sender]
+    media.release(names)
+
+
+# -------------------------
+# Full-text search vectors
+# -------------------------
+
+def _touches(update_fields, searched) -> bool:
+    # update_fields=None means a full save
+    return update_fields is None or bool(set(update_fields) & searched)
+
+
+@receiver(post_save, sender=Listing)
+def update_listing_search_vector(sender, instance: Listing, update_fields=None, **kwargs):
+    if _touches(update_fields, LISTING_SEARCH_FIELDS):
+        refresh_listing_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=ListingAttributeValue)
+@receiver(post_delete, sender=ListingAttributeValue)
+def update_listing_search_vector_for_attribute(sender, instance: ListingAttributeValue, **kwargs):
+    refresh_listing_search_vectors([instance.listing_id])
+
+
+@receiver(post_save, sender=CarListing)
+def update_car_listing_search_vector(sender, instance: CarListing, update_fields=None, **kwargs):
+    if _touches(update_fields, CAR_LISTING_SEARCH_FIELDS):
+        refresh_car_listing_search_vectors([instance.pk])
 
-    try:
-        img = Image.open(instance.image)
-        img = img.convert("RGB")          # safe for PNG w/ alpha
-        img.thumbnail(THUMB_SIZE)
 
-        buf = BytesIO()
-        img.save(buf, format="JPEG", quality=82, optimize=True)
-        buf.seek(0)
+# -------------------------
+# Listing read caches (counts, facets)
+# -------------------------
 
-        base = instance.image.name.split("/")[-1].rsplit(".", 1)[0]
-        thumb_name = f"{base}_thumb.jpg"
+# Saves that only touch these fields don't change any filtered result set
+_CACHE_NEUTRAL_FIELDS = {"views_count", "search_vector"}
 
-        instance.thumbnail.save(thumb_name, ContentFile(buf.read()), save=False)
-        instance.save(update_fields=["thumbnail"])
-    except Exception:
-        # don't break uploads if thumbnail fails
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=CarListing)
+@receiver(post_save, sender=ListingAttributeValue)
+@receiver(post_save, sender=Category)
+def invalidate_listing_caches(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= _CACHE_NEUTRAL_FIELDS:
         return
+    bump_listings_generation()
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=CarListing)
+@receiver(post_delete, sender=ListingAttributeValue)
+@receiver(post_delete, sender=Category)
+def invalidate_listing_caches_on_delete(sender, **kwargs):
+    bump_listings_generation()
+
+
+@receiver(post_save, sender=CategoryAttribute)
+@receiver(post_delete, sender=CategoryAttribute)
+def invalidate_category_attribute_schema(sender, instance: CategoryAttribute, **kwargs):
+    invalidate_category_schema(instance.category_id)
+
+
+# -------------------------
+# Entity tags (GraphQL response cache)
+# -------------------------
+
+def _entity_tags(instance) -> tuple[str, ...]:
+    if isinstance(instance, Listing):
+        return ("listings", f"listing:{instance.pk}")
+    if isinstance(instance, (ListingImage, ListingAttributeValue)):
+        return ("listings", f"listing:{instance.listing_id}")
+    if isinstance(instance, Category):
+        return ("categories", "category_attributes", "listings")
+    if isinstance(instance, CategoryAttribute):
+        return ("category_attributes", "listings")
+    return ()
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=ListingImage)
+@receiver(post_save, sender=ListingAttributeValue)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=CategoryAttribute)
+def invalidate_entity_tags(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= _CACHE_NEUTRAL_FIELDS:
+        return
+    bump_tags(*_entity_tags(instance))
+
+
+@receiver(post_delete, sender=Listing)
+@receiver(post_delete, sender=ListingImage)
+@receiver(post_delete, sender=ListingAttributeValue)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=CategoryAttribute)
+def invalidate_entity_tags_on_delete(sender, instance, **kwargs):
+    bump_tags(*_entity_tags(instance))
@@ -1,3 +1,589 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts import revocation
+from accounts.models import DealerProfile
+from config import ratelimit
+from config.auth import CachedJWTAuthentication, user_cache
+from config.instrumentation import RESOLVER_DURATION
+from config.persisted_queries import query_hash
+from config.schema import AttributeFilterKVInput, AttributeFilterOp, ListingsV2FilterInput, _public_listings_v2_qs
+from config.replicas import ReplicaRouter, replica_reads
+from config.timeouts import StatementTimeoutError, sql_budget
+
+from .attributes import upsert_listing_attributes
+from .hll import hash64
+from .models import (
+    AttributeDataType,
+    CarListing,
+    Category,
+    CategoryAttribute,
+    Favorite,
+    FavoriteV2,
+    Listing,
+    ListingAttributeValue,
+    MediaBlob,
+    ListingDailyUniqueViews,
+    ListingStatus,
+    ListingView,
+)
+from . import media, view_counts
+from .view_counts import FLUSH_LOCK_KEY, flush_views, record_view, unique_views
+
+
+def graphql(client, query, variables=None, user=None):
+    headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"} if user is not None else {}
+    response = client.post(
+        "/graphql/",
+        data=json.dumps({"query": query, "variables": variables or {}}),
+        content_type="application/json",
+        headers=headers,
+    )
+    return response.json()
+
+
+class BufferedViewCountTests(TransactionTestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="dealer", password="x")
+        dealer = DealerProfile.objects.create(user=user, dealership_name="Kira Motors")
+        category = Category.objects.create(name="Cars", slug="cars")
+        self.listing = Listing.objects.create(
+            dealer=dealer, category=category, title="Toyota RAV4", price=1000, status=ListingStatus.PUBLISHED
+        )
+
+    def test_concurrent_writers_and_flushers_lose_no_views(self):
+        writers, views_each = 8, 25
+        start = threading.Barrier(writers + 2)
+        errors = []
+
+        def write():
+            try:
+                start.wait()
+                for _ in range(views_each):
+                    record_view(ListingView, self.listing.id)
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        def flush():
+            try:
+                start.wait()
+                for _ in range(20):
+                    flush_views(batch_size=7)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write) for _ in range(writers)]
+        threads += [threading.Thread(target=flush), threading.Thread(target=flush)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        flush_views()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, writers * views_each)
+        self.assertFalse(ListingView.objects.exists())
+
+    def test_flush_updates_each_listing_once_per_batch(self):
+        other = Listing.objects.create(
+            dealer=self.listing.dealer, category=self.listing.category, title="Honda CR-V", price=900
+        )
+        ListingView.objects.bulk_create(
+            [ListingView(listing_id=self.listing.id) for _ in range(3)]
+            + [ListingView(listing_id=other.id) for _ in range(2)]
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(flush_views(batch_size=10), 5)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+
+        self.listing.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.listing.views_count, other.views_count), (3, 2))
+
+    def test_views_of_deleted_listings_are_dropped(self):
+        gone = Listing.objects.create(
+            dealer=self.listing.dealer, category=self.listing.category, title="Honda CR-V", price=900
+        )
+        ListingView.objects.bulk_create(
+            [ListingView(listing_id=listing.id, visitor=hash64(listing.title)) for listing in (self.listing, gone)]
+        )
+        gone.delete()
+
+        self.assertEqual(flush_views(), 2)
+        self.assertFalse(ListingView.objects.exists())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 1)
+        self.assertEqual(unique_views([self.listing.id], days=1), {self.listing.id: 1})
+
+    def test_flush_folds_visitors_into_daily_sketches(self):
+        for _ in range(3):
+            for visitor in range(200):
+                record_view(ListingView, self.listing.id, hash64(f"visitor-{visitor}"))
+            record_view(ListingView, self.listing.id)  # crawler: a view, not a visitor
+            flush_views(batch_size=150)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 3 * 201)
+        self.assertEqual(ListingDailyUniqueViews.objects.filter(listing=self.listing).count(), 1)
+        estimate = unique_views([self.listing.id], days=7)[self.listing.id]
+        self.assertAlmostEqual(estimate, 200, delta=10)
+
+    def test_opportunistic_flush_runs_off_the_request(self):
+        cache.delete(FLUSH_LOCK_KEY)
+        with CaptureQueriesContext(connection) as ctx:
+            record_view(ListingView, self.listing.id)
+        self.assertEqual(len(ctx), 1)  # the buffered insert only
+
+        view_counts._executor.submit(lambda: None).result()  # single worker: the flush is done
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 1)
+        self.assertFalse(ListingView.objects.exists())
+
+
+def use_temporary_media_root(test):
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def store(self, content=b"photo"):
+        files = [(ContentFile(content, name="a.jpg"), "JPEG"), (ContentFile(content, name="b.jpg"), "JPEG")]
+        return media.store_many(files)
+
+    def test_reference_taken_before_collection_keeps_the_blob(self):
+        name, _ = self.store()
+        media.release([name, name])  # collection pending
+        self.assertEqual(self.store(), [name, name])
+
+        media._collect({name})
+
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_blob_collected_before_reference_is_stored_again(self):
+        name, _ = self.store()
+        with self.captureOnCommitCallbacks(execute=True):
+            media.release([name, name])
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+
+        self.assertEqual(self.store(), [name, name])
+
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+        with default_storage.open(name) as stored:
+            self.assertEqual(stored.read(), b"photo")
+
+
+class MediaBlobRaceTests(TransactionTestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def test_upload_during_collection_stores_the_file_again(self):
+        photo = ContentFile(b"photo", name="a.jpg")
+        name = media.store(photo, "JPEG")
+        MediaBlob.objects.filter(name=name).update(ref_count=0)  # released, collection pending
+
+        deleting, proceed = threading.Event(), threading.Event()
+        delete = default_storage.delete
+
+        def slow_delete(path):
+            deleting.set()
+            proceed.wait(5)
+            delete(path)
+
+        def run(func, *args):
+            try:
+                func(*args)
+            finally:
+                connection.close()
+
+        with mock.patch.object(default_storage, "delete", slow_delete):
+            collector = threading.Thread(target=run, args=(media._collect, {name}))
+            collector.start()
+            deleting.wait(5)
+            uploader = threading.Thread(target=run, args=(media.store, ContentFile(b"photo", name="b.jpg"), "JPEG"))
+            uploader.start()
+            time.sleep(0.2)  # the upload waits for the collection to commit
+            proceed.set()
+            collector.join()
+            uploader.join()
+
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+
+class ListingAttributeUpsertTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="dealer", password="x")
+        dealer = DealerProfile.objects.create(user=user, dealership_name="Kira Motors")
+        self.category = Category.objects.create(name="Cars", slug="cars")
+        self.listing = Listing.objects.create(dealer=dealer, category=self.category, title="Toyota RAV4", price=1000)
+        for i in range(10):
+            CategoryAttribute.objects.create(
+                category=self.category, key=f"spec{i}", label=f"Spec {i}", data_type=AttributeDataType.INT
+            )
+        CategoryAttribute.objects.create(
+            category=self.category,
+            key="transmission",
+            label="Transmission",
+            data_type=AttributeDataType.CHOICE,
+            choices=["AUTO", "MANUAL"],
+        )
+
+    def test_query_count_does_not_depend_on_attribute_count(self):
+        upsert_listing_attributes(self.listing, {"spec0": 1})  # warms the category schema cache
+        values = {f"spec{i}": i * 1000 for i in range(10)}
+        values["transmission"] = "Auto"
+        with self.assertNumQueries(2):
+            self.assertEqual(upsert_listing_attributes(self.listing, values), 11)
+        with self.assertNumQueries(2):
+            upsert_listing_attributes(self.listing, {"spec0": "42", "unknown": "x"})
+
+        self.assertEqual(ListingAttributeValue.objects.filter(listing=self.listing).count(), 11)
+        spec0 = ListingAttributeValue.objects.get(listing=self.listing, attribute__key="spec0")
+        self.assertEqual((spec0.value, spec0.value_int), ("42", 42))
+        transmission = ListingAttributeValue.objects.get(listing=self.listing, attribute__key="transmission")
+        self.assertEqual(transmission.value_text, "auto")
+
+    def test_invalid_values_are_rejected_without_writing(self):
+        with self.assertRaisesMessage(ValueError, "spec1: Expected a number"):
+            upsert_listing_attributes(self.listing, {"spec0": 1, "spec1": "lots", "transmission": "CVT"})
+        with self.assertRaisesMessage(ValueError, "transmission: Expected one of AUTO, MANUAL"):
+            upsert_listing_attributes(self.listing, {"transmission": "CVT"})
+        self.assertFalse(ListingAttributeValue.objects.filter(listing=self.listing).exists())
+
+
+class ListingAttributeFilterQueryTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Cars", slug="cars")
+        for key, data_type in (
+            ("year", AttributeDataType.INT),
+            ("make", AttributeDataType.TEXT),
+            ("transmission", AttributeDataType.CHOICE),
+        ):
+            CategoryAttribute.objects.create(category=category, key=key, label=key.title(), data_type=data_type)
+
+    def test_each_attribute_filter_adds_one_exists_and_no_join(self):
+        filters = [
+            AttributeFilterKVInput(key="year", value="2015", op=AttributeFilterOp.GTE),
+            AttributeFilterKVInput(key="make", value="Toyota"),
+            AttributeFilterKVInput(key="transmission", values=["AUTO", "MANUAL"], op=AttributeFilterOp.IN),
+        ]
+        baseline = str(_public_listings_v2_qs(ListingsV2FilterInput(category_slug="cars")).query)
+
+        for n in (1, 2, 3):
+            with self.subTest(filters=n):
+                qs = _public_listings_v2_qs(ListingsV2FilterInput(category_slug="cars", attributes=filters[:n]))
+                sql = str(qs.query)
+                self.assertNotIn("DISTINCT", sql)
+                self.assertEqual(sql.count("EXISTS"), n)
+                self.assertEqual(sql.count("JOIN"), baseline.count("JOIN"))
+
+
+class ListingPageLoaderTests(TestCase):
+    V1 = """
+        query ($limit: Int!) { listingsPage(pagination: {limit: $limit}) { results { id isFavorited } } }
+    """
+    V2 = """
+        query ($limit: Int!) {
+          listingsPageV2(pagination: {limit: $limit}) { results { id isFavorited uniqueViews(days: 7) } }
+        }
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="dealer", password="x")
+        dealer = DealerProfile.objects.create(user=self.user, dealership_name="Kira Motors")
+        category = Category.objects.create(name="Cars", slug="cars")
+        for i in range(24):
+            car = CarListing.objects.create(
+                dealer=dealer, title=f"Car {i}", price=1000 + i, year=2015, make="Toyota", model="RAV4",
+                status=ListingStatus.PUBLISHED,
+            )
+            listing = Listing.objects.create(
+                dealer=dealer, category=category, title=f"Car {i}", price=1000 + i, status=ListingStatus.PUBLISHED
+            )
+            if i % 3 == 0:
+                Favorite.objects.create(user=self.user, listing=car)
+                FavoriteV2.objects.create(user=self.user, listing=listing)
+
+    def _assert_query_count_independent_of_page_size(self, query, field):
+        graphql(self.client, query, {"limit": 1}, user=self.user)  # warms per-process state (revocations, ...)
+
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            result = graphql(self.client, query, {"limit": 5}, user=self.user)
+        self.assertEqual(len(result["data"][field]["results"]), 5)
+
+        cache.clear()
+        user_cache.clear()
+        with self.assertNumQueries(len(small)):
+            result = graphql(self.client, query, {"limit": 24}, user=self.user)
+        results = result["data"][field]["results"]
+        self.assertEqual(len(results), 24)
+        self.assertEqual(sum(row["isFavorited"] for row in results), 8)
+
+    def test_listings_page_favorites_are_batched(self):
+        self._assert_query_count_independent_of_page_size(self.V1, "listingsPage")
+
+    def test_listings_page_v2_favorites_and_unique_views_are_batched(self):
+        self._assert_query_count_independent_of_page_size(self.V2, "listingsPageV2")
+
+
+class ResolverMetricTests(TestCase):
+    def test_resolver_time_is_labelled_by_schema_field_not_alias(self):
+        query = "query AliasedCategories { first: categories { id } second: categories { id } }"
+        result = graphql(self.client, query)
+
+        self.assertEqual(result["data"], {"first": [], "second": []})
+        fields = {labels[1] for labels in RESOLVER_DURATION._series if labels[0] == "AliasedCategories"}
+        self.assertEqual(fields, {"Query.categories"})
+
+
+class ListingFacetTests(TestCase):
+    QUERY = """
+        query ($filters: ListingsV2FilterInput) {
+          listingFacets(filters: $filters) {
+            totalCount
+            regions { value count }
+            cities { value count }
+            attributes { key buckets { value count } }
+          }
+        }
+    """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="dealer", password="x")
+        dealer = DealerProfile.objects.create(user=user, dealership_name="Kira Motors")
+        category = Category.objects.create(name="Cars", slug="cars")
+        CategoryAttribute.objects.create(
+            category=category,
+            key="transmission",
+            label="Transmission",
+            data_type=AttributeDataType.CHOICE,
+            choices=["AUTO", "MANUAL"],
+            is_filterable=True,
+        )
+        for region, city, transmission in (
+            ("Arusha", "Arusha", "AUTO"),
+            ("arusha", "Karatu", "MANUAL"),
+            ("Dodoma", "Dodoma", "AUTO"),
+        ):
+            listing = Listing.objects.create(
+                dealer=dealer, category=category, title="Toyota RAV4", price=1000, region=region, city=city,
+                status=ListingStatus.PUBLISHED,
+            )
+            upsert_listing_attributes(listing, {"transmission": transmission})
+
+    def facets(self, **filters):
+        return graphql(self.client, self.QUERY, {"filters": filters})["data"]["listingFacets"]
+
+    def test_locations_are_grouped_case_insensitively(self):
+        facets = self.facets()
+
+        self.assertEqual(facets["regions"], [{"value": "Arusha", "count": 2}, {"value": "Dodoma", "count": 1}])
+
+    def test_facets_leave_out_their_own_filter(self):
+        facets = self.facets(region="ARUSHA", attributes=[{"key": "transmission", "value": "AUTO"}])
+
+        self.assertEqual(facets["totalCount"], 1)
+        # Other regions stay selectable under the region filter, counted with the transmission filter
+        self.assertEqual(facets["regions"], [{"value": "Arusha", "count": 1}, {"value": "Dodoma", "count": 1}])
+        self.assertEqual(facets["cities"], [{"value": "Arusha", "count": 1}])
+        transmission = facets["attributes"][0]["buckets"]
+        self.assertEqual(transmission, [{"value": "AUTO", "count": 1}, {"value": "MANUAL", "count": 1}])
+
+
+class PersistedQueryCacheHeaderTests(TestCase):
+    QUERY = "{ categories { id name } }"
+
+    def get(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(self.QUERY)}}
+        return self.client.get("/graphql/", {"query": self.QUERY, "extensions": json.dumps(extensions)})
+
+    def test_anonymous_get_is_publicly_cacheable(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_session_authenticated_get_stays_private(self):
+        self.client.force_login(get_user_model().objects.create_user(username="buyer", password="x"))
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("public", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+
+class ListingV2MutationTests(TestCase):
+    CREATE = """
+        mutation ($input: CreateListingV2Input!) { createListingV2(input: $input) { id } }
+    """
+    UPDATE = """
+        mutation ($id: ID!, $input: UpdateListingV2Input!) { updateListingV2(listingId: $id, input: $input) { id } }
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="dealer", password="x")
+        dealer = DealerProfile.objects.create(user=self.user, dealership_name="Kira Motors")
+        self.category = Category.objects.create(name="Cars", slug="cars")
+        CategoryAttribute.objects.create(category=self.category, key="year", label="Year", data_type=AttributeDataType.INT)
+        self.listing = Listing.objects.create(dealer=dealer, category=self.category, title="Toyota RAV4", price=1000)
+
+    def test_invalid_attribute_creates_no_listing(self):
+        attributes = [{"key": "year", "value": "recent"}]
+        listing = {"categorySlug": "cars", "title": "Mazda CX-5", "price": 2000, "attributes": attributes}
+        result = graphql(self.client, self.CREATE, {"input": listing}, user=self.user)
+
+        self.assertIn("year: Expected a number", result["errors"][0]["message"])
+        self.assertEqual(Listing.objects.count(), 1)
+
+    def test_invalid_attribute_changes_no_fields(self):
+        attributes = [{"key": "year", "value": "recent"}]
+        changes = {"title": "Toyota RAV4 Hybrid", "price": 1500, "attributes": attributes}
+        result = graphql(self.client, self.UPDATE, {"id": self.listing.id, "input": changes}, user=self.user)
+
+        self.assertIn("year: Expected a number", result["errors"][0]["message"])
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.title, self.listing.price), ("Toyota RAV4", 1000))
+        self.assertFalse(ListingAttributeValue.objects.filter(listing=self.listing).exists())
+
+
+class JWTUserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(username="dealer", password="x")
+        DealerProfile.objects.create(user=self.user, dealership_name="Kira Motors")
+        self.auth = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def test_user_and_dealer_profile_load_once_per_token(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.auth.get_user(self.token).dealer_profile.dealership_name, "Kira Motors")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.auth.get_user(self.token).pk, self.user.pk)
+
+    def test_deactivation_invalidates_cached_user(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(self.auth.cached_user(self.token))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="dealer", password="x")
+        revocation.rebuild()
+
+    def test_revoked_token_is_rejected_from_memory(self):
+        token, other = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke_tokens([token])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation.is_revoked(token))
+            self.assertFalse(revocation.is_revoked(other))
+
+    def test_password_change_revokes_earlier_tokens(self):
+        token = AccessToken.for_user(self.user)
+        token.set_iat(at_time=token.current_time - timedelta(seconds=10))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("new-password")
+            self.user.save()
+
+        self.assertTrue(revocation.is_revoked(token))
+        with self.assertRaises(InvalidToken):
+            CachedJWTAuthentication().get_validated_token(str(token).encode())
+
+    def test_rebuild_moves_log_into_bloom_filter(self):
+        token, other = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        revocation.revoke_tokens([token])
+        revocation.rebuild()
+
+        self.assertIsNone(revocation.cached_status(token))  # Bloom hit, confirmed once
+        self.assertTrue(revocation.is_revoked(token))
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation.is_revoked(token))
+            self.assertFalse(revocation.cached_status(other))
+
+
+@override_settings(RATE_LIMITS={"login": {"ip": (3, 60), "username": (2, 60)}})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE_ALIAS].clear()
+
+    def test_buckets_per_ip_and_username(self):
+        ratelimit.check("login", ip="10.0.0.1", username="dealer")
+        ratelimit.check("login", ip="10.0.0.1", username="Dealer")
+        with self.assertRaises(ratelimit.RateLimited) as ctx:
+            ratelimit.check("login", ip="10.0.0.1", username="dealer")
+        self.assertEqual(ctx.exception.extensions["code"], "RATE_LIMITED")
+        self.assertGreater(ctx.exception.extensions["retryAfter"], 0)
+
+        ratelimit.check("login", ip="10.0.0.1", username="other")  # last IP token
+        with self.assertRaises(ratelimit.RateLimited):
+            ratelimit.check("login", ip="10.0.0.1", username="third")
+        ratelimit.check("login", ip="10.0.0.2", username="third")
+
+
+class StatementTimeoutTests(TestCase):
+    def test_budget_cancels_slow_statement(self):
+        with self.assertRaises(StatementTimeoutError) as ctx, self.assertLogs("config.timeouts", "WARNING"):
+            with sql_budget(200), transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT pg_sleep(5)")
+        self.assertEqual(ctx.exception.extensions["code"], "STATEMENT_TIMEOUT")
+
+    def test_spent_budget_starts_no_statement(self):
+        with sql_budget(1):
+            time.sleep(0.01)
+            with self.assertRaises(StatementTimeoutError), self.assertLogs("config.timeouts", "WARNING"):
+                with self.assertNumQueries(0):
+                    get_user_model().objects.exists()
+
+
+class ReplicaRoutingTests(TestCase):
+    def test_reads_return_to_primary_after_first_write(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Listing), "default")
+        with replica_reads("replica1"):
+            self.assertEqual(router.db_for_read(Listing), "replica1")
+            self.assertEqual(router.db_for_write(ListingView), "default")
+            self.assertEqual(router.db_for_read(Listing), "default")
+        self.assertEqual(router.db_for_read(Listing), "default")
+        self.assertFalse(router.allow_migrate("replica1", "market"))
@@ -0,0 +1,199 @@
+"""
+Buffered listing view counts.
+
+A page view inserts one row into a narrow append-only table (ListingView /
+CarListingView) instead of rewriting the hot listing row, so concurrent
+views never contend on a row lock and never lose increments. flush_views()
+moves buffered views into views_count in batches: one DELETE ... RETURNING
+and one UPDATE ... FROM (VALUES ...) per batch, inside one transaction, so a
+view is either still buffered or counted, never both or neither.
+
+Listing views also carry a salted visitor hash; the same flush folds them
+into per-listing, per-day HyperLogLog sketches (ListingDailyUniqueViews, see
+market.hll) with one read and one upsert per batch, so unique-visitor
+counting adds no writes to the view path either.
+
+Flushes happen opportunistically (at most once per VIEW_COUNT_FLUSH_INTERVAL
+across all workers, triggered by a view and run on a background thread, so
+the viewing request never waits for it) and on demand through
+`manage.py flush_view_counts`.
+"""
+import logging
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .hll import HyperLogLog, hash64
+from .models import CarListing, CarListingView, Listing, ListingDailyUniqueViews, ListingView
+
+logger = logging.getLogger(__name__)
+
+# Buffer model -> counted model
+BUFFERS = {
+    ListingView: Listing,
+    CarListingView: CarListing,
+}
+
+# Buffer model -> daily sketch model, for buffers that record visitors
+SKETCHES = {
+    ListingView: ListingDailyUniqueViews,
+}
+
+_BOT_USER_AGENT = re.compile(r"bot|crawl|spider|slurp|preview|headless", re.IGNORECASE)
+
+FLUSH_LOCK_KEY = "market:views:flush"
+# pg advisory lock id shared by every flusher (arbitrary constant)
+_ADVISORY_LOCK_ID = 0x6B697261
+
+# Flushes are serialized by the advisory lock anyway: one thread is enough
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="view-counts")
+
+
+def visitor_hash(request):
+    """
+    Who is viewing: the user when signed in, else client address + user
+    agent. Salted with SECRET_KEY and reduced to 64 bits, so the buffer holds
+    no personal data. None for crawlers (counted as views, not visitors).
+    """
+    user_agent = request.META.get("HTTP_USER_AGENT", "")
+    if _BOT_USER_AGENT.search(user_agent):
+        return None
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        key = f"user:{user.pk}"
+    else:
+        key = f"anon:{request.META.get('REMOTE_ADDR', '')}:{user_agent}"
+    return hash64(f"{settings.SECRET_KEY}:{key}")
+
+
+def record_view(buffer_model, listing_id: int, visitor: int = None) -> None:
+    if buffer_model in SKETCHES:
+        buffer_model.objects.create(listing_id=listing_id, visitor=visitor)
+    else:
+        buffer_model.objects.create(listing_id=listing_id)
+    maybe_flush()
+
+
+def _update_sketches(sketch_model, visitors: dict) -> None:
+    """Fold {(listing_id, day): [visitor, ...]} into the daily sketches: two SELECTs, one upsert."""
+    # The buffer has no FK: skip views of listings deleted since, like the views_count UPDATE
+    # does (which also row-locks the live ones, so they can't be deleted before we commit)
+    listing_model = sketch_model._meta.get_field("listing").related_model
+    listing_ids = set(
+        listing_model.objects.filter(pk__in={listing_id for listing_id, _ in visitors}).values_list("pk", flat=True)
+    )
+    visitors = {key: hashes for key, hashes in visitors.items() if key[0] in listing_ids}
+    if not visitors:
+        return
+    days = {day for _, day in visitors}
+    sketches = {
+        (listing_id, day): HyperLogLog.from_bytes(sketch)
+        for listing_id, day, sketch in sketch_model.objects.filter(
+            listing_id__in=listing_ids, day__in=days
+        ).values_list("listing_id", "day", "sketch")
+    }
+    rows = []
+    for (listing_id, day), hashes in sorted(visitors.items()):
+        sketch = sketches.get((listing_id, day)) or HyperLogLog()
+        for hashed in hashes:
+            sketch.add(hashed)
+        rows.append(sketch_model(listing_id=listing_id, day=day, sketch=sketch.to_bytes()))
+    # Safe read-modify-write: flushers hold the advisory lock (see flush_views)
+    sketch_model.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=["listing", "day"], update_fields=["sketch"]
+    )
+
+
+def _flush_batch(buffer_model, batch_size: int) -> int:
+    buffer_table = buffer_model._meta.db_table
+    target = BUFFERS[buffer_model]._meta
+    sketch_model = SKETCHES.get(buffer_model)
+    returning = "listing_id, visitor, viewed_on" if sketch_model else "listing_id"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {buffer_table} WHERE id IN "
+            f"(SELECT id FROM {buffer_table} ORDER BY id LIMIT %s) RETURNING {returning}",
+            [batch_size],
+        )
+        rows = cursor.fetchall()
+        views = Counter(row[0] for row in rows)
+        if not views:
+            return 0
+
+        values = ", ".join(["(%s, %s)"] * len(views))
+        params = [value for pair in sorted(views.items()) for value in pair]
+        cursor.execute(
+            f"UPDATE {target.db_table} AS t SET views_count = t.views_count + v.n "
+            f"FROM (VALUES {values}) AS v(id, n) WHERE t.{target.pk.column} = v.id",
+            params,
+        )
+
+    if sketch_model:
+        visitors = defaultdict(list)
+        for listing_id, visitor, day in rows:
+            if visitor is not None:
+                visitors[listing_id, day].append(visitor)
+        if visitors:
+            _update_sketches(sketch_model, visitors)
+    return sum(views.values())
+
+
+def unique_views(listing_ids, days: int) -> dict[int, int]:
+    """Estimated distinct visitors per listing over the last `days` days (today included)."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    merged = defaultdict(HyperLogLog)
+    for listing_id, sketch in ListingDailyUniqueViews.objects.filter(
+        listing_id__in=listing_ids, day__gte=since
+    ).values_list("listing_id", "sketch"):
+        merged[listing_id].merge(HyperLogLog.from_bytes(sketch))
+    return {listing_id: merged[listing_id].estimate() if listing_id in merged else 0 for listing_id in listing_ids}
+
+
+def flush_views(batch_size: int = None, wait: bool = True) -> int:
+    """
+    Fold every buffered view into views_count; returns the number of views flushed.
+    Flushers are serialized with an advisory lock; with wait=False a flush
+    that finds another one running returns 0 immediately.
+    """
+    batch_size = batch_size or getattr(settings, "VIEW_COUNT_FLUSH_BATCH", 5000)
+    flushed = 0
+    for buffer_model in BUFFERS:
+        while True:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    if wait:
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [_ADVISORY_LOCK_ID])
+                    else:
+                        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [_ADVISORY_LOCK_ID])
+                        if not cursor.fetchone()[0]:
+                            return flushed
+                moved = _flush_batch(buffer_model, batch_size)
+            flushed += moved
+            if moved < batch_size:
+                break
+    return flushed
+
+
+def _background_flush() -> None:
+    # Pool threads live outside the request cycle: manage connections ourselves
+    close_old_connections()
+    try:
+        flush_views(wait=False)
+    except Exception:
+        # Views stay buffered; the next flush picks them up
+        logger.exception("Background view count flush failed")
+    finally:
+        close_old_connections()
+
+
+def maybe_flush() -> None:
+    """Flush in the background if nobody has in the last VIEW_COUNT_FLUSH_INTERVAL seconds."""
+    interval = getattr(settings, "VIEW_COUNT_FLUSH_INTERVAL", 60)
+    if interval and cache.add(FLUSH_LOCK_KEY, 1, timeout=interval):
+        transaction.on_commit(lambda: _executor.submit(_background_flush))
@@ -1,10 +1,15 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
 from django.http import JsonResponse
 
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from config.auth import CachedJWTAuthentication
+
+from . import media
 from .models import CarListing, CarImage
+from .renditions import probe_image, schedule_thumbnails
 
 
 def _dealer_and_listing_or_json_error(request, listing_id: int):
@@ -23,8 +28,15 @@ def _dealer_and_listing_or_json_error(request, listing_id: int):
     return dealer, listing, None
 
 
+def _ensure_cover(listing) -> int:
+    """Make the first image the cover if the listing has none, in a single UPDATE."""
+    first = CarImage.objects.filter(listing=listing).order_by("sort_order", "id").values("id")[:1]
+    has_cover = CarImage.objects.filter(listing=listing, is_cover=True)
+    return CarImage.objects.filter(id=Subquery(first)).filter(~Exists(has_cover)).update(is_cover=True)
+
+
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def upload_listing_images(request, listing_id: int):
     """
@@ -56,33 +68,47 @@ def upload_listing_images(request, listing_id: int):
     # Parse is_cover safely
     is_cover_flag = str(request.data.get("is_cover", "")).strip().lower() in ("1", "true", "yes", "y")
 
-    # If caller wants a cover, ensure there is only one cover for this listing
-    if is_cover_flag:
-        CarImage.objects.filter(listing=listing, is_cover=True).update(is_cover=False)
-
-    created = []
-    for i, f in enumerate(files):
-        img = CarImage.objects.create(
-            listing=listing,
-            image=f,
-            is_cover=(is_cover_flag and i == 0),
-            sort_order=sort_base + i,
-        )
-        created.append(
-            {
-                "id": img.id,
-                "imageUrl": getattr(img.image, "url", None),
-                "isCover": img.is_cover,
-                "sortOrder": img.sort_order,
-            }
-        )
+    # Validate every file from its header before storing any of them
+    errors, formats = [], []
+    for f in files:
+        try:
+            formats.append(probe_image(f)[0])
+        except ValueError as exc:
+            errors.append({"file": f.name, "detail": str(exc)})
+    if errors:
+        return JsonResponse({"detail": "Some images were rejected.", "errors": errors}, status=400)
+
+    # Originals go straight to content-addressed storage (a re-uploaded photo is stored once);
+    # rows are inserted in one statement afterwards
+    names = media.store_many(list(zip(files, formats)))
+    images = [
+        CarImage(listing=listing, image=name, is_cover=(is_cover_flag and i == 0), sort_order=sort_base + i)
+        for i, name in enumerate(names)
+    ]
 
-    # Ensure there is a cover if none exists and images were added
-    if not CarImage.objects.filter(listing=listing, is_cover=True).exists():
-        first = CarImage.objects.filter(listing=listing).order_by("sort_order", "id").first()
-        if first:
-            first.is_cover = True
-            first.save(update_fields=["is_cover"])
+    try:
+        with transaction.atomic():
+            # If caller wants a cover, ensure there is only one cover for this listing
+            if is_cover_flag:
+                CarImage.objects.filter(listing=listing, is_cover=True).update(is_cover=False)
+            CarImage.objects.bulk_create(images)
+            if not is_cover_flag:
+                _ensure_cover(listing)
+            # Thumbnails are generated in the background after commit (see market.renditions)
+            schedule_thumbnails(img.id for img in images)
+    except Exception:
+        media.release(img.image.name for img in images)
+        raise
+
+    created = [
+        {
+            "id": img.id,
+            "imageUrl": getattr(img.image, "url", None),
+            "isCover": img.is_cover,
+            "sortOrder": img.sort_order,
+        }
+        for img in images
+    ]
 
     return JsonResponse(
         {"listingId": listing.id, "count": len(created), "images": created},
@@ -91,7 +117,7 @@ def upload_listing_images(request, listing_id: int):
 
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def set_cover_image(request, listing_id: int, image_id: int):
     """
@@ -120,7 +146,7 @@ def set_cover_image(request, listing_id: int, image_id: int):
 
 
 @api_view(["DELETE"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def delete_listing_image(request, listing_id: int, image_id: int):
     """
@@ -135,21 +161,8 @@ def delete_listing_image(request, listing_id: int, image_id: int):
     if not img:
         return JsonResponse({"detail": "Image not found."}, status=404)
 
-    # delete file from storage
-    try:
-        if img.image:
-            img.image.delete(save=False)
-    except Exception:
-        pass
-
-    # if thumbnails exist in your model later, delete them too
-    if hasattr(img, "thumbnail"):
-        try:
-            if img.thumbnail:
-                img.thumbnail.delete(save=False)
-        except Exception:
-            pass
-
+    # Files are shared between images (market.media): deleting the row releases them,
+    # and they are removed once no other image references them
     was_cover = bool(img.is_cover)
     img.delete()
 
@@ -164,7 +177,7 @@ def delete_listing_image(request, listing_id: int, image_id: int):
 
 
 @api_view(["POST"])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def reorder_listing_images(request, listing_id: int):
     """